@@ -1,726 +1,468 @@
 import sys
-import sqlite3
-import hashlib
-import jwt
-import secrets
-from datetime import datetime, date, timedelta
+from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 import os
 import random
 import json
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestRegressor, IsolationForest
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+import re
+import threading
+import time
+import inspect
+import functools
+import traceback
+from collections import deque
 import warnings
+import numpy as np
 warnings.filterwarnings('ignore')
 
-# ==================== سیستم امنیتی ====================
-class AdvancedSecuritySystem:
-    def __init__(self):
-        self.users = {}
-        self.sessions = {}
-        self.failed_attempts = {}
-        self.jwt_secret = secrets.token_urlsafe(32)
-        self.init_default_users()
-    
-    def init_default_users(self):
-        default_users = [
-            {
-                'username': 'admin', 'password': 'Admin123!', 'full_name': 'مدیر سیستم',
-                'email': 'admin@company.com', 'role': 'super_admin', 'department': 'مدیریت',
-                'permissions': ['*'], 'is_active': True
-            },
-            {
-                'username': 'financial', 'password': 'Fin123!', 'full_name': 'مدیر مالی', 
-                'email': 'financial@company.com', 'role': 'financial_manager', 'department': 'مالی',
-                'permissions': ['financial.*', 'reports.*', 'dashboard.*'], 'is_active': True
-            }
-        ]
-        
-        for user_data in default_users:
-            self.register_user(user_data)
-    
-    def hash_password(self, password):
-        salt = secrets.token_hex(16)
-        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex() + ':' + salt
-    
-    def verify_password(self, password, hashed_password):
+from core import (AdvancedDatabaseSystem, AdvancedSecuritySystem, AuditLogSystem, PrinterSystem,
+                  CardReaderSystem, BarcodeReaderSystem, TaxSystem, StockLedgerSystem, LedgerSystem,
+                  PeriodCloseSystem, CompletePOSSystem, ReportSystem, ZReportSystem, InvoiceRenderSystem,
+                  ReceiptJournal, ScanQueue, ProductRepository, CustomerRepository, TransactionRepository)
+from core.ai import AdvancedAISystem
+
+# ==================== پروفایلر رابط کاربری ====================
+class UIProfiler:
+    # زمان هندلرها و رویدادهای حلقه Qt را ثبت می‌کند و توقف‌های طولانی را با نمونه‌برداری از پشته نگه می‌دارد
+    HANDLER_PATTERN = re.compile(r'^(on|show|handle|load|save|generate|test|connect|process|finalize|finish|'
+                                 r'search|submit|scan|reprint|update|add|delete|reset|close|prefetch)_|_real$|^logout$')
+    
+    def __init__(self, stall_threshold_ms=100, sample_interval_ms=10, min_event_ms=1, max_events=200000):
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.sample_interval = sample_interval_ms / 1000
+        self.min_event = min_event_ms / 1000
+        self.events = deque(maxlen=max_events)
+        self.stalls = deque(maxlen=1000)
+        self.handler_stats = {}
+        self.origin = time.perf_counter()
+        self.gui_thread_id = threading.get_ident()
+        self.depth = 0
+        self.dispatch_started = None
+        self.current_samples = []
+        self.lock = threading.Lock()
+        self.running = True
+        
+        self.watchdog = threading.Thread(target=self.watch, name='ui-profiler-watchdog', daemon=True)
+        self.watchdog.start()
+    
+    def instrument(self, obj, pattern=None):
+        # فقط هندلرهای سیگنال با نسخه زمان‌دار جایگزین می‌شوند؛ متدهای کمکی مثل fill_*_row که در حلقه صدا زده می‌شوند دست نمی‌خورند
+        pattern = re.compile(pattern) if pattern else self.HANDLER_PATTERN
+        for name, function in vars(type(obj)).items():
+            if not pattern.search(name) or not inspect.isfunction(function):
+                continue
+            setattr(obj, name, self.wrap(getattr(obj, name), f"{type(obj).__name__}.{name}"))
+    
+    def wrap(self, method, name):
+        # Qt آرگومان‌های اضافه سیگنال (مثل checked) را هم می‌فرستد
+        max_args = None
         try:
-            password_hash, salt = hashed_password.split(':')
-            return password_hash == hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
-        except:
-            return False
-    
-    def register_user(self, user_data):
-        username = user_data['username']
-        self.users[username] = {
-            'username': username,
-            'password': self.hash_password(user_data['password']),
-            'full_name': user_data['full_name'],
-            'email': user_data['email'],
-            'role': user_data['role'],
-            'department': user_data['department'],
-            'permissions': user_data.get('permissions', []),
-            'is_active': user_data.get('is_active', True),
-            'created_at': datetime.now(),
-            'last_login': None,
-            'failed_attempts': 0
-        }
-    
-    def login(self, username, password, ip_address="localhost"):
-        if username not in self.users:
-            return False, "کاربر یافت نشد"
-        
-        user = self.users[username]
-        
-        if not user['is_active']:
-            return False, "حساب کاربری غیرفعال است"
-        
-        if user['failed_attempts'] >= 5:
-            user['is_active'] = False
-            return False, "حساب کاربری به دلیل ورودهای ناموفق متوالی مسدود شد"
-        
-        if not self.verify_password(password, user['password']):
-            user['failed_attempts'] += 1
-            return False, f"رمز عبور اشتباه است. {5 - user['failed_attempts']} تلاش باقی مانده"
-        
-        # ورود موفق
-        user['last_login'] = datetime.now()
-        user['failed_attempts'] = 0
-        
-        token_payload = {
-            'username': username,
-            'role': user['role'],
-            'permissions': user['permissions'],
-            'exp': datetime.utcnow() + timedelta(hours=8)
-        }
-        
-        token = jwt.encode(token_payload, self.jwt_secret, algorithm='HS256')
-        
-        session_id = secrets.token_urlsafe(32)
-        self.sessions[session_id] = {
-            'username': username,
-            'token': token,
-            'login_time': datetime.now(),
-            'last_activity': datetime.now(),
-            'ip_address': ip_address
-        }
+            parameters = inspect.signature(method).parameters.values()
+            if not any(p.kind == inspect.Parameter.VAR_POSITIONAL for p in parameters):
+                max_args = sum(1 for p in parameters
+                               if p.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD))
+        except (TypeError, ValueError):
+            pass
+        
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record_handler(name, started, time.perf_counter())
+        return wrapper
+    
+    def record_handler(self, name, started, finished):
+        duration = finished - started
+        with self.lock:
+            stat = self.handler_stats.get(name)
+            if stat is None:
+                stat = self.handler_stats[name] = {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            stat['calls'] += 1
+            stat['total_ms'] += duration * 1000
+            stat['max_ms'] = max(stat['max_ms'], duration * 1000)
+        self.events.append(('handler', name, started, duration, None))
+    
+    def begin_event(self):
+        self.depth += 1
+        if self.depth == 1:
+            self.current_samples = []
+            self.dispatch_started = time.perf_counter()
+    
+    def end_event(self, name):
+        self.depth -= 1
+        if self.depth:
+            return
         
-        return True, {
-            'session_id': session_id,
-            'token': token,
-            'user': {
-                'username': user['username'],
-                'full_name': user['full_name'],
-                'role': user['role'],
-                'permissions': user['permissions'],
-                'department': user['department']
-            }
+        started = self.dispatch_started
+        self.dispatch_started = None
+        duration = time.perf_counter() - started
+        if duration >= self.min_event:
+            self.events.append(('event', name, started, duration, None))
+        if duration >= self.stall_threshold:
+            with self.lock:
+                samples = self.current_samples
+                self.current_samples = []
+            self.stalls.append({'event': name, 'started': started, 'duration': duration, 'samples': samples})
+            print(f"🐢 توقف رابط کاربری {duration * 1000:.0f} ms در رویداد {name}")
+    
+    def watch(self):
+        # نمونه‌برداری از پشته نخ رابط کاربری در زمان توقف
+        while self.running:
+            time.sleep(self.sample_interval)
+            started = self.dispatch_started
+            if started is None or time.perf_counter() - started < self.stall_threshold:
+                continue
+            frame = sys._current_frames().get(self.gui_thread_id)
+            if frame is None:
+                continue
+            stack = [f"{item.name} ({os.path.basename(item.filename)}:{item.lineno})"
+                     for item in traceback.extract_stack(frame)]
+            with self.lock:
+                if self.dispatch_started == started:
+                    self.current_samples.append((time.perf_counter(), stack))
+    
+    def summary(self, limit=20):
+        with self.lock:
+            handlers = sorted(({'handler': name, **stat} for name, stat in self.handler_stats.items()),
+                              key=lambda item: item['total_ms'], reverse=True)
+        stalls = sorted(self.stalls, key=lambda stall: stall['duration'], reverse=True)
+        return {
+            'handlers': handlers[:limit],
+            'stalls': [{'event': stall['event'], 'duration_ms': stall['duration'] * 1000,
+                        'samples': len(stall['samples'])} for stall in stalls[:limit]]
         }
-
-# ==================== پایگاه داده ====================
-class AdvancedDatabaseSystem:
-    def __init__(self):
-        self.connection = None
-        self.init_database()
     
-    def init_database(self):
-        try:
-            self.connection = sqlite3.connect('accounting_system.db', check_same_thread=False)
-            self.connection.execute("PRAGMA foreign_keys = ON")
-            self.create_tables()
-            self.insert_sample_data()
-            print("✅ پایگاه داده راه‌اندازی شد")
-        except Exception as e:
-            print(f"❌ خطا در راه‌اندازی دیتابیس: {e}")
-    
-    def create_tables(self):
-        cursor = self.connection.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                type TEXT NOT NULL,
-                balance REAL DEFAULT 0,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_number TEXT UNIQUE NOT NULL,
-                date TEXT NOT NULL,
-                type TEXT NOT NULL,
-                description TEXT,
-                amount REAL NOT NULL,
-                account_id INTEGER,
-                status TEXT DEFAULT 'completed',
-                created_by TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sku TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                category TEXT,
-                cost_price REAL,
-                selling_price REAL,
-                current_stock INTEGER DEFAULT 0,
-                min_stock INTEGER DEFAULT 0,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_code TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                type TEXT DEFAULT 'regular',
-                phone TEXT,
-                email TEXT,
-                credit_limit REAL DEFAULT 0,
-                current_balance REAL DEFAULT 0,
-                is_active BOOLEAN DEFAULT 1
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_number TEXT UNIQUE NOT NULL,
-                customer_id INTEGER,
-                invoice_date TEXT NOT NULL,
-                total_amount REAL NOT NULL,
-                tax_amount REAL DEFAULT 0,
-                discount_amount REAL DEFAULT 0,
-                final_amount REAL NOT NULL,
-                status TEXT DEFAULT 'draft',
-                payment_method TEXT,
-                created_by TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoice_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL,
-                unit_price REAL NOT NULL,
-                line_total REAL NOT NULL,
-                FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE,
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tax_settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                tax_name TEXT NOT NULL,
-                tax_rate REAL NOT NULL,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.connection.commit()
-    
-    def insert_sample_data(self):
-        cursor = self.connection.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM accounts")
-        if cursor.fetchone()[0] == 0:
-            self.insert_accounts()
-            self.insert_products()
-            self.insert_customers()
-            self.insert_sample_transactions()
-            self.insert_tax_settings()
-    
-    def insert_accounts(self):
-        accounts = [
-            ('1-101', 'صندوق', 'asset', 50000000),
-            ('1-102', 'بانک ملی', 'asset', 250000000),
-            ('3-101', 'درآمد فروش', 'income', 0),
-            ('4-101', 'هزینه حقوق', 'expense', 0)
-        ]
-        
-        cursor = self.connection.cursor()
-        for code, name, type, balance in accounts:
-            cursor.execute(
-                "INSERT OR IGNORE INTO accounts (code, name, type, balance) VALUES (?, ?, ?, ?)",
-                (code, name, type, balance)
-            )
-        self.connection.commit()
-    
-    def insert_products(self):
-        products = [
-            ('LAP-001', 'لپ‌تاپ ایسوس ROG', 'الکترونیک', 28000000, 35000000, 15, 5),
-            ('MS-002', 'ماوس بی‌سیم لاجیتک', 'الکترونیک', 300000, 450000, 45, 20),
-            ('KB-003', 'کیبورد مکانیکی ریزر', 'الکترونیک', 900000, 1200000, 25, 10)
-        ]
-        
-        cursor = self.connection.cursor()
-        for sku, name, category, cost, price, stock, min_stock in products:
-            cursor.execute('''
-                INSERT OR IGNORE INTO products 
-                (sku, name, category, cost_price, selling_price, current_stock, min_stock)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (sku, name, category, cost, price, stock, min_stock))
-        self.connection.commit()
+    def to_us(self, value):
+        return round((value - self.origin) * 1000000)
     
-    def insert_customers(self):
-        customers = [
-            ('CUST-001', 'شرکت فناوری اطلاعات', 'vip', '021-12345678', 'info@techco.com', 500000000, 125000000),
-            ('CUST-002', 'آقای احمد محمدی', 'regular', '09123456789', 'ahmad@email.com', 10000000, 2500000)
+    def export_chrome_trace(self, path):
+        # قالب Trace Event قابل باز شدن در chrome://tracing و Perfetto
+        pid = os.getpid()
+        trace_events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 1, 'args': {'name': 'GUI'}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 2, 'args': {'name': 'stalls'}}
         ]
-        
-        cursor = self.connection.cursor()
-        for code, name, type, phone, email, credit_limit, balance in customers:
-            cursor.execute('''
-                INSERT OR IGNORE INTO customers 
-                (customer_code, name, type, phone, email, credit_limit, current_balance)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (code, name, type, phone, email, credit_limit, balance))
-        self.connection.commit()
-    
-    def insert_sample_transactions(self):
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT COUNT(*) FROM transactions")
-        if cursor.fetchone()[0] == 0:
-            transactions = [
-                ('TRX-001', '2024-01-15', 'income', 'فروش لپ‌تاپ', 35000000, 1, 'admin'),
-                ('TRX-002', '2024-01-16', 'expense', 'خرید ماوس', 300000, 1, 'admin'),
-                ('TRX-003', '2024-01-17', 'income', 'فروش کیبورد', 1200000, 1, 'financial')
-            ]
-            
-            for trans_num, date, type, desc, amount, acc_id, created_by in transactions:
-                cursor.execute('''
-                    INSERT INTO transactions 
-                    (transaction_number, date, type, description, amount, account_id, created_by)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (trans_num, date, type, desc, amount, acc_id, created_by))
-            self.connection.commit()
-    
-    def insert_tax_settings(self):
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT COUNT(*) FROM tax_settings")
-        if cursor.fetchone()[0] == 0:
-            taxes = [
-                ('مالیات بر ارزش افزوده', 9.0),
-                ('عوارض شهرداری', 1.0)
-            ]
-            
-            for tax_name, tax_rate in taxes:
-                cursor.execute('''
-                    INSERT INTO tax_settings (tax_name, tax_rate) VALUES (?, ?)
-                ''', (tax_name, tax_rate))
-            self.connection.commit()
+        for kind, name, started, duration, args in list(self.events):
+            trace_events.append({'name': name, 'cat': kind, 'ph': 'X', 'pid': pid, 'tid': 1,
+                                 'ts': self.to_us(started), 'dur': round(duration * 1000000)})
+        for stall in list(self.stalls):
+            trace_events.append({'name': f"stall: {stall['event']}", 'cat': 'stall', 'ph': 'X', 'pid': pid, 'tid': 2,
+                                 'ts': self.to_us(stall['started']), 'dur': round(stall['duration'] * 1000000),
+                                 'args': {'samples': len(stall['samples'])}})
+            for sampled_at, stack in stall['samples']:
+                trace_events.append({'name': stack[-1] if stack else 'sample', 'cat': 'sample', 'ph': 'i', 's': 't',
+                                     'pid': pid, 'tid': 2, 'ts': self.to_us(sampled_at),
+                                     'args': {'stack': list(reversed(stack))}})
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms',
+                       'otherData': {'summary': self.summary()}}, f, ensure_ascii=False)
+        return path
+    
+    def stop(self):
+        self.running = False
+        self.watchdog.join(timeout=1)
 
-# ==================== سیستم چاپ ====================
-class PrinterSystem:
-    def __init__(self):
-        self.printer_name = "پیش‌فرض"
-    
-    def print_receipt(self, receipt_data):
-        try:
-            # شبیه‌سازی چاپ فاکتور
-            receipt_text = self.format_receipt(receipt_data)
-            print("🧾 چاپ فاکتور:")
-            print(receipt_text)
-            
-            # ذخیره در فایل برای چاپ واقعی
-            with open('receipt.txt', 'w', encoding='utf-8') as f:
-                f.write(receipt_text)
-            
-            return True, "فاکتور با موفقیت چاپ شد"
-        except Exception as e:
-            return False, f"خطا در چاپ: {str(e)}"
-    
-    def format_receipt(self, data):
-        receipt = f"""
-        🧾 فاکتور فروشگاه
-        {'='*40}
-        شماره فاکتور: {data['invoice_number']}
-        تاریخ: {datetime.now().strftime('%Y-%m-%d %H:%M')}
-        {'-'*40}
-        موارد خرید:
-        """
-        
-        for item in data.get('items', []):
-            receipt += f"\n{item['name']:20} {item['quantity']} x {item['price']:,} = {item['total']:,}"
-        
-        receipt += f"""
-        {'-'*40}
-        جمع کل: {data['total_amount']:,} تومان
-        تخفیف: {data['discount_amount']:,} تومان
-        مالیات: {data['tax_amount']:,} تومان
-        {'='*40}
-        مبلغ قابل پرداخت: {data['final_amount']:,} تومان
-        روش پرداخت: {data['payment_method']}
-        {'='*40}
-        با تشکر از خرید شما!
-        """
-        
-        return receipt
 
-# ==================== سیستم کارتخوان ====================
-class CardReaderSystem:
-    def __init__(self):
-        self.is_connected = False
-    
-    def connect(self):
-        try:
-            # شبیه‌سازی اتصال به کارتخوان
-            self.is_connected = True
-            return True, "کارتخوان متصل شد"
-        except:
-            return False, "خطا در اتصال به کارتخوان"
+class ProfiledApplication(QApplication):
+    def __init__(self, argv, profiler):
+        super().__init__(argv)
+        self.profiler = profiler
     
-    def process_payment(self, amount, card_number="", pin=""):
-        if not self.is_connected:
-            return False, "کارتخوان متصل نیست"
-        
+    def notify(self, receiver, event):
+        self.profiler.begin_event()
         try:
-            # شبیه‌سازی پرداخت
-            transaction_id = f"CT{random.randint(100000, 999999)}"
-            
-            # تأخیر شبیه‌سازی پرداخت
-            QThread.msleep(2000)
-            
-            return True, {
-                'transaction_id': transaction_id,
-                'amount': amount,
-                'card_number': card_number[-4:] if card_number else "****",
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        except Exception as e:
-            return False, f"خطا در پرداخت: {str(e)}"
+            return super().notify(receiver, event)
+        finally:
+            self.profiler.end_event(f"{type(receiver).__name__}:{event.type()}")
 
-# ==================== سیستم بارکدخوان ====================
-class BarcodeReaderSystem:
-    def __init__(self, database):
-        self.database = database
-        self.is_connected = False
-    
-    def connect(self):
-        try:
-            self.is_connected = True
-            return True, "بارکدخوان متصل شد"
-        except:
-            return False, "خطا در اتصال به بارکدخوان"
-    
-    def read_barcode(self, barcode_data=""):
-        if not self.is_connected:
-            return False, "بارکدخوان متصل نیست"
-        
-        try:
-            # اگر داده بارکد ارائه نشده، یک محصول تصادفی انتخاب کن
-            if not barcode_data:
-                cursor = self.database.connection.cursor()
-                cursor.execute("SELECT id, sku, name FROM products WHERE current_stock > 0 ORDER BY RANDOM() LIMIT 1")
-                product = cursor.fetchone()
-                if product:
-                    barcode_data = product[1]  # استفاده از SKU به عنوان بارکد
-                else:
-                    return False, "محصولی برای تست یافت نشد"
-            
-            # جستجوی محصول بر اساس بارکد (SKU)
-            cursor = self.database.connection.cursor()
-            cursor.execute("SELECT id, sku, name, selling_price, current_stock FROM products WHERE sku = ?", (barcode_data,))
-            product = cursor.fetchone()
-            
-            if product:
-                return True, {
-                    'product_id': product[0],
-                    'sku': product[1],
-                    'name': product[2],
-                    'price': product[3],
-                    'stock': product[4]
-                }
-            else:
-                return False, "محصول با این بارکد یافت نشد"
-                
-        except Exception as e:
-            return False, f"خطا در خواندن بارکد: {str(e)}"
+# ==================== دکمه‌های جدول ====================
+class ActionButtonDelegate(QStyledItemDelegate):
+    # دکمه فقط نقاشی می‌شود؛ شناسه ردیف در Qt.UserRole خانه همان ستون است
+    clicked = pyqtSignal(object)
+    
+    def __init__(self, text, color='#3498db', hover_color='#21618c', parent=None):
+        super().__init__(parent)
+        self.text = text
+        self.color = QColor(color)
+        self.hover_color = QColor(hover_color)
+        self.pressed_index = None
+    
+    def button_rect(self, option):
+        return option.rect.adjusted(3, 3, -3, -3)
+    
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        pressed = self.pressed_index is not None and self.pressed_index == index
+        hovered = option.state & QStyle.State_MouseOver
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.hover_color if pressed or hovered else self.color)
+        painter.drawRoundedRect(QRectF(self.button_rect(option)), 6, 6)
+        
+        font = QFont(option.font)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(Qt.white)
+        painter.drawText(self.button_rect(option), Qt.AlignCenter, self.text)
+        painter.restore()
+    
+    def sizeHint(self, option, index):
+        metrics = QFontMetrics(option.font)
+        return QSize(metrics.horizontalAdvance(self.text) + 30, metrics.height() + 14)
+    
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            if self.button_rect(option).contains(event.pos()):
+                self.pressed_index = QPersistentModelIndex(index)
+                return True
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            pressed = self.pressed_index
+            self.pressed_index = None
+            if pressed is not None and pressed == index and self.button_rect(option).contains(event.pos()):
+                self.clicked.emit(index.data(Qt.UserRole))
+            return pressed is not None
+        return super().editorEvent(event, model, option, index)
 
-# ==================== هوش مصنوعی ====================
-class AdvancedAISystem:
-    def __init__(self):
-        self.models = {}
-        self.scalers = {}
-        self.init_models()
-    
-    def init_models(self):
-        try:
-            self.models['sales_forecast'] = RandomForestRegressor(n_estimators=100, random_state=42)
-            self.models['fraud_detection'] = IsolationForest(contamination=0.02, random_state=42)
-            self.models['customer_clustering'] = KMeans(n_clusters=4, random_state=42)
-            self.scalers['financial'] = StandardScaler()
-            print("✅ سیستم هوش مصنوعی راه‌اندازی شد")
-        except Exception as e:
-            print(f"❌ خطا در راه‌اندازی AI: {e}")
-    
-    def predict_sales(self, historical_data, periods=30):
-        try:
-            if not historical_data:
-                historical_data = [random.randint(50000000, 150000000) for _ in range(90)]
-            
-            predictions = []
-            current_date = datetime.now()
-            
-            for i in range(periods):
-                future_date = current_date + timedelta(days=i+1)
-                
-                base_sales = 100000000
-                seasonal_factor = self.calculate_seasonal_factor(future_date)
-                monthly_trend = 1.2 if future_date.month in [3, 4, 11, 12] else 1.0
-                random_factor = random.uniform(0.9, 1.1)
-                
-                predicted_sales = int(base_sales * seasonal_factor * monthly_trend * random_factor)
-                
-                predictions.append({
-                    'date': future_date.strftime('%Y-%m-%d'),
-                    'predicted_sales': predicted_sales,
-                    'confidence': random.uniform(0.85, 0.95),
-                    'trend': '📈 افزایش' if random.random() > 0.4 else '📉 کاهش'
-                })
-            
-            return predictions
-        except Exception as e:
-            print(f"خطا در پیش‌بینی فروش: {e}")
-            return []
-    
-    def calculate_seasonal_factor(self, date_obj):
-        month = date_obj.month
-        if month in [1, 2, 12]: return 1.3
-        elif month in [3, 4, 5]: return 1.1
-        elif month in [6, 7, 8]: return 0.9
-        else: return 1.0
 
-# ==================== سیستم مالیاتی ====================
-class TaxSystem:
-    def __init__(self, database):
-        self.database = database
-        self.tax_rates = {}
-        self.load_tax_rates()
-    
-    def load_tax_rates(self):
-        cursor = self.database.connection.cursor()
-        cursor.execute("SELECT tax_name, tax_rate FROM tax_settings WHERE is_active = 1")
-        taxes = cursor.fetchall()
-        
-        for tax_name, tax_rate in taxes:
-            self.tax_rates[tax_name] = tax_rate
-    
-    def calculate_tax(self, amount, tax_name="مالیات بر ارزش افزوده"):
-        if tax_name in self.tax_rates:
-            return amount * (self.tax_rates[tax_name] / 100)
-        return 0
-    
-    def calculate_total_tax(self, amount):
-        total_tax = 0
-        for tax_name, tax_rate in self.tax_rates.items():
-            total_tax += self.calculate_tax(amount, tax_name)
-        return total_tax
-    
-    def update_tax_rate(self, tax_name, new_rate):
-        cursor = self.database.connection.cursor()
-        cursor.execute('''
-            UPDATE tax_settings SET tax_rate = ? WHERE tax_name = ?
-        ''', (new_rate, tax_name))
-        self.database.connection.commit()
-        self.load_tax_rates()
+def action_item(value):
+    item = QTableWidgetItem()
+    item.setData(Qt.UserRole, value)
+    item.setFlags(Qt.ItemIsEnabled)
+    return item
 
-# ==================== سیستم POS واقعی ====================
-class CompletePOSSystem:
-    def __init__(self, database, current_user):
-        self.database = database
-        self.current_user = current_user
-        self.current_cart = []
-        self.cart_total = 0
-        self.tax_system = TaxSystem(database)
-        self.printer_system = PrinterSystem()
-        self.card_reader = CardReaderSystem()
-        self.barcode_reader = BarcodeReaderSystem(database)
-        self.invoice_counter = 1000
-    
-    def add_to_cart(self, product_id, quantity=1):
-        try:
-            cursor = self.database.connection.cursor()
-            cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-            product = cursor.fetchone()
-            
-            if not product:
-                return False, "محصول یافت نشد"
-            
-            if product[6] < quantity:
-                return False, f"موجودی کافی نیست. موجودی فعلی: {product[6]}"
-            
-            for item in self.current_cart:
-                if item['product_id'] == product_id:
-                    if item['quantity'] + quantity > product[6]:
-                        return False, f"تعداد درخواستی بیشتر از موجودی است"
-                    item['quantity'] += quantity
-                    item['total'] = item['quantity'] * item['unit_price']
-                    self.calculate_totals()
-                    return True, f"تعداد {product[2]} به {item['quantity']} افزایش یافت"
-            
-            cart_item = {
-                'product_id': product_id,
-                'sku': product[1],
-                'name': product[2],
-                'unit_price': product[5],
-                'quantity': quantity,
-                'total': product[5] * quantity,
-                'available_stock': product[6]
-            }
-            self.current_cart.append(cart_item)
-            self.calculate_totals()
-            return True, f"{product[2]} به سبد خرید اضافه شد"
-            
-        except Exception as e:
-            return False, f"خطا در اضافه کردن به سبد: {str(e)}"
-    
-    def remove_from_cart(self, product_id):
-        self.current_cart = [item for item in self.current_cart if item['product_id'] != product_id]
-        self.calculate_totals()
-        return True, "محصول از سبد حذف شد"
-    
-    def calculate_totals(self):
-        self.cart_total = sum(item['total'] for item in self.current_cart)
-        self.tax_amount = self.tax_system.calculate_total_tax(self.cart_total)
-        self.final_amount = self.cart_total + self.tax_amount
+
+# ==================== مدل جدول کاتالوگ ====================
+class ProductCatalogModel(QAbstractTableModel):
+    # سلول‌ها فقط هنگام نقاشی از آرایه‌های کاتالوگ ساخته می‌شوند؛ هیچ QTableWidgetItem ساخته نمی‌شود
+    HEADERS = ['SKU', 'نام', 'قیمت', 'موجودی', 'دسته', 'عملیات']
+    
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.filter_text = ''
+        self.rows = catalog.visible_rows()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+    
+    def flags(self, index):
+        if index.column() == 5:
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+    
+    def data(self, index, role=Qt.DisplayRole):
+        catalog = self.catalog
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return catalog.skus.values[catalog.sku_codes[row]]
+            if column == 1:
+                return catalog.names.values[catalog.name_codes[row]]
+            if column == 2:
+                return f"{float(catalog.prices[row]):,}"
+            if column == 3:
+                return str(int(catalog.stock[row]))
+            if column == 4:
+                return catalog.categories.values[catalog.category_codes[row]]
+        elif role == Qt.UserRole and column == 5:
+            return int(catalog.ids[row])
+        return None
+    
+    def refresh(self):
+        self.beginResetModel()
+        self.rows = self.catalog.visible_rows(self.filter_text)
+        self.endResetModel()
+    
+    def set_filter(self, text):
+        self.filter_text = text
+        self.refresh()
+    
+    def rows_changed(self, catalog_rows):
+        # فقط ردیف‌های فروخته‌شده یا ویرایش‌شده دوباره نقاشی می‌شوند
+        positions = np.searchsorted(self.rows, catalog_rows)
+        for position, row in zip(positions, catalog_rows):
+            if position < len(self.rows) and self.rows[position] == row:
+                self.dataChanged.emit(self.index(int(position), 0), self.index(int(position), 4))
+
+
+class CartTableModel(QAbstractTableModel):
+    # سبد خرید با سیگنال‌های درج/بروزرسانی/حذف ردیفی؛ هزینه هر اسکن به اندازه سبد بستگی ندارد
+    HEADERS = ['نام', 'تعداد', 'فی', 'جمع', 'حذف']
+    
+    def __init__(self, pos_system, parent=None):
+        super().__init__(parent)
+        self.pos_system = pos_system
+        self.count = len(pos_system.current_cart)
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.count
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+    
+    def flags(self, index):
+        if index.column() == 4:
+            return Qt.ItemIsEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+    
+    def data(self, index, role=Qt.DisplayRole):
+        cart = self.pos_system.current_cart
+        if index.row() >= len(cart):
+            return None
+        item = cart[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return item['name']
+            if column == 1:
+                return str(item['quantity'])
+            if column == 2:
+                return f"{item['unit_price']:,}"
+            if column == 3:
+                return f"{item['total']:,}"
+        elif role == Qt.UserRole and column == 4:
+            return item['product_id']
+        return None
+    
+    def apply_change(self, event, row, item=None):
+        # سبد پیش از صدا زدن تغییر کرده است؛ count نمای قبلی را تا پایان سیگنال‌ها نگه می‌دارد
+        if event == 'insert':
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.count += 1
+            self.endInsertRows()
+        elif event == 'update':
+            self.dataChanged.emit(self.index(row, 0), self.index(row, 3))
+        elif event == 'remove':
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.count -= 1
+            self.endRemoveRows()
+        else:
+            self.beginResetModel()
+            self.count = len(self.pos_system.current_cart)
+            self.endResetModel()
+
+# ==================== بارگذاری جریانی جدول‌ها ====================
+class StreamingTableLoader(QObject):
+    # هر دسته از کرسر در یک دور حلقه رویداد به جدول اضافه می‌شود تا رابط کاربری بین دسته‌ها نقاشی شود
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+    
+    def __init__(self, table, batches, fill_row, total=0, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.batches = batches
+        self.fill_row = fill_row
+        self.total = total
+        self.loaded = 0
+        self.cancelled = False
+    
+    def start(self):
+        self.table.setRowCount(0)
+        # دسته اول همزمان پر می‌شود تا جدول‌های کوچک بدون چشمک در یک مرحله نمایش داده شوند
+        self.load_batch()
+    
+    def load_batch(self):
+        if self.cancelled:
+            return
+        rows = next(self.batches, None)
+        if rows is None:
+            self.finish()
+            return
+        
+        start = self.table.rowCount()
+        self.table.setRowCount(start + len(rows))
+        for offset, row in enumerate(rows):
+            self.fill_row(start + offset, row)
+        if not start:
+            self.table.resizeColumnsToContents()
+        
+        self.loaded += len(rows)
+        self.progress.emit(self.loaded, self.total)
+        QTimer.singleShot(0, self.load_batch)
     
-    def clear_cart(self):
-        self.current_cart.clear()
-        self.calculate_totals()
-        return True, "سبد خرید پاک شد"
+    def cancel(self):
+        self.cancelled = True
+        self.batches.close()
     
-    def process_payment(self, payment_method, discount=0):
-        if not self.current_cart:
-            return False, "سبد خرید خالی است"
-        
-        try:
-            cursor = self.database.connection.cursor()
-            
-            invoice_number = f"INV-{datetime.now().strftime('%Y%m%d')}-{self.invoice_counter}"
-            self.invoice_counter += 1
-            
-            discount_amount = self.cart_total * (discount / 100)
-            final_after_discount = self.final_amount - discount_amount
-            
-            cursor.execute('''
-                INSERT INTO invoices 
-                (invoice_number, customer_id, invoice_date, total_amount, tax_amount, 
-                 discount_amount, final_amount, status, payment_method, created_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                invoice_number,
-                None,
-                datetime.now().strftime('%Y-%m-%d'),
-                self.cart_total,
-                self.tax_amount,
-                discount_amount,
-                final_after_discount,
-                'paid',
-                payment_method,
-                self.current_user['username']
-            ))
-            
-            invoice_id = cursor.lastrowid
-            
-            for item in self.current_cart:
-                cursor.execute('''
-                    INSERT INTO invoice_items 
-                    (invoice_id, product_id, quantity, unit_price, line_total)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (invoice_id, item['product_id'], item['quantity'], item['unit_price'], item['total']))
-                
-                cursor.execute('''
-                    UPDATE products 
-                    SET current_stock = current_stock - ? 
-                    WHERE id = ?
-                ''', (item['quantity'], item['product_id']))
-            
-            cursor.execute('''
-                INSERT INTO transactions 
-                (transaction_number, date, type, description, amount, account_id, created_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                f"TRX-{invoice_number}",
-                datetime.now().strftime('%Y-%m-%d'),
-                'income',
-                f'فروش فاکتور {invoice_number}',
-                final_after_discount,
-                1,
-                self.current_user['username']
-            ))
-            
-            self.database.connection.commit()
-            
-            # چاپ فاکتور
-            receipt_data = {
-                'invoice_number': invoice_number,
-                'items': self.current_cart,
-                'total_amount': self.cart_total,
-                'discount_amount': discount_amount,
-                'tax_amount': self.tax_amount,
-                'final_amount': final_after_discount,
-                'payment_method': payment_method
-            }
-            self.printer_system.print_receipt(receipt_data)
-            
-            self.clear_cart()
-            
-            return True, {
-                'invoice_number': invoice_number,
-                'total_amount': self.cart_total,
-                'tax_amount': self.tax_amount,
-                'discount_amount': discount_amount,
-                'final_amount': final_after_discount,
-                'tax_breakdown': self.get_tax_breakdown(self.cart_total)
-            }
-            
-        except Exception as e:
-            self.database.connection.rollback()
-            return False, f"خطا در پردازش پرداخت: {str(e)}"
-    
-    def get_tax_breakdown(self, amount):
-        breakdown = {}
-        for tax_name, tax_rate in self.tax_system.tax_rates.items():
-            breakdown[tax_name] = {
-                'rate': tax_rate,
-                'amount': self.tax_system.calculate_tax(amount, tax_name)
-            }
-        return breakdown
+    def finish(self):
+        self.batches.close()
+        self.finished.emit()
 
 # ==================== برنامه اصلی ====================
 class CompleteAccountingSystem(QMainWindow):
-    def __init__(self):
+    # وضعیت اتصال بارکدخوان از نخ خواننده؛ اتصال صف‌دار آن را روی نخ رابط کاربری اجرا می‌کند
+    barcode_status = pyqtSignal(bool, str)
+    
+    def __init__(self, db_path='accounting_system.db', profiler=None):
         super().__init__()
-        self.auth_system = AdvancedSecuritySystem()
-        self.database = AdvancedDatabaseSystem()
+        self.profiler = profiler
+        if profiler:
+            profiler.instrument(self)
+        self.database = AdvancedDatabaseSystem(db_path)
+        self.audit_log = AuditLogSystem(self.database)
+        self.auth_system = AdvancedSecuritySystem(self.database, self.audit_log)
         self.ai_system = AdvancedAISystem()
         self.tax_system = TaxSystem(self.database)
         self.printer_system = PrinterSystem()
         self.card_reader = CardReaderSystem()
         self.barcode_reader = BarcodeReaderSystem(self.database)
+        self.stock_ledger = StockLedgerSystem(self.database)
+        self.ledger = LedgerSystem(self.database)
+        self.ledger.start_verifier()
+        self.period_close = PeriodCloseSystem(self.database, self.ledger)
+        self.period_close.close_due_periods()
+        self.reports = ReportSystem(self.database, self.ledger, self.period_close)
+        self.z_reports = ZReportSystem(self.database)
+        # بایگانی رسیدها کنار دیتابیس، مگر در تنظیمات مسیر دیگری داده شده باشد
+        self.receipt_journal = ReceiptJournal(self.database.get_setting('receipt_journal_dir') or os.path.join(
+            os.path.dirname(os.path.abspath(self.database.db_path)), 'receipts'))
+        self.invoice_renderer = InvoiceRenderSystem(self.database, self.receipt_journal)
+        self.products = ProductRepository(self.database)
+        self.customers = CustomerRepository(self.database)
+        self.transactions = TransactionRepository(self.database)
+        self.catalog = self.stock_ledger.catalog
+        self.catalog_model = None
+        self.stock_ledger.change_hooks.append(self.on_stock_changed)
         self.current_user = None
         self.current_token = None
+        self.permissions = None
         self.pos_system = None
         
+        # اسکن‌ها از صفحه‌کلید یا دستگاه وارد صف می‌شوند و هر 30 میلی‌ثانیه دسته‌ای پردازش می‌شوند
+        self.scan_queue = ScanQueue()
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setInterval(30)
+        self.scan_timer.timeout.connect(self.process_scan_queue)
+        self.scan_timer.start()
+        self.barcode_status.connect(self.on_barcode_status)
+        self.barcode_port = None
+        self.barcode_online = False
+        self.toast_label = None
+        self.table_loaders = {}
+        self.load_progress = None
+        
         self.init_ui()
     
     def init_ui(self):
@@ -803,30 +545,123 @@ class CompleteAccountingSystem(QMainWindow):
         success, result = self.auth_system.login(username, password)
         
         if success:
-            self.current_token = result['session_id']
-            self.current_user = result['user']
-            self.pos_system = CompletePOSSystem(self.database, self.current_user)
-            self.show_main_application()
+            self.start_session(result)
             QMessageBox.information(self, "خوش آمدید", f"سلام {self.current_user['full_name']}! 👋")
         else:
             QMessageBox.warning(self, "خطای ورود", result)
     
+    def start_session(self, login_result):
+        self.current_token = login_result['session_id']
+        self.current_user = login_result['user']
+        self.permissions = self.auth_system.get_permission_matcher(self.current_user)
+        self.pos_system = CompletePOSSystem(self.database, self.current_user, self.stock_ledger,
+                                            self.ledger, self.permissions, self.audit_log, self.receipt_journal)
+        self.show_main_application()
+    
+    # مکث پیش از ساخت تب‌های باقی‌مانده در پس‌زمینه (میلی‌ثانیه)
+    TAB_PREFETCH_DELAY = 1500
+    
     def show_main_application(self):
         self.tab_widget = QTabWidget()
         
-        self.create_dashboard_tab()
-        self.create_accounting_tab()
-        self.create_inventory_tab()
-        self.create_pos_tab()
-        self.create_reports_tab()
-        self.create_customers_tab()
-        self.create_tax_tab()
-        self.create_hardware_tab()
-        self.create_settings_tab()
+        # (کلید، دسترسی، عنوان، سازنده، بارگذار داده)
+        tabs = [
+            ('dashboard', 'dashboard.view', "🏠 داشبورد", self.create_dashboard_tab, None),
+            ('accounting', 'financial.transactions.view', "💼 حسابداری", self.create_accounting_tab, self.load_transactions),
+            ('inventory', 'inventory.view', "📦 انبار", self.create_inventory_tab, self.load_products),
+            ('pos', 'pos.sell', "🛒 فروش", self.create_pos_tab, self.load_pos_products),
+            ('reports', 'reports.view', "📈 گزارشات", self.create_reports_tab, None),
+            ('customers', 'customers.view', "👥 مشتریان", self.create_customers_tab, self.load_customers),
+            ('tax', 'tax.view', "🏛️ مالیات", self.create_tax_tab, self.load_tax_data),
+            ('hardware', 'hardware.manage', "🔌 سخت‌افزار", self.create_hardware_tab, None),
+            ('settings', None, "⚙️ تنظیمات", self.create_settings_tab, None)
+        ]
+        
+        # فقط تب‌های مجاز، آن هم با یک جای‌نگهدار خالی؛ ساخت و بارگذاری در اولین نمایش
+        self.tab_specs = {}
+        self.built_tabs = set()
+        self.stale_tabs = set()
+        for key, permission, title, create_tab, loader in tabs:
+            if permission is None or self.permissions.has_permission(permission):
+                self.tab_specs[key] = (title, create_tab, loader)
+                placeholder = QWidget()
+                placeholder.setProperty('tab_key', key)
+                self.tab_widget.addTab(placeholder, title)
         
         self.setCentralWidget(self.tab_widget)
         self.apply_styles()
-        self.load_all_data()
+        
+        last_tab = self.database.get_setting(f"last_tab.{self.current_user['username']}")
+        self.ensure_tab(last_tab if last_tab in self.tab_specs else self.tab_key(0))
+        self.tab_widget.setCurrentIndex(self.tab_index(self.current_tab_key))
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+        
+        if self.database.get_setting('prefetch_tabs', '1') == '1':
+            QTimer.singleShot(self.TAB_PREFETCH_DELAY, lambda tab_widget=self.tab_widget: self.prefetch_next_tab(tab_widget))
+    
+    def tab_key(self, index):
+        return self.tab_widget.widget(index).property('tab_key')
+    
+    def tab_index(self, key):
+        for index in range(self.tab_widget.count()):
+            if self.tab_key(index) == key:
+                return index
+        return -1
+    
+    def ensure_tab(self, key):
+        # ساخت تب و پر کردن داده‌هایش در اولین نمایش، یا بارگذاری مجدد اگر داده‌ها کهنه شده‌اند
+        self.current_tab_key = key
+        title, create_tab, loader = self.tab_specs[key]
+        
+        if key in self.built_tabs:
+            if key in self.stale_tabs:
+                self.stale_tabs.discard(key)
+                loader()
+            return
+        
+        self.built_tabs.add(key)
+        tab = create_tab()
+        tab.setProperty('tab_key', key)
+        if loader:
+            loader()
+        
+        index = self.tab_index(key)
+        was_current = self.tab_widget.currentIndex() == index
+        self.tab_widget.blockSignals(True)
+        placeholder = self.tab_widget.widget(index)
+        self.tab_widget.removeTab(index)
+        self.tab_widget.insertTab(index, tab, title)
+        if was_current:
+            self.tab_widget.setCurrentIndex(index)
+        self.tab_widget.blockSignals(False)
+        placeholder.deleteLater()
+    
+    def on_tab_changed(self, index):
+        if index < 0:
+            return
+        
+        key = self.tab_key(index)
+        self.ensure_tab(key)
+        if key == 'pos':
+            self.scan_input.setFocus()
+        self.database.set_setting(f"last_tab.{self.current_user['username']}", key, wait=False)
+    
+    def prefetch_next_tab(self, tab_widget):
+        # هر بار فقط یک تب ساخته می‌شود تا حلقه رویداد بین ساخت‌ها آزاد بماند
+        if self.current_user is None or tab_widget is not self.tab_widget:
+            return
+        if QApplication.activePopupWidget() or QApplication.activeModalWidget():
+            QTimer.singleShot(self.TAB_PREFETCH_DELAY, lambda: self.prefetch_next_tab(tab_widget))
+            return
+        
+        pending = [key for key in self.tab_specs if key not in self.built_tabs]
+        if not pending:
+            return
+        
+        current_key = self.current_tab_key
+        self.ensure_tab(pending[0])
+        self.current_tab_key = current_key
+        QTimer.singleShot(0, lambda: self.prefetch_next_tab(tab_widget))
     
     def apply_styles(self):
         self.setStyleSheet("""
@@ -872,18 +707,11 @@ class CompleteAccountingSystem(QMainWindow):
         
         stats_layout = QHBoxLayout()
         
-        cursor = self.database.connection.cursor()
-        cursor.execute("SELECT SUM(amount) FROM transactions WHERE type='income'")
-        total_income = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT COUNT(*) FROM products")
-        total_products = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM customers")
-        total_customers = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT SUM(tax_amount) FROM invoices WHERE status='paid'")
-        total_taxes = cursor.fetchone()[0] or 0
+        query = self.database.cached_query
+        total_income = query("SELECT SUM(amount) FROM transactions WHERE type='income'")[0][0] or 0
+        total_products = query("SELECT COUNT(*) FROM products")[0][0]
+        total_customers = query("SELECT COUNT(*) FROM customers")[0][0]
+        total_taxes = query("SELECT SUM(tax_amount) FROM invoices WHERE status='paid'")[0][0] or 0
         
         stats = [
             ("💰 درآمد کل", f"{total_income:,}", "تومان", "#27ae60"),
@@ -921,7 +749,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addLayout(stats_layout)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "🏠 داشبورد")
+        return tab
     
     def create_accounting_tab(self):
         tab = QWidget()
@@ -954,7 +782,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addWidget(self.transactions_table)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "💼 حسابداری")
+        return tab
     
     def create_inventory_tab(self):
         tab = QWidget()
@@ -990,7 +818,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addWidget(self.products_table)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "📦 انبار")
+        return tab
     
     def create_pos_tab(self):
         tab = QWidget()
@@ -1005,6 +833,12 @@ class CompleteAccountingSystem(QMainWindow):
         left_widget = QWidget()
         left_layout = QVBoxLayout()
         
+        # ورودی بارکدخوان صفحه‌کلیدی؛ هر Enter یک اسکن است
+        self.scan_input = QLineEdit()
+        self.scan_input.setPlaceholderText('📷 بارکد را اسکن کنید (یا تعداد*بارکد)')
+        self.scan_input.setStyleSheet("padding: 8px; font-size: 14px; border: 2px solid #27ae60; border-radius: 6px;")
+        self.scan_input.returnPressed.connect(self.submit_scan_input)
+        
         search_layout = QHBoxLayout()
         self.product_search = QLineEdit()
         self.product_search.setPlaceholderText('جستجوی محصول...')
@@ -1017,10 +851,19 @@ class CompleteAccountingSystem(QMainWindow):
         search_layout.addWidget(self.product_search)
         search_layout.addWidget(barcode_btn)
         
-        self.pos_products_table = QTableWidget()
-        self.pos_products_table.setColumnCount(6)
-        self.pos_products_table.setHorizontalHeaderLabels(['SKU', 'نام', 'قیمت', 'موجودی', 'دسته', 'عملیات'])
+        self.catalog_model = ProductCatalogModel(self.catalog, self)
+        self.pos_products_table = QTableView()
+        self.pos_products_table.setModel(self.catalog_model)
+        self.pos_products_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.pos_products_table.setMouseTracking(True)
+        # اندازه ستون‌ها از نمونه ردیف‌ها، نه از همه کاتالوگ
+        self.pos_products_table.horizontalHeader().setResizeContentsPrecision(100)
+        self.pos_products_table.resizeColumnsToContents()
+        self.pos_add_delegate = ActionButtonDelegate('➕ اضافه', parent=self.pos_products_table)
+        self.pos_add_delegate.clicked.connect(self.add_to_cart_real)
+        self.pos_products_table.setItemDelegateForColumn(5, self.pos_add_delegate)
         
+        left_layout.addWidget(self.scan_input)
         left_layout.addLayout(search_layout)
         left_layout.addWidget(self.pos_products_table)
         left_widget.setLayout(left_layout)
@@ -1032,9 +875,17 @@ class CompleteAccountingSystem(QMainWindow):
         cart_header = QLabel('🛍️ سبد خرید')
         cart_header.setStyleSheet("font-size: 18px; font-weight: bold; margin: 10px 0;")
         
-        self.cart_table = QTableWidget()
-        self.cart_table.setColumnCount(5)
-        self.cart_table.setHorizontalHeaderLabels(['نام', 'تعداد', 'فی', 'جمع', 'حذف'])
+        self.cart_model = CartTableModel(self.pos_system, self)
+        self.pos_system.cart_hooks.append(self.on_cart_changed)
+        self.cart_table = QTableView()
+        self.cart_table.setModel(self.cart_model)
+        self.cart_table.setMouseTracking(True)
+        # پهنای ثابت ستون‌ها تا افزودن هر قلم همه ردیف‌ها را اندازه‌گیری نکند
+        self.cart_table.horizontalHeader().setDefaultSectionSize(110)
+        self.cart_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.cart_remove_delegate = ActionButtonDelegate('🗑️ حذف', '#e74c3c', '#a93226', self.cart_table)
+        self.cart_remove_delegate.clicked.connect(self.remove_from_cart_real)
+        self.cart_table.setItemDelegateForColumn(4, self.cart_remove_delegate)
         
         total_layout = QHBoxLayout()
         total_layout.addWidget(QLabel('💰 جمع کل:'))
@@ -1050,11 +901,15 @@ class CompleteAccountingSystem(QMainWindow):
         clear_btn = QPushButton('🗑️ پاک کردن سبد')
         clear_btn.clicked.connect(self.clear_cart_real)
         
+        close_register_btn = QPushButton('🧾 بستن صندوق (Z)')
+        close_register_btn.clicked.connect(self.close_register)
+        
         right_layout.addWidget(cart_header)
         right_layout.addWidget(self.cart_table)
         right_layout.addLayout(total_layout)
         right_layout.addWidget(payment_btn)
         right_layout.addWidget(clear_btn)
+        right_layout.addWidget(close_register_btn)
         right_widget.setLayout(right_layout)
         
         main_layout.addWidget(left_widget, 2)
@@ -1064,7 +919,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addLayout(main_layout)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "🛒 فروش")
+        return tab
     
     def create_hardware_tab(self):
         tab = QWidget()
@@ -1094,6 +949,9 @@ class CompleteAccountingSystem(QMainWindow):
         barcode_layout = QVBoxLayout()
         
         barcode_status_label = QLabel(f"وضعیت: {'🟢 متصل' if self.barcode_reader.is_connected else '🔴 قطع'}")
+        # خالی: شبیه‌سازی؛ مثل COM3 یا /dev/ttyUSB0 برای دستگاه سریال
+        self.barcode_port_edit = QLineEdit(self.database.get_setting('barcode_port', ''))
+        self.barcode_port_edit.setPlaceholderText('پورت سریال (مثلاً COM3 یا /dev/ttyUSB0)')
         connect_barcode_btn = QPushButton('🔌 اتصال بارکدخوان')
         test_barcode_btn = QPushButton('🧪 تست اسکن')
         
@@ -1101,6 +959,7 @@ class CompleteAccountingSystem(QMainWindow):
         test_barcode_btn.clicked.connect(self.test_barcode_scan)
         
         barcode_layout.addWidget(barcode_status_label)
+        barcode_layout.addWidget(self.barcode_port_edit)
         barcode_layout.addWidget(connect_barcode_btn)
         barcode_layout.addWidget(test_barcode_btn)
         barcode_group.setLayout(barcode_layout)
@@ -1111,11 +970,14 @@ class CompleteAccountingSystem(QMainWindow):
         
         printer_status_label = QLabel("وضعیت: 🟢 آماده")
         test_printer_btn = QPushButton('🧪 تست چاپ')
+        reprint_btn = QPushButton('🖨️ چاپ مجدد فاکتور')
         
         test_printer_btn.clicked.connect(self.test_printer)
+        reprint_btn.clicked.connect(self.reprint_invoice)
         
         printer_layout.addWidget(printer_status_label)
         printer_layout.addWidget(test_printer_btn)
+        printer_layout.addWidget(reprint_btn)
         printer_group.setLayout(printer_layout)
         
         layout.addWidget(header)
@@ -1125,7 +987,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addStretch()
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "🔌 سخت‌افزار")
+        return tab
 
     def create_reports_tab(self):
         tab = QWidget()
@@ -1139,17 +1001,23 @@ class CompleteAccountingSystem(QMainWindow):
         
         sales_report_btn = QPushButton('📊 گزارش فروش')
         financial_report_btn = QPushButton('💹 گزارش مالی')
+        balance_as_of_btn = QPushButton('📅 تراز در تاریخ')
         inventory_report_btn = QPushButton('📦 گزارش انبار')
+        z_report_btn = QPushButton('🧾 گزارش‌های Z')
         ai_analysis_btn = QPushButton('🤖 تحلیل هوش مصنوعی')
         
         sales_report_btn.clicked.connect(self.generate_sales_report)
         financial_report_btn.clicked.connect(self.generate_financial_report)
+        balance_as_of_btn.clicked.connect(self.generate_balance_as_of_report)
         inventory_report_btn.clicked.connect(self.generate_inventory_report)
+        z_report_btn.clicked.connect(self.generate_z_report)
         ai_analysis_btn.clicked.connect(self.show_ai_analysis)
         
         report_buttons_layout.addWidget(sales_report_btn)
         report_buttons_layout.addWidget(financial_report_btn)
+        report_buttons_layout.addWidget(balance_as_of_btn)
         report_buttons_layout.addWidget(inventory_report_btn)
+        report_buttons_layout.addWidget(z_report_btn)
         report_buttons_layout.addWidget(ai_analysis_btn)
         
         # ناحیه نمایش گزارش
@@ -1161,7 +1029,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addWidget(self.report_text)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "📈 گزارشات")
+        return tab
 
     def create_customers_tab(self):
         tab = QWidget()
@@ -1195,9 +1063,7 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addWidget(self.customers_table)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "👥 مشتریان")
-        
-        self.load_customers()
+        return tab
 
     def create_tax_tab(self):
         tab = QWidget()
@@ -1210,6 +1076,10 @@ class CompleteAccountingSystem(QMainWindow):
         self.tax_table = QTableWidget()
         self.tax_table.setColumnCount(3)
         self.tax_table.setHorizontalHeaderLabels(['نام مالیات', 'نرخ (%)', 'عملیات'])
+        self.tax_table.setMouseTracking(True)
+        self.tax_delete_delegate = ActionButtonDelegate('🗑️ حذف', '#e74c3c', '#a93226', self.tax_table)
+        self.tax_delete_delegate.clicked.connect(self.delete_tax)
+        self.tax_table.setItemDelegateForColumn(2, self.tax_delete_delegate)
         
         # فرم افزودن/ویرایش مالیات
         form_group = QGroupBox("افزودن/ویرایش مالیات")
@@ -1242,9 +1112,86 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addWidget(form_group)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "🏛️ مالیات")
+        return tab
+    
+    def create_security_stats_group(self):
+        # آمار امنیتی ورود
+        security_group = QGroupBox("🛡️ آمار امنیتی")
+        security_layout = QFormLayout()
+        stats = self.auth_system.get_security_stats()
+        security_layout.addRow("ورود موفق:", QLabel(str(stats['login']['successful_logins'])))
+        security_layout.addRow("رمز اشتباه:", QLabel(str(stats['login']['failed_passwords'])))
+        security_layout.addRow("حساب‌های مسدود:", QLabel(str(stats['locked_accounts'])))
+        security_layout.addRow("تلاش‌های محدودشده:", QLabel(str(stats['login']['rate_limited'])))
+        security_layout.addRow("نشست‌های فعال:", QLabel(str(stats['active_sessions'])))
+        security_group.setLayout(security_layout)
+        return security_group
+    
+    def create_query_diagnostics_group(self):
+        # پرهزینه‌ترین کوئری‌ها بر اساس مجموع زمان
+        diagnostics_group = QGroupBox("🩺 عیب‌یابی کوئری‌ها")
+        diagnostics_layout = QVBoxLayout()
+        
+        self.query_stats_table = QTableWidget()
+        self.query_stats_table.setColumnCount(6)
+        self.query_stats_table.setHorizontalHeaderLabels(['کوئری', 'تعداد', 'مجموع (ms)', 'بیشینه (ms)', 'ردیف‌ها', 'فراخوان اصلی'])
+        self.query_stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.query_stats_table.setMaximumHeight(250)
+        
+        self.slow_query_label = QLabel()
+        self.slow_query_label.setWordWrap(True)
+        
+        button_layout = QHBoxLayout()
+        refresh_btn = QPushButton("🔄 بروزرسانی")
+        reset_btn = QPushButton("🧹 پاک کردن آمار")
+        refresh_btn.clicked.connect(self.load_query_diagnostics)
+        reset_btn.clicked.connect(self.reset_query_diagnostics)
+        button_layout.addWidget(refresh_btn)
+        button_layout.addWidget(reset_btn)
+        
+        diagnostics_layout.addWidget(self.query_stats_table)
+        diagnostics_layout.addWidget(self.slow_query_label)
+        diagnostics_layout.addLayout(button_layout)
+        diagnostics_group.setLayout(diagnostics_layout)
+        
+        self.load_query_diagnostics()
+        return diagnostics_group
+    
+    def load_query_diagnostics(self):
+        monitor = self.database.query_monitor
+        top_queries = monitor.top_queries(15)
+        
+        self.query_stats_table.setRowCount(len(top_queries))
+        for row, stat in enumerate(top_queries):
+            caller = max(stat['callers'], key=stat['callers'].get) if stat['callers'] else '-'
+            statement_item = QTableWidgetItem(stat['statement'][:200])
+            statement_item.setToolTip(stat['statement'])
+            self.query_stats_table.setItem(row, 0, statement_item)
+            self.query_stats_table.setItem(row, 1, QTableWidgetItem(str(stat['calls'])))
+            self.query_stats_table.setItem(row, 2, QTableWidgetItem(f"{stat['total_ms']:,.1f}"))
+            self.query_stats_table.setItem(row, 3, QTableWidgetItem(f"{stat['max_ms']:,.1f}"))
+            self.query_stats_table.setItem(row, 4, QTableWidgetItem(f"{stat['rows']:,}"))
+            self.query_stats_table.setItem(row, 5, QTableWidgetItem(caller))
+        
+        if monitor.slow_log:
+            slow = monitor.slow_log[-1]
+            plan = " | ".join(slow['plan']) or '-'
+            text = (f"کوئری‌های کند (بیش از {monitor.slow_threshold_ms} ms): {len(monitor.slow_log)}\n"
+                    f"آخرین: {slow['elapsed_ms']:.1f} ms در {slow['caller']}\nطرح اجرا: {plan}")
+        else:
+            text = f"کوئری کندی (بیش از {monitor.slow_threshold_ms} ms) ثبت نشده است"
         
-        self.load_tax_data()
+        cache = self.database.query_cache.status()
+        text += (f"\nکش کوئری: {cache['hits']:,} برخورد، {cache['misses']:,} اجرا، "
+                 f"{cache['entries']} نتیجه ({cache['rows']:,} سطر)")
+        receipts = self.receipt_journal.status()
+        text += (f"\nبایگانی رسید: {receipts['receipts']:,} رسید در {receipts['segments']} قطعه، "
+                 f"{receipts['stored_bytes']:,} بایت (فشرده‌سازی {receipts['ratio']}x)")
+        self.slow_query_label.setText(text)
+    
+    def reset_query_diagnostics(self):
+        self.database.query_monitor.reset()
+        self.load_query_diagnostics()
     
     def create_settings_tab(self):
         tab = QWidget()
@@ -1290,15 +1237,22 @@ class CompleteAccountingSystem(QMainWindow):
         layout.addWidget(header)
         layout.addWidget(user_group)
         layout.addWidget(system_group)
+        if self.permissions.has_permission('security.view'):
+            layout.addWidget(self.create_security_stats_group())
+        if self.permissions.has_permission('diagnostics.view'):
+            layout.addWidget(self.create_query_diagnostics_group())
         layout.addStretch()
         layout.addWidget(logout_btn)
         
         tab.setLayout(layout)
-        self.tab_widget.addTab(tab, "⚙️ تنظیمات")
+        return tab
 
     # ==================== متدهای جدید برای مدیریت داده ====================
     
     def show_add_transaction_dialog(self):
+        if not self.check_permission('financial.transactions.create'):
+            return
+        
         dialog = QDialog(self)
         dialog.setWindowTitle("➕ ثبت تراکنش جدید")
         dialog.setFixedSize(400, 500)
@@ -1346,19 +1300,29 @@ class CompleteAccountingSystem(QMainWindow):
         dialog.exec_()
     
     def save_new_transaction(self, trans_number, date, type, description, amount, dialog):
+        if not self.check_permission('financial.transactions.create'):
+            return
+        
         if not all([trans_number, description]):
             QMessageBox.warning(self, "خطا", "پر کردن فیلدهای الزامی ضروری است")
             return
         
         try:
-            cursor = self.database.connection.cursor()
-            cursor.execute('''
-                INSERT INTO transactions 
-                (transaction_number, date, type, description, amount, account_id, created_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (trans_number, date, type, description, amount, 1, self.current_user['username']))
+            lines = self.ledger.transaction_lines(type, amount)
+            
+            def write(cursor):
+                self.ledger.post_entry(cursor, date, description, lines, source_type='transaction',
+                                       source_ref=trans_number, created_by=self.current_user['username'])
+                cursor.execute('''
+                    INSERT INTO transactions 
+                    (transaction_number, date, type, description, amount, account_id, created_by)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (trans_number, date, type, description, amount,
+                      self.ledger.account_id(lines[0][0]), self.current_user['username']))
             
-            self.database.connection.commit()
+            self.database.write(write)
+            self.audit('transaction.create', 'transaction', trans_number,
+                       {'date': date, 'type': type, 'amount': amount, 'description': description})
             QMessageBox.information(self, "موفق", "تراکنش جدید با موفقیت ثبت شد")
             dialog.accept()
             self.load_transactions()
@@ -1367,6 +1331,9 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.critical(self, "خطا", f"خطا در ثبت تراکنش: {str(e)}")
     
     def show_add_product_dialog(self):
+        if not self.check_permission('inventory.edit'):
+            return
+        
         dialog = QDialog(self)
         dialog.setWindowTitle("➕ افزودن محصول جدید")
         dialog.setFixedSize(400, 500)
@@ -1425,19 +1392,26 @@ class CompleteAccountingSystem(QMainWindow):
         dialog.exec_()
     
     def save_new_product(self, sku, name, category, cost_price, selling_price, current_stock, min_stock, dialog):
+        if not self.check_permission('inventory.edit'):
+            return
+        
         if not all([sku, name]):
             QMessageBox.warning(self, "خطا", "پر کردن فیلدهای الزامی ضروری است")
             return
         
         try:
-            cursor = self.database.connection.cursor()
-            cursor.execute('''
-                INSERT INTO products 
-                (sku, name, category, cost_price, selling_price, current_stock, min_stock)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (sku, name, category, cost_price, selling_price, current_stock, min_stock))
+            def write(cursor):
+                cursor.execute('''
+                    INSERT INTO products 
+                    (sku, name, category, cost_price, selling_price, current_stock, min_stock)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (sku, name, category, cost_price, selling_price, current_stock, min_stock))
+                return cursor.lastrowid
             
-            self.database.connection.commit()
+            product_id = self.database.write(write)
+            self.stock_ledger.refresh_product(product_id)
+            self.audit('product.create', 'product', product_id,
+                       {'sku': sku, 'selling_price': selling_price, 'current_stock': current_stock})
             QMessageBox.information(self, "موفق", "محصول جدید با موفقیت اضافه شد")
             dialog.accept()
             self.load_products()
@@ -1447,6 +1421,9 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.critical(self, "خطا", f"خطا در افزودن محصول: {str(e)}")
     
     def show_edit_product_dialog(self):
+        if not self.check_permission('inventory.edit'):
+            return
+        
         # انتخاب محصول برای ویرایش
         selected_row = self.products_table.currentRow()
         if selected_row == -1:
@@ -1456,9 +1433,7 @@ class CompleteAccountingSystem(QMainWindow):
         sku = self.products_table.item(selected_row, 0).text()
         
         # دریافت اطلاعات محصول از دیتابیس
-        cursor = self.database.connection.cursor()
-        cursor.execute("SELECT * FROM products WHERE sku = ?", (sku,))
-        product = cursor.fetchone()
+        product = self.products.get_by_sku(sku)
         
         if not product:
             QMessageBox.warning(self, "خطا", "محصول یافت نشد")
@@ -1471,22 +1446,22 @@ class CompleteAccountingSystem(QMainWindow):
         
         form_layout = QFormLayout()
         
-        sku_edit = QLineEdit(product[1])
+        sku_edit = QLineEdit(product.sku)
         sku_edit.setReadOnly(True)
-        name_edit = QLineEdit(product[2])
-        category_edit = QLineEdit(product[3] or "")
+        name_edit = QLineEdit(product.name)
+        category_edit = QLineEdit(product.category or "")
         cost_edit = QDoubleSpinBox()
         cost_edit.setRange(0, 100000000)
-        cost_edit.setValue(product[4] or 0)
+        cost_edit.setValue(product.cost_price or 0)
         price_edit = QDoubleSpinBox()
         price_edit.setRange(0, 100000000)
-        price_edit.setValue(product[5] or 0)
+        price_edit.setValue(product.selling_price or 0)
         stock_edit = QSpinBox()
         stock_edit.setRange(0, 10000)
-        stock_edit.setValue(product[6] or 0)
+        stock_edit.setValue(product.current_stock or 0)
         min_stock_edit = QSpinBox()
         min_stock_edit.setRange(0, 1000)
-        min_stock_edit.setValue(product[7] or 0)
+        min_stock_edit.setValue(product.min_stock or 0)
         
         form_layout.addRow('SKU:', sku_edit)
         form_layout.addRow('نام محصول:', name_edit)
@@ -1501,7 +1476,7 @@ class CompleteAccountingSystem(QMainWindow):
         cancel_btn = QPushButton('❌ انصراف')
         
         save_btn.clicked.connect(lambda: self.update_product(
-            product[0],
+            product.id,
             name_edit.text(),
             category_edit.text(),
             cost_edit.value(),
@@ -1521,16 +1496,27 @@ class CompleteAccountingSystem(QMainWindow):
         dialog.exec_()
     
     def update_product(self, product_id, name, category, cost_price, selling_price, current_stock, min_stock, dialog):
+        if not self.check_permission('inventory.edit'):
+            return
+        
         try:
             cursor = self.database.connection.cursor()
-            cursor.execute('''
+            cursor.execute("SELECT cost_price, selling_price, current_stock FROM products WHERE id = ?", (product_id,))
+            old_cost, old_price, old_stock = cursor.fetchone()
+            
+            self.database.write(lambda cursor: cursor.execute('''
                 UPDATE products 
                 SET name = ?, category = ?, cost_price = ?, selling_price = ?, 
-                    current_stock = ?, min_stock = ?
+                    current_stock = ?, min_stock = ?, version = version + 1
                 WHERE id = ?
-            ''', (name, category, cost_price, selling_price, current_stock, min_stock, product_id))
+            ''', (name, category, cost_price, selling_price, current_stock, min_stock, product_id)))
             
-            self.database.connection.commit()
+            self.stock_ledger.refresh_product(product_id)
+            self.audit('product.update', 'product', product_id, {
+                'cost_price': [old_cost, cost_price],
+                'selling_price': [old_price, selling_price],
+                'current_stock': [old_stock, current_stock]
+            })
             QMessageBox.information(self, "موفق", "محصول با موفقیت بروزرسانی شد")
             dialog.accept()
             self.load_products()
@@ -1542,6 +1528,9 @@ class CompleteAccountingSystem(QMainWindow):
     # ==================== متدهای سخت‌افزار ====================
     
     def connect_card_reader(self):
+        if not self.check_permission('hardware.manage'):
+            return
+        
         success, message = self.card_reader.connect()
         if success:
             QMessageBox.information(self, "اتصال", message)
@@ -1550,6 +1539,9 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.warning(self, "خطا", message)
     
     def test_card_payment(self):
+        if not self.check_permission('hardware.manage'):
+            return
+        
         if not self.card_reader.is_connected:
             QMessageBox.warning(self, "خطا", "لطفاً ابتدا کارتخوان را متصل کنید")
             return
@@ -1583,13 +1575,40 @@ class CompleteAccountingSystem(QMainWindow):
         QTimer.singleShot(1000, process_payment)
     
     def connect_barcode_reader(self):
-        success, message = self.barcode_reader.connect()
-        if success:
-            QMessageBox.information(self, "اتصال", message)
-        else:
+        if not self.check_permission('hardware.manage'):
+            return
+        
+        port = self.barcode_port_edit.text().strip()
+        # اسکن‌های دستگاه از نخ خواننده مستقیم وارد صف اسکن می‌شوند؛ پورت در همان نخ باز می‌شود
+        self.barcode_port = port
+        self.barcode_online = False
+        success, message = self.barcode_reader.connect(port or None, self.scan_queue.submit,
+                                                       on_status=self.barcode_status.emit)
+        if not success:
             QMessageBox.warning(self, "خطا", message)
+        elif port:
+            self.show_toast(message)
+        else:
+            QMessageBox.information(self, "اتصال", message)
+    
+    def on_barcode_status(self, connected, error):
+        port = self.barcode_port
+        if connected:
+            self.barcode_online = True
+            self.database.set_setting('barcode_port', port, wait=False)
+            self.show_toast(f"بارکدخوان متصل شد ({port})")
+            return
+        
+        if not self.barcode_online:
+            # پورت نادرست: هرگز باز نشده، پس تلاش دوباره بی‌فایده است
+            self.barcode_reader.disconnect()
+        # قطع دستگاه پس از اتصال: خواننده با تأخیر نمایی دوباره تلاش می‌کند و اتصال بعدی هم اعلام می‌شود
+        QMessageBox.warning(self, "خطا", f"خطا در اتصال به بارکدخوان ({port}): {error}")
     
     def scan_barcode(self):
+        if not self.check_permission('pos.sell'):
+            return
+        
         if not self.barcode_reader.is_connected:
             QMessageBox.warning(self, "خطا", "لطفاً ابتدا بارکدخوان را متصل کنید")
             return
@@ -1598,14 +1617,14 @@ class CompleteAccountingSystem(QMainWindow):
         success, result = self.barcode_reader.read_barcode()
         
         if success:
-            # افزودن محصول به سبد خرید
-            self.add_to_cart_real(result['product_id'])
-            QMessageBox.information(self, "اسکن موفق", 
-                                  f"محصول اسکن شد: {result['name']}\nقیمت: {result['price']:,} تومان")
+            self.scan_queue.submit(result['sku'])
         else:
-            QMessageBox.warning(self, "خطا", result)
+            self.show_toast(result, error=True)
     
     def test_barcode_scan(self):
+        if not self.check_permission('hardware.manage'):
+            return
+        
         success, result = self.barcode_reader.read_barcode()
         
         if success:
@@ -1615,6 +1634,9 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.warning(self, "خطا", result)
     
     def test_printer(self):
+        if not self.check_permission('hardware.manage'):
+            return
+        
         test_data = {
             'invoice_number': 'TEST-001',
             'items': [{'name': 'آیتم تست', 'quantity': 1, 'price': 10000, 'total': 10000}],
@@ -1631,141 +1653,265 @@ class CompleteAccountingSystem(QMainWindow):
         else:
             QMessageBox.warning(self, "خطا", message)
 
+    def reprint_invoice(self):
+        if not self.check_permission('reports.sales.view'):
+            return
+        
+        invoice_number, ok = QInputDialog.getText(self, "🖨️ چاپ مجدد فاکتور", "شماره فاکتور:")
+        if not ok or not invoice_number.strip():
+            return
+        
+        success, message = self.invoice_renderer.reprint(invoice_number.strip(), self.printer_system)
+        if success:
+            self.audit('invoice.reprint', 'invoice', invoice_number.strip())
+            QMessageBox.information(self, "چاپ مجدد", message)
+        else:
+            QMessageBox.warning(self, "خطا", message)
+
     # ==================== متدهای موجود (بقیه کد) ====================
     
+    def audit(self, action, entity_type=None, entity_id=None, details=None):
+        self.audit_log.log(action, username=self.current_user['username'] if self.current_user else None,
+                           entity_type=entity_type, entity_id=entity_id, details=details)
+    
+    def check_permission(self, permission):
+        # هر عملیات حساس نشست و توکن را بررسی می‌کند؛ توکن‌های معتبر از حافظه نهان خوانده می‌شوند
+        if self.auth_system.get_session_user(self.current_token) is None:
+            QMessageBox.warning(self, "نشست منقضی شد", "نشست شما منقضی شده است. لطفاً دوباره وارد شوید")
+            self.end_session()
+            return False
+        if self.permissions and self.permissions.has_permission(permission):
+            return True
+        QMessageBox.warning(self, "عدم دسترسی", "شما دسترسی لازم برای این عملیات را ندارید")
+        return False
+    
     def load_all_data(self):
-        self.load_transactions()
-        self.load_products()
-        self.load_pos_products()
-        self.load_customers()
-        self.load_tax_data()
+        # فقط تب جاری فوراً بروز می‌شود؛ بقیه در نمایش بعدی بارگذاری می‌شوند
+        for key in self.built_tabs:
+            loader = self.tab_specs[key][2]
+            if not loader:
+                continue
+            if key == self.current_tab_key:
+                loader()
+            else:
+                self.stale_tabs.add(key)
     
     def load_transactions(self):
-        cursor = self.database.connection.cursor()
-        cursor.execute('SELECT transaction_number, date, type, description, amount, status FROM transactions ORDER BY date DESC')
-        transactions = cursor.fetchall()
+        if 'accounting' not in self.built_tabs:
+            return
         
-        self.transactions_table.setRowCount(len(transactions))
-        for row, trans in enumerate(transactions):
-            for col, value in enumerate(trans):
-                self.transactions_table.setItem(row, col, QTableWidgetItem(str(value)))
-        self.transactions_table.resizeColumnsToContents()
+        self.stream_table('accounting', self.transactions_table, self.transactions.stream_recent(),
+                          self.fill_transaction_row, self.transactions.count())
+    
+    def fill_transaction_row(self, row, trans):
+        values = (trans.transaction_number, trans.date, trans.type, trans.description, trans.amount, trans.status)
+        for col, value in enumerate(values):
+            self.transactions_table.setItem(row, col, QTableWidgetItem(str(value)))
     
     def load_products(self):
-        cursor = self.database.connection.cursor()
-        cursor.execute("SELECT sku, name, category, cost_price, selling_price, current_stock, min_stock FROM products")
-        products = cursor.fetchall()
+        if 'inventory' not in self.built_tabs:
+            return
         
-        self.products_table.setRowCount(len(products))
-        for row, product in enumerate(products):
-            for col, value in enumerate(product):
-                self.products_table.setItem(row, col, QTableWidgetItem(str(value)))
-        self.products_table.resizeColumnsToContents()
+        self.stream_table('inventory', self.products_table, self.products.stream_all(),
+                          self.fill_product_row, self.products.count())
+    
+    def fill_product_row(self, row, product):
+        values = (product.sku, product.name, product.category, product.cost_price,
+                  product.selling_price, product.current_stock, product.min_stock)
+        for col, value in enumerate(values):
+            self.products_table.setItem(row, col, QTableWidgetItem(str(value)))
     
     def load_pos_products(self):
-        cursor = self.database.connection.cursor()
-        cursor.execute("SELECT id, sku, name, selling_price, current_stock, category FROM products WHERE current_stock > 0")
-        products = cursor.fetchall()
-        
-        self.pos_products_table.setRowCount(len(products))
-        
-        for row, product in enumerate(products):
-            self.pos_products_table.setItem(row, 0, QTableWidgetItem(str(product[1])))
-            self.pos_products_table.setItem(row, 1, QTableWidgetItem(str(product[2])))
-            self.pos_products_table.setItem(row, 2, QTableWidgetItem(f"{product[3]:,}"))
-            self.pos_products_table.setItem(row, 3, QTableWidgetItem(str(product[4])))
-            self.pos_products_table.setItem(row, 4, QTableWidgetItem(str(product[5])))
-            
-            add_btn = QPushButton('➕ اضافه')
-            add_btn.clicked.connect(lambda checked, p_id=product[0]: self.add_to_cart_real(p_id))
-            self.pos_products_table.setCellWidget(row, 5, add_btn)
+        if 'pos' not in self.built_tabs:
+            return
         
-        self.pos_products_table.resizeColumnsToContents()
+        # کاتالوگ با تغییرات دفتر موجودی بروز است؛ اینجا فقط نما دوباره ساخته می‌شود
+        self.catalog_model.refresh()
+    
+    def on_stock_changed(self, changed, membership_changed):
+        # دفتر موجودی کاتالوگ را بروز کرده است؛ اینجا فقط نما
+        if self.catalog_model is None:
+            return
+        if changed is None or membership_changed:
+            self.catalog_model.refresh()
+        elif changed:
+            self.catalog_model.rows_changed(changed)
     
     def load_customers(self):
-        cursor = self.database.connection.cursor()
-        cursor.execute('''
-            SELECT customer_code, name, type, phone, email, credit_limit, current_balance, is_active
-            FROM customers
-        ''')
-        customers = cursor.fetchall()
-        
-        self.customers_table.setRowCount(len(customers))
-        for row, customer in enumerate(customers):
-            for col, value in enumerate(customer):
-                item = QTableWidgetItem(str(value))
-                
-                # رنگ‌آمیزی وضعیت
-                if col == 7:  # ستون وضعیت
-                    item.setBackground(QColor('#27ae60') if value else QColor('#e74c3c'))
-                    item.setText("فعال" if value else "غیرفعال")
-                
-                self.customers_table.setItem(row, col, item)
+        if 'customers' not in self.built_tabs:
+            return
         
-        self.customers_table.resizeColumnsToContents()
+        self.stream_table('customers', self.customers_table, self.customers.stream_all(),
+                          self.fill_customer_row, self.customers.count())
     
-    def load_tax_data(self):
-        cursor = self.database.connection.cursor()
-        cursor.execute("SELECT tax_name, tax_rate, id FROM tax_settings WHERE is_active = 1")
-        taxes = cursor.fetchall()
-        
-        self.tax_table.setRowCount(len(taxes))
-        for row, (tax_name, tax_rate, tax_id) in enumerate(taxes):
-            self.tax_table.setItem(row, 0, QTableWidgetItem(tax_name))
-            self.tax_table.setItem(row, 1, QTableWidgetItem(f"{tax_rate}%"))
+    def fill_customer_row(self, row, customer):
+        values = (customer.customer_code, customer.name, customer.type, customer.phone, customer.email,
+                  customer.credit_limit, customer.current_balance, customer.is_active)
+        for col, value in enumerate(values):
+            item = QTableWidgetItem(str(value))
             
-            delete_btn = QPushButton('🗑️ حذف')
-            delete_btn.clicked.connect(lambda checked, tid=tax_id: self.delete_tax(tid))
-            self.tax_table.setCellWidget(row, 2, delete_btn)
+            # رنگ‌آمیزی وضعیت
+            if col == 7:  # ستون وضعیت
+                item.setBackground(QColor('#27ae60') if value else QColor('#e74c3c'))
+                item.setText("فعال" if value else "غیرفعال")
+            
+            self.customers_table.setItem(row, col, item)
+    
+    def load_tax_data(self):
+        if 'tax' not in self.built_tabs:
+            return
         
-        self.tax_table.resizeColumnsToContents()
+        self.stream_table('tax', self.tax_table, self.tax_system.repository.stream_active(), self.fill_tax_row)
+    
+    def fill_tax_row(self, row, tax):
+        self.tax_table.setItem(row, 0, QTableWidgetItem(tax.tax_name))
+        self.tax_table.setItem(row, 1, QTableWidgetItem(f"{tax.tax_rate}%"))
+        self.tax_table.setItem(row, 2, action_item(tax.id))
+    
+    def stream_table(self, key, table, batches, fill_row, total=0):
+        # بارگذاری قبلی همان جدول لغو می‌شود تا دو جریان روی یک جدول ننویسند
+        previous = self.table_loaders.pop(key, None)
+        if previous:
+            previous.cancel()
+        
+        loader = StreamingTableLoader(table, batches, fill_row, total, self)
+        self.table_loaders[key] = loader
+        loader.progress.connect(self.update_load_progress)
+        loader.finished.connect(lambda: self.finish_table_load(key, loader))
+        loader.start()
+    
+    def finish_table_load(self, key, loader):
+        if self.table_loaders.get(key) is loader:
+            del self.table_loaders[key]
+        if not self.table_loaders and self.load_progress:
+            self.load_progress.hide()
+    
+    def update_load_progress(self, loaded, total):
+        # نوار پیشرفت فقط برای بارگذاری‌های بیش از یک دسته
+        if not total or loaded >= total:
+            return
+        if self.load_progress is None:
+            self.load_progress = QProgressBar()
+            self.load_progress.setMaximumWidth(250)
+            self.load_progress.setFormat("بارگذاری %v از %m")
+            self.statusBar().addPermanentWidget(self.load_progress)
+        self.load_progress.setRange(0, total)
+        self.load_progress.setValue(loaded)
+        self.load_progress.show()
     
     def search_products(self):
-        search_text = self.product_search.text().lower()
-        for row in range(self.pos_products_table.rowCount()):
-            product_name = self.pos_products_table.item(row, 1).text().lower()
-            if search_text in product_name:
-                self.pos_products_table.setRowHidden(row, False)
-            else:
-                self.pos_products_table.setRowHidden(row, True)
+        self.catalog_model.set_filter(self.product_search.text())
     
     def add_to_cart_real(self, product_id):
+        if not self.check_permission('pos.sell'):
+            return
+        
         success, message = self.pos_system.add_to_cart(product_id)
-        if success:
-            self.update_cart_display()
-            QMessageBox.information(self, "سبد خرید", message)
-        else:
-            QMessageBox.warning(self, "خطا", message)
+        self.show_toast(message, error=not success)
+    
+    def submit_scan_input(self):
+        text = self.scan_input.text()
+        self.scan_input.clear()
+        self.scan_queue.submit(text)
     
-    def update_cart_display(self):
-        self.cart_table.setRowCount(len(self.pos_system.current_cart))
+    def process_scan_queue(self):
+        # زیر دیالوگ پرداخت یا هر پنجره مودال دیگر سبد تغییر نمی‌کند؛ اسکن‌ها در صف می‌مانند
+        if QApplication.activeModalWidget():
+            return
         
-        for row, item in enumerate(self.pos_system.current_cart):
-            self.cart_table.setItem(row, 0, QTableWidgetItem(item['name']))
-            self.cart_table.setItem(row, 1, QTableWidgetItem(str(item['quantity'])))
-            self.cart_table.setItem(row, 2, QTableWidgetItem(f"{item['unit_price']:,}"))
-            self.cart_table.setItem(row, 3, QTableWidgetItem(f"{item['total']:,}"))
-            
-            delete_btn = QPushButton('🗑️ حذف')
-            delete_btn.clicked.connect(lambda checked, p_id=item['product_id']: self.remove_from_cart_real(p_id))
-            self.cart_table.setCellWidget(row, 4, delete_btn)
+        scans = self.scan_queue.drain()
+        if not scans:
+            return
+        
+        if self.pos_system is None or 'pos' not in self.tab_specs:
+            self.show_toast("شما دسترسی فروش ندارید", error=True)
+            return
+        
+        # اسکن در هر تبی صفحه فروش را جلو می‌آورد
+        if self.current_tab_key != 'pos':
+            self.tab_widget.setCurrentIndex(self.tab_index('pos'))
         
+        results = self.pos_system.add_scans(scans)
+        added = [result for result in results if result[2]]
+        failed = [result for result in results if not result[2]]
+        
+        if failed:
+            QApplication.beep()
+            self.show_toast(" | ".join(result[3] for result in failed), error=True)
+        elif len(added) == 1:
+            self.show_toast(added[0][3])
+        else:
+            self.show_toast(f"{sum(result[1] for result in added)} کالا به سبد خرید اضافه شد")
+    
+    def show_toast(self, message, error=False, duration=2500):
+        # پیام غیرمسدودکننده پایین پنجره، بدون گرفتن فوکوس از ورودی اسکن
+        if self.toast_label is None:
+            self.toast_label = QLabel(self)
+            self.toast_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+            self.toast_label.setAlignment(Qt.AlignCenter)
+            self.toast_timer = QTimer(self)
+            self.toast_timer.setSingleShot(True)
+            self.toast_timer.timeout.connect(self.toast_label.hide)
+        
+        color = '#c0392b' if error else '#27ae60'
+        self.toast_label.setStyleSheet(f"background: {color}; color: white; font-size: 14px; font-weight: bold; "
+                                       f"padding: 10px 20px; border-radius: 8px;")
+        self.toast_label.setText(message)
+        self.toast_label.adjustSize()
+        self.toast_label.move((self.width() - self.toast_label.width()) // 2,
+                              self.height() - self.toast_label.height() - 30)
+        self.toast_label.show()
+        self.toast_label.raise_()
+        self.toast_timer.start(duration)
+    
+    def on_cart_changed(self, event, row, item=None):
+        self.cart_model.apply_change(event, row, item)
         self.total_label.setText(f"{self.pos_system.cart_total:,} تومان")
-        self.cart_table.resizeColumnsToContents()
     
     def remove_from_cart_real(self, product_id):
+        if not self.check_permission('pos.sell'):
+            return
+        
         success, message = self.pos_system.remove_from_cart(product_id)
-        if success:
-            self.update_cart_display()
-            QMessageBox.information(self, "سبد خرید", message)
+        self.show_toast(message, error=not success)
     
     def clear_cart_real(self):
+        if not self.check_permission('pos.sell'):
+            return
+        
         success, message = self.pos_system.clear_cart()
-        if success:
-            self.update_cart_display()
-            QMessageBox.information(self, "سبد خرید", message)
+        self.show_toast(message, error=not success)
+    
+    def close_register(self):
+        if not self.check_permission('pos.sell'):
+            return
+        
+        if self.pos_system.current_cart:
+            QMessageBox.warning(self, "خطا", "پیش از بستن صندوق سبد خرید را تسویه یا پاک کنید")
+            return
+        
+        day = datetime.now().strftime('%Y-%m-%d')
+        reply = QMessageBox.question(self, "بستن صندوق",
+                                     f"گزارش Z صندوق {self.pos_system.terminal} برای روز {day} ثبت شود؟\n"
+                                     "پس از ثبت، این گزارش قابل تغییر نیست.")
+        if reply != QMessageBox.Yes:
+            return
+        
+        success, result = self.z_reports.close_register(day, self.pos_system.terminal,
+                                                        self.current_user['username'],
+                                                        self.current_user['username'])
+        if not success:
+            QMessageBox.warning(self, "خطا", result)
+            return
+        
+        self.audit('pos.z_report', 'z_report', result['id'],
+                   {'terminal': result['terminal'], 'net_amount': result['net_amount']})
+        QMessageBox.information(self, "گزارش Z", self.z_reports.format_report(result))
     
     def process_payment_real(self):
+        if not self.check_permission('pos.sell'):
+            return
+        
         if not self.pos_system.current_cart:
             QMessageBox.warning(self, "خطا", "سبد خرید خالی است!")
             return
@@ -1828,6 +1974,9 @@ class CompleteAccountingSystem(QMainWindow):
         dialog.exec_()
     
     def finalize_payment(self, payment_method, discount, should_print, dialog):
+        if not self.check_permission('pos.sell'):
+            return
+        
         success, result = self.pos_system.process_payment(payment_method, discount)
         
         if success:
@@ -1860,127 +2009,67 @@ class CompleteAccountingSystem(QMainWindow):
                 receipt_text += f"\n🖨️ فاکتور چاپ شد"
             
             QMessageBox.information(self, "پرداخت موفق", receipt_text)
-            self.update_cart_display()
             self.load_all_data()
         else:
             QMessageBox.critical(self, "خطای پرداخت", result)
 
     def generate_sales_report(self):
-        cursor = self.database.connection.cursor()
-        
-        # آمار فروش
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_invoices,
-                SUM(final_amount) as total_sales,
-                AVG(final_amount) as avg_sale,
-                MAX(final_amount) as max_sale
-            FROM invoices 
-            WHERE status = 'paid'
-        ''')
-        stats = cursor.fetchone()
-        
-        # محصولات پرفروش
-        cursor.execute('''
-            SELECT p.name, SUM(ii.quantity) as total_sold
-            FROM invoice_items ii
-            JOIN products p ON ii.product_id = p.id
-            GROUP BY p.name
-            ORDER BY total_sold DESC
-            LIMIT 5
-        ''')
-        top_products = cursor.fetchall()
-        
-        report = f"""
-        📊 گزارش جامع فروش
-        ─────────────────────────────
-        📈 آمار کلی:
-        • تعداد فاکتورها: {stats[0]:,}
-        • مجموع فروش: {stats[1]:,} تومان
-        • میانگین هر فاکتور: {stats[2]:,.0f} تومان
-        • بیشترین فروش: {stats[3]:,} تومان
-        
-        🏆 محصولات پرفروش:
-        """
-        
-        for i, (product, quantity) in enumerate(top_products, 1):
-            report += f"\n{i}. {product}: {quantity:,} عدد"
+        if not self.check_permission('reports.sales.view'):
+            return
         
-        self.report_text.setText(report)
+        self.report_text.setText(self.reports.sales_report())
 
     def generate_financial_report(self):
-        cursor = self.database.connection.cursor()
-        
-        # تراکنش‌های مالی
-        cursor.execute('''
-            SELECT type, COUNT(*), SUM(amount)
-            FROM transactions 
-            GROUP BY type
-        ''')
-        transactions = cursor.fetchall()
-        
-        # موجودی حساب‌ها
-        cursor.execute('''
-            SELECT name, balance 
-            FROM accounts 
-            WHERE is_active = 1
-        ''')
-        accounts = cursor.fetchall()
-        
-        report = """
-        💹 گزارش وضعیت مالی
-        ─────────────────────────────
-        💰 تراکنش‌ها بر اساس نوع:
-        """
+        if not self.check_permission('reports.financial.view'):
+            return
         
-        for trans_type, count, amount in transactions:
-            report += f"\n• {trans_type}: {count:,} تراکنش - {amount:,} تومان"
+        self.report_text.setText(self.reports.financial_report())
+
+    def generate_balance_as_of_report(self):
+        if not self.check_permission('reports.financial.view'):
+            return
         
-        report += "\n\n🏦 موجودی حساب‌ها:"
-        total_balance = 0
-        for name, balance in accounts:
-            report += f"\n• {name}: {balance:,} تومان"
-            total_balance += balance
+        as_of, ok = QInputDialog.getText(self, "📅 تراز در تاریخ", "تاریخ (YYYY-MM-DD):",
+                                         text=datetime.now().strftime('%Y-%m-%d'))
+        if not ok:
+            return
         
-        report += f"\n\n💰 مجموع موجودی: {total_balance:,} تومان"
+        try:
+            datetime.strptime(as_of, '%Y-%m-%d')
+        except ValueError:
+            QMessageBox.warning(self, "خطا", "قالب تاریخ نامعتبر است")
+            return
         
-        self.report_text.setText(report)
+        self.report_text.setText(self.reports.balance_as_of_report(as_of))
 
     def generate_inventory_report(self):
-        cursor = self.database.connection.cursor()
-        
-        # محصولات کم‌موجود
-        cursor.execute('''
-            SELECT name, current_stock, min_stock
-            FROM products 
-            WHERE current_stock <= min_stock AND is_active = 1
-        ''')
-        low_stock = cursor.fetchall()
-        
-        # ارزش موجودی
-        cursor.execute('''
-            SELECT SUM(current_stock * cost_price)
-            FROM products
-        ''')
-        total_value = cursor.fetchone()[0] or 0
+        if not self.check_permission('reports.inventory.view'):
+            return
         
-        report = f"""
-        📦 گزارش وضعیت انبار
-        ─────────────────────────────
-        💰 ارزش کل موجودی: {total_value:,} تومان
+        self.report_text.setText(self.reports.inventory_report())
+
+    def generate_z_report(self):
+        if not self.check_permission('reports.sales.view'):
+            return
         
-        ⚠️  محصولات نیازمند سفارش:
-        """
+        day, ok = QInputDialog.getText(self, "🧾 گزارش‌های Z", "تاریخ (YYYY-MM-DD):",
+                                       text=datetime.now().strftime('%Y-%m-%d'))
+        if not ok:
+            return
         
-        if low_stock:
-            for name, current, minimum in low_stock:
-                report += f"\n• {name}: موجودی {current} (حداقل: {minimum})"
-        else:
-            report += "\n✅ همه محصولات موجودی کافی دارند"
+        try:
+            datetime.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            QMessageBox.warning(self, "خطا", "قالب تاریخ نامعتبر است")
+            return
         
-        self.report_text.setText(report)
+        # از گزارش‌های ذخیره‌شده، بدون محاسبه دوباره فاکتورها
+        self.report_text.setText(self.z_reports.day_report(day))
 
     def show_ai_analysis(self):
+        if not self.check_permission('reports.ai.view'):
+            return
+        
         # پیش‌بینی فروش با هوش مصنوعی
         predictions = self.ai_system.predict_sales(None, 7)
         
@@ -2004,6 +2093,9 @@ class CompleteAccountingSystem(QMainWindow):
         self.report_text.setText(report)
 
     def show_add_customer_dialog(self):
+        if not self.check_permission('customers.create'):
+            return
+        
         dialog = QDialog(self)
         dialog.setWindowTitle("➕ افزودن مشتری جدید")
         dialog.setFixedSize(400, 500)
@@ -2050,19 +2142,21 @@ class CompleteAccountingSystem(QMainWindow):
         dialog.exec_()
 
     def save_new_customer(self, code, name, type, phone, email, credit_limit, dialog):
+        if not self.check_permission('customers.create'):
+            return
+        
         if not all([code, name]):
             QMessageBox.warning(self, "خطا", "پر کردن فیلدهای الزامی ضروری است")
             return
         
         try:
-            cursor = self.database.connection.cursor()
-            cursor.execute('''
+            self.database.write(lambda cursor: cursor.execute('''
                 INSERT INTO customers 
                 (customer_code, name, type, phone, email, credit_limit, current_balance)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (code, name, type, phone, email, credit_limit, 0))
+            ''', (code, name, type, phone, email, credit_limit, 0)))
             
-            self.database.connection.commit()
+            self.audit('customer.create', 'customer', code, {'name': name, 'credit_limit': credit_limit})
             QMessageBox.information(self, "موفق", "مشتری جدید با موفقیت اضافه شد")
             dialog.accept()
             self.load_customers()
@@ -2071,6 +2165,9 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.critical(self, "خطا", f"خطا در ذخیره مشتری: {str(e)}")
 
     def add_tax(self):
+        if not self.check_permission('tax.edit'):
+            return
+        
         tax_name = self.tax_name_edit.text()
         tax_rate = self.tax_rate_edit.value()
         
@@ -2079,12 +2176,11 @@ class CompleteAccountingSystem(QMainWindow):
             return
         
         try:
-            cursor = self.database.connection.cursor()
-            cursor.execute('''
+            tax_id = self.database.write(lambda cursor: cursor.execute('''
                 INSERT INTO tax_settings (tax_name, tax_rate) VALUES (?, ?)
-            ''', (tax_name, tax_rate))
+            ''', (tax_name, tax_rate)).lastrowid)
             
-            self.database.connection.commit()
+            self.audit('tax.create', 'tax', tax_id, {'tax_name': tax_name, 'tax_rate': tax_rate})
             QMessageBox.information(self, "موفق", "مالیات جدید با موفقیت اضافه شد")
             self.tax_name_edit.clear()
             self.tax_rate_edit.setValue(0)
@@ -2095,6 +2191,9 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.critical(self, "خطا", f"خطا در افزودن مالیات: {str(e)}")
     
     def update_tax(self):
+        if not self.check_permission('tax.edit'):
+            return
+        
         # برای سادگی، اولین مالیات را بروزرسانی می‌کند
         tax_name = self.tax_name_edit.text()
         tax_rate = self.tax_rate_edit.value()
@@ -2104,7 +2203,9 @@ class CompleteAccountingSystem(QMainWindow):
             return
         
         try:
+            old_rate = self.tax_system.tax_rates.get(tax_name)
             self.tax_system.update_tax_rate(tax_name, tax_rate)
+            self.audit('tax.update', 'tax', tax_name, {'tax_rate': [old_rate, tax_rate]})
             QMessageBox.information(self, "موفق", "نرخ مالیات با موفقیت بروزرسانی شد")
             self.load_tax_data()
             
@@ -2112,15 +2213,18 @@ class CompleteAccountingSystem(QMainWindow):
             QMessageBox.critical(self, "خطا", f"خطا در بروزرسانی مالیات: {str(e)}")
     
     def delete_tax(self, tax_id):
+        if not self.check_permission('tax.edit'):
+            return
+        
         reply = QMessageBox.question(self, "حذف مالیات", 
                                    "آیا از حذف این مالیات اطمینان دارید؟",
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
             try:
-                cursor = self.database.connection.cursor()
-                cursor.execute("UPDATE tax_settings SET is_active = 0 WHERE id = ?", (tax_id,))
-                self.database.connection.commit()
+                self.database.write(lambda cursor: cursor.execute(
+                    "UPDATE tax_settings SET is_active = 0 WHERE id = ?", (tax_id,)))
+                self.audit('tax.delete', 'tax', tax_id)
                 QMessageBox.information(self, "موفق", "مالیات با موفقیت حذف شد")
                 self.load_tax_data()
                 self.tax_system.load_tax_rates()
@@ -2133,13 +2237,37 @@ class CompleteAccountingSystem(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            self.current_user = None
-            self.current_token = None
-            self.show_login_page()
+            self.end_session()
+    
+    def end_session(self):
+        if self.pos_system:
+            self.pos_system.clear_cart()
+            self.pos_system = None
+        self.auth_system.logout(self.current_token)
+        self.current_user = None
+        self.current_token = None
+        # بارگذاری‌های جریانی نیمه‌کاره روی جدول‌های صفحه قبلی ننویسند
+        for loader in self.table_loaders.values():
+            loader.cancel()
+        self.table_loaders.clear()
+        if self.load_progress:
+            self.load_progress.hide()
+        self.show_login_page()
+
+    def closeEvent(self, event):
+        self.barcode_reader.disconnect()
+        self.ledger.stop_verifier()
+        self.audit_log.close()
+        self.receipt_journal.close()
+        self.database.close()
+        super().closeEvent(event)
 
 # ==================== راه‌اندازی برنامه ====================
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    # با ACCOUNTING_PROFILE=مسیر_فایل پروفایلر فعال و trace در پایان ذخیره می‌شود
+    trace_path = os.environ.get('ACCOUNTING_PROFILE')
+    profiler = UIProfiler() if trace_path else None
+    app = ProfiledApplication(sys.argv, profiler) if profiler else QApplication(sys.argv)
     
     # تنظیم فونت فارسی (اصلاح شده)
     font = QFont()
@@ -2148,7 +2276,11 @@ if __name__ == '__main__':
     app.setFont(font)
     
     # ایجاد و نمایش برنامه
-    window = CompleteAccountingSystem()
+    window = CompleteAccountingSystem(profiler=profiler)
     window.show()
     
-    sys.exit(app.exec_())
\ No newline at end of file
+    exit_code = app.exec_()
+    if profiler:
+        profiler.stop()
+        print(f"📄 trace رابط کاربری در {profiler.export_chrome_trace(trace_path)} ذخیره شد")
+    sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,246 @@
+import os
+import sys
+import io
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+# اجرای بدون نمایشگر برای بخش‌های رابط کاربری
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import core
+from data_generator import SyntheticDataGenerator
+
+SIZES = {
+    '10k': 10000,
+    '1m': 1000000,
+    '10m': 10000000
+}
+
+# ==================== اندازه‌گیری ====================
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    # روش nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(func, iterations, warmup=3):
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p95_ms': percentile(samples, 0.95) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'max_ms': samples[-1] * 1000,
+        'throughput_ops': iterations / elapsed if elapsed else 0
+    }
+
+
+# ==================== سناریوها ====================
+def core_cases(database, iterations):
+    auth = core.AdvancedSecuritySystem()
+    success, login = auth.login('admin', 'Admin123!')
+    pos = core.CompletePOSSystem(database, login['user'])
+
+    cursor = database.connection.cursor()
+    cursor.execute("SELECT id, sku FROM products WHERE current_stock > 100 LIMIT 1000")
+    products = cursor.fetchall()
+    rng = random.Random(7)
+
+    pos.barcode_reader.connect()
+    tax_system = core.TaxSystem(database)
+
+    def add_to_cart():
+        if len(pos.current_cart) >= 20:
+            pos.clear_cart(void=False)
+        pos.add_to_cart(rng.choice(products)[0])
+
+    def process_payment():
+        for _ in range(3):
+            pos.add_to_cart(rng.choice(products)[0])
+        success, result = pos.process_payment('نقدی')
+        if not success:
+            raise RuntimeError(result)
+
+    results = {
+        'pos.add_to_cart': measure(add_to_cart, iterations),
+        'pos.process_payment': measure(process_payment, max(iterations // 10, 10)),
+        'barcode.read_barcode': measure(lambda: pos.barcode_reader.read_barcode(rng.choice(products)[1]), iterations),
+        'tax.calculate_total_tax': measure(lambda: tax_system.calculate_total_tax(rng.randint(1000, 10 ** 8)), iterations * 10)
+    }
+    pos.clear_cart(void=False)
+    return results
+
+
+def ui_cases(db_path, iterations):
+    # رابط کاربری فقط در همین سناریوها بارگذاری می‌شود
+    import account
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    window = account.CompleteAccountingSystem(db_path)
+    success, login = window.auth_system.login('admin', 'Admin123!')
+
+    ui_iterations = max(iterations // 100, 3)
+
+    def load_table(load):
+        # بارگذاری جریانی تا پر شدن کامل جدول‌ها سنجیده می‌شود
+        def run():
+            load()
+            while window.table_loaders:
+                app.processEvents()
+        return run
+
+    # از ورود تا نمایش اولین تب؛ بقیه تب‌ها تنبل ساخته می‌شوند
+    start_session = measure(lambda: window.start_session(login), ui_iterations, warmup=1)
+    for key in ('accounting', 'inventory', 'reports'):
+        window.ensure_tab(key)
+
+    results = {
+        'ui.start_session': start_session,
+        'reports.generate_sales_report': measure(window.generate_sales_report, ui_iterations, warmup=1),
+        'reports.generate_financial_report': measure(window.generate_financial_report, ui_iterations, warmup=1),
+        'reports.generate_inventory_report': measure(window.generate_inventory_report, ui_iterations, warmup=1),
+        'ui.load_transactions': measure(load_table(window.load_transactions), ui_iterations, warmup=1),
+        'ui.load_products': measure(load_table(window.load_products), ui_iterations, warmup=1)
+    }
+    window.close()
+    app.processEvents()
+    return results
+
+
+def memory_cases(database):
+    # حافظه دفتر موجودی پس از بارگذاری همه محصولات؛ کاتالوگ ستونی تنها محل نگهداری آن‌هاست
+    tracemalloc.start()
+    stock_ledger = core.StockLedgerSystem(database)
+    traced, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    products = stock_ledger.catalog.size
+    return {
+        'products': products,
+        'stock_ledger_bytes': traced,
+        'stock_ledger_peak_bytes': peak,
+        'catalog_array_bytes': stock_ledger.catalog.nbytes(),
+        'bytes_per_product': traced / products if products else 0
+    }
+
+
+# ==================== مقایسه نتایج ====================
+def compare_results(current, baseline, threshold):
+    # افزایش p95 بیش از آستانه به عنوان پسرفت گزارش می‌شود
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous['p95_ms']:
+            continue
+        ratio = result['p95_ms'] / previous['p95_ms']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': name,
+                'baseline_p95_ms': previous['p95_ms'],
+                'current_p95_ms': result['p95_ms'],
+                'ratio': ratio
+            })
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='بنچمارک سیستم فروش، گزارشات و بارگذاری رابط کاربری')
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k', help='اندازه دیتابیس آزمایشی')
+    parser.add_argument('--db', help='مسیر دیتابیس؛ در صورت نبود ساخته می‌شود')
+    parser.add_argument('--iterations', type=int, default=500, help='تعداد تکرار هر سناریو')
+    parser.add_argument('--output', help='مسیر فایل JSON نتایج')
+    parser.add_argument('--compare', help='فایل JSON نتایج قبلی برای تشخیص پسرفت')
+    parser.add_argument('--threshold', type=float, default=0.2, help='آستانه پسرفت p95 (0.2 یعنی 20٪)')
+    parser.add_argument('--no-ui', action='store_true', help='بدون سناریوهای رابط کاربری')
+    args = parser.parse_args(argv)
+
+    rows = SIZES[args.size]
+    db_path = os.path.abspath(args.db or os.path.join(tempfile.gettempdir(), f"accounting_bench_{args.size}.db"))
+    output = os.path.abspath(args.output or f"benchmark_{args.size}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    # فاکتورهای چاپی و پیام‌های سیستم در پوشه موقت نوشته می‌شوند
+    workdir = tempfile.mkdtemp(prefix='accounting_bench_')
+    os.chdir(workdir)
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        is_new = not os.path.exists(db_path)
+        database = core.AdvancedDatabaseSystem(db_path)
+        if is_new:
+            SyntheticDataGenerator(database, seed=42).generate(rows)
+
+        results = core_cases(database, args.iterations)
+        memory = memory_cases(database)
+        if not args.no_ui:
+            results.update(ui_cases(db_path, args.iterations))
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': args.size,
+        'rows': rows,
+        'iterations': args.iterations,
+        'results': results,
+        'memory': memory
+    }
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'سناریو':40} {'p50':>10} {'p95':>10} {'p99':>10} {'ops/s':>12}")
+    for name, result in results.items():
+        print(f"{name:40} {result['p50_ms']:10.3f} {result['p95_ms']:10.3f} "
+              f"{result['p99_ms']:10.3f} {result['throughput_ops']:12.1f}")
+    print(f"🧠 حافظه دفتر موجودی: {memory['stock_ledger_bytes']:,} بایت برای {memory['products']:,} محصول "
+          f"({memory['bytes_per_product']:.0f} بایت برای هر محصول)")
+    print(f"📄 نتایج در {output} ذخیره شد")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold)
+        for item in regressions:
+            print(f"⚠️ پسرفت {item['case']}: p95 از {item['baseline_p95_ms']:.3f} به "
+                  f"{item['current_p95_ms']:.3f} میلی‌ثانیه ({item['ratio']:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,17 @@
+# هسته سیستم حسابداری بدون وابستگی به Qt؛ هوش مصنوعی جداگانه از core.ai بارگذاری می‌شود
+from core.security import SessionStore, TokenCache, PermissionMatcher, TokenBucketLimiter, AdvancedSecuritySystem
+from core.database import QueryMonitor, InstrumentedCursor, InstrumentedConnection, AdvancedDatabaseSystem
+from core.repositories import (Row, ProductRow, CustomerRow, InvoiceRow, InvoiceItemRow, TransactionRow, TaxRow,
+                               Repository, ProductRepository, CustomerRepository, InvoiceRepository,
+                               InvoiceItemRepository, TransactionRepository, TaxRepository)
+from core.audit import AuditLogSystem
+from core.devices import PrinterSystem, CardReaderSystem, BarcodeReaderSystem
+from core.tax import TaxSystem
+from core.inventory import StockLedgerSystem
+from core.ledger import LedgerSystem, PeriodCloseSystem
+from core.pos import ScanQueue, CompletePOSSystem
+from core.reports import ReportSystem
+from core.closing import ZReportSystem
+from core.rendering import TextReceiptTemplate, HtmlReceiptTemplate, PdfReceiptTemplate, InvoiceRenderSystem
+from core.receipts import ReceiptJournal
+from core.imports import ImportSystem
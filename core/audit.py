@@ -0,0 +1,145 @@
+import json
+import queue
+import threading
+from datetime import datetime
+
+# ==================== گزارش ممیزی ====================
+class AuditLogSystem:
+    DURABILITY_MODES = ('sync', 'batch', 'relaxed')
+    
+    def __init__(self, database, durability='batch', max_buffer=10000, batch_size=500, flush_interval=1.0):
+        if durability not in self.DURABILITY_MODES:
+            raise ValueError(f"حالت ماندگاری نامعتبر است: {durability}")
+        
+        self.database = database
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = queue.Queue(maxsize=max_buffer)
+        self.dropped = 0
+        self.written = 0
+        self.stop_event = threading.Event()
+        
+        self.writer_thread = None
+        if durability != 'sync':
+            self.writer_thread = threading.Thread(target=self.run_writer, daemon=True)
+            self.writer_thread.start()
+    
+    def log(self, action, username=None, entity_type=None, entity_id=None, details=None, ip_address=None):
+        event = (
+            datetime.now().isoformat(timespec='milliseconds'),
+            username,
+            action,
+            entity_type,
+            None if entity_id is None else str(entity_id),
+            json.dumps(details, ensure_ascii=False, default=str) if details is not None else None,
+            ip_address
+        )
+        
+        if self.durability == 'sync':
+            self.write_batch([event])
+            return
+        
+        try:
+            # نخ رابط کاربری هرگز پشت بافر پر نمی‌ماند
+            self.buffer.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ بافر گزارش ممیزی پر است؛ رویداد {action} ثبت نشد")
+    
+    def write_batch(self, events):
+        # از صف نوشتن مشترک و همراه تعهد گروهی بقیه نوشتن‌ها
+        future = self.database.submit_write(self.insert_events, events)
+        if self.durability == 'relaxed':
+            # سریع‌تر به قیمت از دست رفتن آخرین رویدادها در صورت قطع برنامه؛ منتظر تعهد نمی‌ماند
+            future.add_done_callback(self.report_failure)
+        else:
+            future.result(30)
+        self.written += len(events)
+    
+    def insert_events(self, cursor, events):
+        cursor.executemany('''
+            INSERT INTO audit_log 
+            (timestamp, username, action, entity_type, entity_id, details, ip_address)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', events)
+    
+    def report_failure(self, future):
+        if future.exception():
+            print(f"❌ خطا در نوشتن گزارش ممیزی: {future.exception()}")
+    
+    def drain(self):
+        events = []
+        while len(events) < self.batch_size:
+            try:
+                events.append(self.buffer.get_nowait())
+            except queue.Empty:
+                break
+        return events
+    
+    def run_writer(self):
+        # همه رویدادهای یک بازه با یک commit نوشته می‌شوند
+        while not self.stop_event.is_set():
+            try:
+                first = self.buffer.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            
+            self.stop_event.wait(self.flush_interval if self.buffer.qsize() < self.batch_size else 0)
+            events = [first] + self.drain()
+            try:
+                self.write_batch(events)
+            except Exception as e:
+                print(f"❌ خطا در نوشتن گزارش ممیزی: {e}")
+        self.flush()
+    
+    def flush(self):
+        events = self.drain()
+        while events:
+            self.write_batch(events)
+            events = self.drain()
+    
+    def close(self):
+        self.stop_event.set()
+        if self.writer_thread:
+            self.writer_thread.join(timeout=5)
+        else:
+            self.flush()
+        
+        try:
+            # صف نوشتن به ترتیب اجرا می‌شود؛ فرمان خالی یعنی آخرین دسته‌ها (حتی در حالت relaxed) تعهد شده‌اند
+            self.database.write(lambda cursor: None)
+        except Exception as e:
+            print(f"❌ خطا در نوشتن گزارش ممیزی: {e}")
+    
+    def query(self, username=None, entity_type=None, entity_id=None, start=None, end=None, action=None, limit=500):
+        conditions = []
+        params = []
+        
+        if username:
+            conditions.append("username = ?")
+            params.append(username)
+        if entity_type:
+            conditions.append("entity_type = ?")
+            params.append(entity_type)
+        if entity_id is not None:
+            conditions.append("entity_id = ?")
+            params.append(str(entity_id))
+        if action:
+            conditions.append("action = ?")
+            params.append(action)
+        if start:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            conditions.append("timestamp <= ?")
+            params.append(end)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self.database.connection.cursor()
+        cursor.execute(f'''
+            SELECT timestamp, username, action, entity_type, entity_id, details, ip_address
+            FROM audit_log {where}
+            ORDER BY timestamp DESC LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
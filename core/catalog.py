@@ -0,0 +1,126 @@
+import sys
+
+import numpy as np
+
+
+# ==================== کاتالوگ ستونی محصولات ====================
+class StringTable:
+    # هر رشته یک بار نگه داشته می‌شود و ستون‌ها فقط کد عددی آن را دارند
+    def __init__(self):
+        self.values = []
+        self.lowered = []
+        self.codes = {}
+    
+    def code(self, value):
+        value = value or ''
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+            self.lowered.append(value.lower())
+        return code
+    
+    def matching(self, text):
+        # جستجو روی رشته‌های یکتا؛ دسته‌ها و نام‌های تکراری یک بار بررسی می‌شوند
+        text = text.lower()
+        return np.array([code for code, value in enumerate(self.lowered) if text in value], dtype=np.int32)
+
+
+class ProductCatalog:
+    # تنها محل نگهداری محصولات فعال دفتر موجودی؛ هر فیلد یک آرایه numpy و رشته‌ها در جدول رشته‌ها
+    COLUMNS = {
+        'ids': np.int64,
+        'prices': np.float64,
+        'stock': np.int64,
+        'versions': np.int64,
+        'sku_codes': np.int32,
+        'name_codes': np.int32,
+        'category_codes': np.int32,
+        'active': np.bool_
+    }
+    
+    def __init__(self):
+        self.size = 0
+        self.reset(0)
+    
+    def reset(self, capacity):
+        self.skus = StringTable()
+        self.names = StringTable()
+        self.categories = StringTable()
+        self.row_of = {}
+        self.size = 0
+        for column, dtype in self.COLUMNS.items():
+            setattr(self, column, np.zeros(max(capacity, 64), dtype=dtype))
+    
+    def grow(self):
+        capacity = max(len(self.ids) * 2, 64)
+        for column, dtype in self.COLUMNS.items():
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[:self.size] = getattr(self, column)[:self.size]
+            setattr(self, column, grown)
+    
+    def append(self, product_id):
+        if self.size == len(self.ids):
+            self.grow()
+        index = self.size
+        self.size += 1
+        self.row_of[product_id] = index
+        self.ids[index] = product_id
+        return index
+    
+    def store(self, row):
+        # row: ProductRow مخزن؛ خروجی: (ردیف، آیا مجموعه ردیف‌های قابل نمایش عوض شد)
+        index = self.row_of.get(row.id)
+        if index is None:
+            index = self.append(row.id)
+            was_visible = False
+        else:
+            was_visible = self.visible(index)
+        self.prices[index] = row.selling_price or 0
+        self.stock[index] = row.current_stock or 0
+        self.versions[index] = row.version or 0
+        self.sku_codes[index] = self.skus.code(row.sku)
+        self.name_codes[index] = self.names.code(row.name)
+        self.category_codes[index] = self.categories.code(row.category)
+        self.active[index] = True
+        return index, self.visible(index) != was_visible
+    
+    def deactivate(self, product_id):
+        index = self.row_of.get(product_id)
+        if index is None or not self.active[index]:
+            return None, False
+        was_visible = self.visible(index)
+        self.active[index] = False
+        return index, was_visible
+    
+    def find(self, product_id):
+        index = self.row_of.get(product_id)
+        if index is None or not self.active[index]:
+            return None
+        return index
+    
+    def product(self, index):
+        # دیکشنری فقط برای خواننده ساخته می‌شود و نگه داشته نمی‌شود
+        return {
+            'id': int(self.ids[index]),
+            'sku': self.skus.values[self.sku_codes[index]],
+            'name': self.names.values[self.name_codes[index]],
+            'category': self.categories.values[self.category_codes[index]],
+            'price': float(self.prices[index]),
+            'stock': int(self.stock[index]),
+            'version': int(self.versions[index])
+        }
+    
+    def visible(self, index):
+        return bool(self.active[index] and self.stock[index] > 0)
+    
+    def visible_rows(self, text=''):
+        size = self.size
+        mask = self.active[:size] & (self.stock[:size] > 0)
+        if text:
+            mask &= (np.isin(self.name_codes[:size], self.names.matching(text)) |
+                     np.isin(self.sku_codes[:size], self.skus.matching(text)))
+        return np.flatnonzero(mask)
+    
+    def nbytes(self):
+        return sum(getattr(self, column).nbytes for column in self.COLUMNS)
@@ -0,0 +1,196 @@
+import os
+import sys
+import getpass
+import argparse
+from datetime import datetime
+
+from core.database import AdvancedDatabaseSystem
+from core.audit import AuditLogSystem
+from core.security import AdvancedSecuritySystem
+from core.inventory import StockLedgerSystem
+from core.ledger import LedgerSystem, PeriodCloseSystem
+from core.reports import ReportSystem
+from core.closing import ZReportSystem
+from core.rendering import TEMPLATES, InvoiceRenderSystem
+from core.imports import ImportSystem
+
+REPORT_PERMISSIONS = {
+    'sales': 'reports.sales.view',
+    'financial': 'reports.financial.view',
+    'inventory': 'reports.inventory.view',
+    'balance-as-of': 'reports.financial.view',
+    'day': 'reports.sales.view',
+    'z': 'reports.sales.view'
+}
+
+IMPORT_PERMISSIONS = {
+    'products': 'inventory.edit',
+    'customers': 'customers.create'
+}
+
+
+# ==================== خط فرمان ====================
+class BatchContext:
+    # همان سیستم‌های برنامه اصلی، بدون رابط کاربری و بدون نخ بررسی مانده‌ها
+    def __init__(self, db_path):
+        self.database = AdvancedDatabaseSystem(db_path)
+        self.audit_log = AuditLogSystem(self.database, durability='sync')
+        self.auth_system = AdvancedSecuritySystem(self.database, self.audit_log)
+        self.ledger = LedgerSystem(self.database)
+        self.period_close = PeriodCloseSystem(self.database, self.ledger)
+        self.reports = ReportSystem(self.database, self.ledger, self.period_close)
+        self.z_reports = ZReportSystem(self.database)
+        self.current_user = None
+        self.permissions = None
+    
+    def login(self, username, password):
+        success, result = self.auth_system.login(username, password, ip_address='cli')
+        if success:
+            self.current_user = result['user']
+            self.permissions = self.auth_system.get_permission_matcher(self.current_user)
+        return success, result
+    
+    def check_permission(self, permission):
+        return self.permissions is not None and self.permissions.has_permission(permission)
+    
+    def audit(self, action, entity_type=None, entity_id=None, details=None):
+        self.audit_log.log(action, self.current_user['username'], entity_type, entity_id, details, 'cli')
+    
+    def close(self):
+        self.audit_log.close()
+        self.database.close()
+
+
+def run_report(context, args):
+    if args.report == 'sales':
+        return context.reports.sales_report()
+    if args.report == 'financial':
+        context.ledger.verify_balances()
+        return context.reports.financial_report()
+    if args.report == 'inventory':
+        return context.reports.inventory_report()
+    if args.report == 'balance-as-of':
+        return context.reports.balance_as_of_report(args.date)
+    if args.report == 'z':
+        return context.z_reports.day_report(args.date)
+    return context.reports.day_summary_report(args.date)
+
+
+def run_import(context, args):
+    importer = ImportSystem(context.database, StockLedgerSystem(context.database), context.audit_log)
+    username = context.current_user['username']
+    if args.kind == 'products':
+        return importer.import_products(args.file, username)
+    return importer.import_customers(args.file, username)
+
+
+def run_end_of_day(context, args):
+    # بستن صندوق‌های باز روز (گزارش Z)، بستن ماه‌های کامل، بررسی مانده‌ها و گزارش فروش روز
+    z_results = context.z_reports.close_day(args.date, context.current_user['username'])
+    closed = context.period_close.close_due_periods(context.current_user['username'])
+    drift = context.ledger.verify_balances()
+    report = context.reports.day_summary_report(args.date)
+    
+    for success, result in z_results:
+        report += context.z_reports.format_report(result) if success else f"\n❌ {result}"
+    report += f"\n\n🧾 گزارش‌های Z ثبت‌شده: {sum(1 for success, _ in z_results if success)}"
+    report += f"\n📅 دوره‌های بسته‌شده: {closed}"
+    if drift:
+        report += "\n\n⚠️ اختلاف مانده حساب‌ها:"
+        for item in drift:
+            report += f"\n• {item['name']}: {item['balance']:,} به جای {item['expected']:,} تومان"
+    else:
+        report += "\n✅ مانده همه حساب‌ها با اسناد مطابقت دارد"
+    
+    context.audit('eod.run', 'day', args.date, {'closed_periods': closed, 'drift': len(drift),
+                                                'z_reports': [result['id'] for success, result in z_results if success]})
+    return report
+
+
+def run_invoices(context, args):
+    renderer = InvoiceRenderSystem(context.database)
+    success, result = renderer.render(args.out, args.start, args.end, args.format, args.workers)
+    if success:
+        context.audit('invoices.export', 'day', f"{args.start}..{args.end}",
+                      {'format': args.format, 'invoices': result['invoices']})
+    return success, result
+
+
+def valid_date(value):
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"قالب تاریخ نامعتبر است: {value}")
+    return value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m core', description='عملیات دسته‌ای سیستم حسابداری بدون رابط کاربری')
+    parser.add_argument('--db', default='accounting_system.db', help='مسیر دیتابیس')
+    parser.add_argument('--username', default=os.environ.get('ACCOUNTING_USER', 'admin'), help='نام کاربری')
+    parser.add_argument('--password', help='رمز عبور؛ در صورت نبود از ACCOUNTING_PASSWORD یا ورودی خوانده می‌شود')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    today = datetime.now().strftime('%Y-%m-%d')
+    report = commands.add_parser('report', help='تولید گزارش')
+    report.add_argument('report', choices=sorted(REPORT_PERMISSIONS))
+    report.add_argument('--date', type=valid_date, default=today, help='تاریخ گزارش (YYYY-MM-DD)')
+    
+    import_parser = commands.add_parser('import', help='ورود داده از فایل CSV')
+    import_parser.add_argument('kind', choices=sorted(IMPORT_PERMISSIONS))
+    import_parser.add_argument('file', help='مسیر فایل CSV با سطر عنوان')
+    
+    end_of_day = commands.add_parser('end-of-day', help='عملیات پایان روز')
+    end_of_day.add_argument('--date', type=valid_date, default=today, help='روز کاری (YYYY-MM-DD)')
+    
+    invoices = commands.add_parser('invoices', help='تولید دسته‌ای فاکتورها برای چاپ مجدد یا حسابرسی')
+    invoices.add_argument('--from', dest='start', type=valid_date, default=today, help='از تاریخ (YYYY-MM-DD)')
+    invoices.add_argument('--to', dest='end', type=valid_date, default=today, help='تا تاریخ (YYYY-MM-DD)')
+    invoices.add_argument('--format', choices=sorted(TEMPLATES), default='text')
+    invoices.add_argument('--out', default='invoices', help='پوشه خروجی')
+    invoices.add_argument('--workers', type=int, help='تعداد پردازه‌ها؛ پیش‌فرض همه هسته‌ها')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    password = args.password or os.environ.get('ACCOUNTING_PASSWORD') or getpass.getpass('رمز عبور: ')
+    
+    if args.command == 'report':
+        permission = REPORT_PERMISSIONS[args.report]
+    elif args.command == 'import':
+        permission = IMPORT_PERMISSIONS[args.kind]
+    elif args.command == 'invoices':
+        permission = 'reports.sales.view'
+    else:
+        permission = 'financial.periods.close'
+    
+    context = BatchContext(args.db)
+    try:
+        success, result = context.login(args.username, password)
+        if not success:
+            print(f"❌ {result}", file=sys.stderr)
+            return 2
+        if not context.check_permission(permission):
+            print(f"❌ شما دسترسی لازم را ندارید ({permission})", file=sys.stderr)
+            return 3
+        
+        if args.command == 'report':
+            print(run_report(context, args))
+        elif args.command == 'import':
+            success, message = run_import(context, args)
+            print(f"{'✅' if success else '❌'} {message}")
+            if not success:
+                return 1
+        elif args.command == 'invoices':
+            success, result = run_invoices(context, args)
+            if not success:
+                print(f"❌ {result}", file=sys.stderr)
+                return 1
+            print(f"✅ {result['invoices']:,} فاکتور ({result['bytes']:,} بایت) با {result['workers']} پردازه "
+                  f"در {result['seconds']} ثانیه در {args.out} نوشته شد")
+        else:
+            print(run_end_of_day(context, args))
+        return 0
+    finally:
+        context.close()
@@ -0,0 +1,241 @@
+import json
+import sqlite3
+from datetime import datetime
+
+
+# ==================== بستن روز (گزارش Z) ====================
+class ZReportSystem:
+    # هر صندوق و صندوقدار روزی یک گزارش Z دارد؛ ارقام یک بار محاسبه و برای همیشه ذخیره می‌شوند
+    TOP_ITEMS = 10
+    UNASSIGNED_TAX = 'بدون تفکیک'
+    PAYMENT_METHODS = ('نقدی', 'کارت بانکی', 'آنلاین', 'اعتباری')
+    # روش‌های پرداخت ناشناخته یا خالی فاکتورهای قدیمی
+    OTHER_PAYMENT = 'سایر'
+    # صندوق خالی یعنی فاکتورهای قدیمی که صندوقشان ثبت نشده است
+    REGISTER_FILTER = ("terminal IS ? AND created_by IS ? AND invoice_date >= ? "
+                       "AND invoice_date < date(?, '+1 day') AND status = 'paid'")
+    
+    def __init__(self, database):
+        self.database = database
+    
+    def compute(self, cursor, day, terminal, cashier):
+        params = (terminal or None, cashier or None, day, day)
+        payment_sums = ''.join(
+            f"SUM(CASE WHEN payment_method = '{method}' THEN 1 ELSE 0 END), "
+            f"SUM(CASE WHEN payment_method = '{method}' THEN final_amount ELSE 0 END), "
+            for method in self.PAYMENT_METHODS
+        )
+        known = ', '.join(f"'{method}'" for method in self.PAYMENT_METHODS)
+        
+        # یک کوئری تجمیعی: فاکتورهای روز یک بار از شاخص صندوق/صندوقدار/تاریخ خوانده می‌شوند و
+        # مالیات‌ها و اقلام پرفروش با شاخص invoice_id همان فاکتورها به صورت JSON در همان سطر برمی‌گردند
+        cursor.execute(f'''
+            WITH day_invoices AS (
+                SELECT id, invoice_number, total_amount, discount_amount, tax_amount, final_amount, payment_method
+                FROM invoices
+                WHERE {self.REGISTER_FILTER}
+            )
+            SELECT COUNT(*), SUM(total_amount), SUM(discount_amount), SUM(tax_amount), SUM(final_amount),
+                   {payment_sums}
+                   SUM(CASE WHEN payment_method IS NULL OR payment_method NOT IN ({known}) THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN payment_method IS NULL OR payment_method NOT IN ({known}) THEN final_amount ELSE 0 END),
+                   (SELECT invoice_number FROM day_invoices ORDER BY id LIMIT 1),
+                   (SELECT invoice_number FROM day_invoices ORDER BY id DESC LIMIT 1),
+                   (SELECT json_group_object(tax_name, amount) FROM (
+                       SELECT tax_name, SUM(amount) AS amount FROM invoice_taxes
+                       WHERE invoice_id IN (SELECT id FROM day_invoices)
+                       GROUP BY tax_name ORDER BY tax_name
+                   )),
+                   (SELECT json_group_array(json_array(sku, name, quantity, amount)) FROM (
+                       SELECT p.sku, p.name, SUM(ii.quantity) AS quantity, SUM(ii.line_total) AS amount
+                       FROM invoice_items ii
+                       JOIN products p ON ii.product_id = p.id
+                       WHERE ii.invoice_id IN (SELECT id FROM day_invoices)
+                       GROUP BY ii.product_id
+                       ORDER BY quantity DESC, p.sku
+                       LIMIT {self.TOP_ITEMS}
+                   ))
+            FROM day_invoices
+        ''', params)
+        row = cursor.fetchone()
+        count, gross, discount, tax, net = row[:5]
+        if not count:
+            return None
+        
+        payment_counts = row[5:-4]
+        payments = {}
+        for method, method_count, amount in zip(self.PAYMENT_METHODS + (self.OTHER_PAYMENT,),
+                                                payment_counts[::2], payment_counts[1::2]):
+            if method_count:
+                payments[method] = {'count': method_count, 'amount': amount or 0}
+        
+        first_invoice, last_invoice, taxes_json, items_json = row[-4:]
+        taxes = json.loads(taxes_json) if taxes_json else {}
+        unassigned = (tax or 0) - sum(taxes.values())
+        if abs(unassigned) >= 0.01:
+            taxes[self.UNASSIGNED_TAX] = unassigned
+        
+        return {
+            'invoice_count': count,
+            'gross_amount': gross or 0,
+            'discount_amount': discount or 0,
+            'tax_amount': tax or 0,
+            'net_amount': net or 0,
+            'payment_methods': payments,
+            'first_invoice': first_invoice,
+            'last_invoice': last_invoice,
+            'taxes': taxes,
+            'top_items': [{'sku': sku, 'name': name, 'quantity': quantity, 'amount': amount}
+                          for sku, name, quantity, amount in json.loads(items_json or '[]')]
+        }
+    
+    def close_register(self, day, terminal, cashier, closed_by='system'):
+        # محاسبه و ثبت در یک فرمان صف نوشتن تا فروش هم‌زمان بین این دو جا نماند
+        def write(cursor):
+            summary = self.compute(cursor, day, terminal, cashier)
+            if summary is None:
+                return None
+            cursor.execute('''
+                INSERT INTO z_reports
+                (business_day, terminal, cashier, invoice_count, gross_amount, discount_amount, tax_amount,
+                 net_amount, payment_methods, taxes, top_items, first_invoice, last_invoice, closed_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                day, terminal or '', cashier or '',
+                summary['invoice_count'],
+                summary['gross_amount'],
+                summary['discount_amount'],
+                summary['tax_amount'],
+                summary['net_amount'],
+                json.dumps(summary['payment_methods'], ensure_ascii=False),
+                json.dumps(summary['taxes'], ensure_ascii=False),
+                json.dumps(summary['top_items'], ensure_ascii=False),
+                summary['first_invoice'],
+                summary['last_invoice'],
+                closed_by
+            ))
+            return cursor.lastrowid
+        
+        try:
+            report_id = self.database.write(write)
+        except sqlite3.IntegrityError:
+            return False, f"صندوق {terminal or '-'} ({cashier or '-'}) برای روز {day} قبلاً بسته شده است"
+        except Exception as e:
+            return False, f"خطا در بستن صندوق: {str(e)}"
+        
+        if report_id is None:
+            return False, f"فروشی برای صندوق {terminal or '-'} ({cashier or '-'}) در روز {day} ثبت نشده است"
+        return True, self.get(report_id)
+    
+    def open_registers(self, day):
+        # صندوق‌هایی که در این روز فروش داشته‌اند و هنوز گزارش Z ندارند
+        rows = self.database.cached_query('''
+            SELECT DISTINCT COALESCE(i.terminal, ''), COALESCE(i.created_by, '')
+            FROM invoices i
+            WHERE i.status = 'paid' AND i.invoice_date >= ? AND i.invoice_date < date(?, '+1 day')
+              AND NOT EXISTS (
+                  SELECT 1 FROM z_reports z
+                  WHERE z.business_day = ? AND z.terminal = COALESCE(i.terminal, '')
+                    AND z.cashier = COALESCE(i.created_by, '')
+              )
+            ORDER BY 1, 2
+        ''', (day, day, day))
+        return [(terminal, cashier) for terminal, cashier in rows]
+    
+    def close_day(self, day, closed_by='system'):
+        results = []
+        for terminal, cashier in self.open_registers(day):
+            results.append(self.close_register(day, terminal, cashier, closed_by))
+        return results
+    
+    def report_from_row(self, row):
+        (report_id, business_day, terminal, cashier, invoice_count, gross, discount, tax, net,
+         payment_methods, taxes, top_items, first_invoice, last_invoice, closed_by, closed_at) = row
+        return {
+            'id': report_id,
+            'business_day': business_day,
+            'terminal': terminal,
+            'cashier': cashier,
+            'invoice_count': invoice_count,
+            'gross_amount': gross,
+            'discount_amount': discount,
+            'tax_amount': tax,
+            'net_amount': net,
+            'payment_methods': json.loads(payment_methods),
+            'taxes': json.loads(taxes),
+            'top_items': json.loads(top_items),
+            'first_invoice': first_invoice,
+            'last_invoice': last_invoice,
+            'closed_by': closed_by,
+            'closed_at': closed_at
+        }
+    
+    def get(self, report_id):
+        rows = self.database.cached_query("SELECT * FROM z_reports WHERE id = ?", (report_id,))
+        return self.report_from_row(rows[0]) if rows else None
+    
+    def for_day(self, day):
+        # ارقام تاریخی از جدول ذخیره‌شده خوانده می‌شوند، نه از فاکتورها
+        rows = self.database.cached_query('''
+            SELECT * FROM z_reports WHERE business_day = ? ORDER BY terminal, cashier
+        ''', (day,))
+        return [self.report_from_row(row) for row in rows]
+    
+    def daily_totals(self, start, end):
+        rows = self.database.cached_query('''
+            SELECT business_day, COUNT(*), SUM(invoice_count), SUM(gross_amount), SUM(discount_amount),
+                   SUM(tax_amount), SUM(net_amount)
+            FROM z_reports
+            WHERE business_day >= ? AND business_day <= ?
+            GROUP BY business_day
+            ORDER BY business_day
+        ''', (start, end))
+        return [{
+            'business_day': day,
+            'registers': registers,
+            'invoice_count': count,
+            'gross_amount': gross,
+            'discount_amount': discount,
+            'tax_amount': tax,
+            'net_amount': net
+        } for day, registers, count, gross, discount, tax, net in rows]
+    
+    def format_report(self, z):
+        report = f"""
+        🧾 گزارش Z شماره {z['id']}
+        ─────────────────────────────
+        📅 روز: {z['business_day']}
+        🖥️ صندوق: {z['terminal'] or '-'}
+        👤 صندوقدار: {z['cashier'] or '-'}
+        🧮 فاکتورها: {z['invoice_count']:,} ({z['first_invoice']} تا {z['last_invoice']})
+        
+        • فروش ناخالص: {z['gross_amount']:,.0f} تومان
+        • تخفیف: {z['discount_amount']:,.0f} تومان
+        • مالیات: {z['tax_amount']:,.0f} تومان
+        • فروش خالص: {z['net_amount']:,.0f} تومان
+        
+        💳 روش‌های پرداخت:
+        """
+        for method, payment in z['payment_methods'].items():
+            report += f"\n• {method}: {payment['count']:,} فاکتور - {payment['amount']:,.0f} تومان"
+        
+        report += "\n\n🏛️ مالیات‌ها:"
+        for name, amount in z['taxes'].items():
+            report += f"\n• {name}: {amount:,.0f} تومان"
+        
+        report += "\n\n🏆 اقلام پرفروش:"
+        for i, item in enumerate(z['top_items'], 1):
+            report += f"\n{i}. {item['name']} ({item['sku']}): {item['quantity']:,} عدد - {item['amount']:,.0f} تومان"
+        
+        report += f"\n\n🔒 بسته شده توسط {z['closed_by']} در {z['closed_at']}"
+        return report
+    
+    def day_report(self, day=None):
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        reports = self.for_day(day)
+        if not reports:
+            return f"📭 برای روز {day} گزارش Z ثبت نشده است"
+        
+        text = "\n".join(self.format_report(z) for z in reports)
+        text += f"\n\n💰 جمع خالص روز {day}: {sum(z['net_amount'] for z in reports):,.0f} تومان"
+        return text
@@ -0,0 +1,888 @@
+import os
+import re
+import sys
+import queue
+import sqlite3
+import threading
+import time
+import bisect
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+# ==================== پایش کوئری‌ها ====================
+class QueryMonitor:
+    # مرزهای هیستوگرام به میلی‌ثانیه
+    BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, float('inf'))
+    
+    def __init__(self, slow_threshold_ms=50, slow_log_size=200, debug=False):
+        self.enabled = True
+        # کوئری‌های کند همیشه در slow_log می‌مانند؛ چاپ فقط در حالت اشکال‌زدایی
+        self.debug = debug
+        self.slow_threshold_ms = slow_threshold_ms
+        self.stats = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.normalized = {}
+        self.lock = threading.Lock()
+    
+    def normalize(self, sql):
+        key = self.normalized.get(sql)
+        if key is None:
+            key = self.normalized[sql] = ' '.join(sql.split())
+        return key
+    
+    def record(self, sql, elapsed, rows, caller, connection=None, params=()):
+        elapsed_ms = elapsed * 1000
+        key = self.normalize(sql)
+        
+        with self.lock:
+            stat = self.stats.get(key)
+            if stat is None:
+                stat = self.stats[key] = {
+                    'statement': key,
+                    'calls': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                    'histogram': [0] * len(self.BUCKETS),
+                    'callers': {}
+                }
+            stat['calls'] += 1
+            stat['total_ms'] += elapsed_ms
+            stat['max_ms'] = max(stat['max_ms'], elapsed_ms)
+            stat['rows'] += rows
+            stat['histogram'][bisect.bisect_left(self.BUCKETS, elapsed_ms)] += 1
+            stat['callers'][caller] = stat['callers'].get(caller, 0) + 1
+        
+        if elapsed_ms >= self.slow_threshold_ms:
+            self.log_slow_query(key, sql, params, elapsed_ms, rows, caller, connection)
+    
+    def log_slow_query(self, key, sql, params, elapsed_ms, rows, caller, connection):
+        plan = []
+        if connection is not None and key.split(' ', 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+            try:
+                # از کرسر ساده استفاده می‌شود تا خود EXPLAIN ثبت نشود
+                cursor = sqlite3.Cursor(connection)
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            except sqlite3.Error:
+                pass
+        
+        self.slow_log.append({
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'statement': key,
+            'elapsed_ms': elapsed_ms,
+            'rows': rows,
+            'caller': caller,
+            'plan': plan
+        })
+        if self.debug:
+            print(f"🐢 کوئری کند ({elapsed_ms:.1f} ms) از {caller}: {key[:120]}")
+    
+    def top_queries(self, limit=10, order_by='total_ms'):
+        with self.lock:
+            stats = [dict(stat, callers=dict(stat['callers'])) for stat in self.stats.values()]
+        stats.sort(key=lambda stat: stat[order_by], reverse=True)
+        return stats[:limit]
+    
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.slow_log.clear()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # زمان اجرا و خواندن نتایج یک دستور تا پایان خواندن یا دستور بعدی جمع زده می‌شود
+    pending = None
+    
+    def execute(self, sql, parameters=()):
+        monitor = self.connection.monitor
+        if monitor is None or not monitor.enabled:
+            return super().execute(sql, parameters)
+        
+        self.finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        elapsed = time.perf_counter() - started
+        self.pending = [sql, parameters, elapsed, max(self.rowcount, 0), find_caller()]
+        if self.description is None:
+            self.finish()
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        monitor = self.connection.monitor
+        if monitor is None or not monitor.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        
+        self.finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        monitor.record(sql, time.perf_counter() - started, max(self.rowcount, 0), find_caller())
+        return self
+    
+    def fetchone(self):
+        if self.pending is None:
+            return super().fetchone()
+        
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.pending[2] += time.perf_counter() - started
+        if row is None:
+            self.finish()
+        else:
+            self.pending[3] += 1
+        return row
+    
+    def fetchmany(self, size=None):
+        if self.pending is None:
+            return super().fetchmany(size or self.arraysize)
+        
+        started = time.perf_counter()
+        rows = super().fetchmany(size or self.arraysize)
+        self.pending[2] += time.perf_counter() - started
+        self.pending[3] += len(rows)
+        if not rows:
+            self.finish()
+        return rows
+    
+    def fetchall(self):
+        if self.pending is None:
+            return super().fetchall()
+        
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.pending[2] += time.perf_counter() - started
+        self.pending[3] += len(rows)
+        self.finish()
+        return rows
+    
+    def __next__(self):
+        if self.pending is None:
+            return super().__next__()
+        
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.finish()
+            raise
+        self.pending[3] += 1
+        return row
+    
+    def finish(self):
+        pending = self.pending
+        if pending is not None:
+            self.pending = None
+            sql, parameters, elapsed, rows, caller = pending
+            self.connection.monitor.record(sql, elapsed, rows, caller, self.connection, parameters)
+    
+    def close(self):
+        self.finish()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self.finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    monitor = None
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+INSTRUMENTATION_CODES = {
+    function.__code__ for cls in (InstrumentedCursor, InstrumentedConnection)
+    for function in vars(cls).values() if callable(function) and hasattr(function, '__code__')
+}
+
+
+def find_caller():
+    # اولین فریم بیرون از لایه پایش، مثل CompletePOSSystem.add_to_cart
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code in INSTRUMENTATION_CODES:
+        frame = frame.f_back
+    if frame is None:
+        return 'unknown'
+    
+    code = frame.f_code
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname:
+        return qualname
+    owner = frame.f_locals.get('self')
+    return f"{type(owner).__name__}.{code.co_name}" if owner is not None else code.co_name
+
+# ==================== صف نوشتن با تعهد گروهی ====================
+class WriteQueue:
+    # یک نخ نویسنده با اتصال اختصاصی؛ چند فرمان در یک تراکنش و یک fsync تعهد می‌شوند
+    def __init__(self, database, max_batch=64, max_latency_ms=5, max_pending=10000):
+        self.database = database
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.stats = {'commands': 0, 'failed': 0, 'commits': 0, 'largest_batch': 0}
+        self.busy = False
+        
+        self.connection = sqlite3.connect(database.db_path, check_same_thread=False, timeout=30,
+                                          isolation_level=None, factory=InstrumentedConnection)
+        self.connection.monitor = database.query_monitor
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        
+        self.writer_thread = threading.Thread(target=self.run_writer, name='db-writer', daemon=True)
+        self.writer_thread.start()
+    
+    def submit(self, func, *args):
+        # func(cursor, *args) روی نخ نویسنده اجرا می‌شود؛ نتیجه یا خطای خودش در Future برمی‌گردد
+        if threading.current_thread() is self.writer_thread:
+            raise RuntimeError("فرمان نوشتن نمی‌تواند از داخل نخ نویسنده ثبت شود")
+        future = Future()
+        self.queue.put((func, args, future))
+        return future
+    
+    def run_writer(self):
+        while True:
+            command = self.queue.get()
+            if command is None:
+                break
+            
+            batch = [command]
+            stopping = False
+            # در زمان شلوغی تا سقف تأخیر برای فرمان‌های بعدی صبر می‌شود؛ در زمان خلوت بلافاصله تعهد می‌شود
+            deadline = time.monotonic() + (self.max_latency if self.busy else 0)
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    command = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if command is None:
+                    stopping = True
+                    break
+                batch.append(command)
+            
+            self.busy = len(batch) > 1 or not self.queue.empty()
+            self.write_batch(batch)
+            if stopping:
+                break
+    
+    def write_batch(self, batch):
+        cursor = self.connection.cursor()
+        outcomes = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            # نسخه جدول‌ها یک بار برای کل دسته بالا می‌رود، نه برای هر سطر
+            self.database.query_cache.defer_versions(cursor)
+            for func, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                # هر فرمان در savepoint خودش تا خطای یکی بقیه دسته را باطل نکند
+                cursor.execute("SAVEPOINT write_command")
+                try:
+                    result = func(cursor, *args)
+                    cursor.execute("RELEASE write_command")
+                    outcomes.append((future, True, result))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_command")
+                    cursor.execute("RELEASE write_command")
+                    outcomes.append((future, False, e))
+            self.database.query_cache.settle_versions(cursor)
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if self.connection.in_transaction:
+                self.connection.execute("ROLLBACK")
+            for func, args, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.stats['failed'] += len(batch)
+            return
+        
+        self.stats['commits'] += 1
+        self.stats['commands'] += len(outcomes)
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(outcomes))
+        for future, success, value in outcomes:
+            if success:
+                future.set_result(value)
+            else:
+                self.stats['failed'] += 1
+                future.set_exception(value)
+    
+    def close(self, timeout=5.0):
+        self.queue.put(None)
+        self.writer_thread.join(timeout)
+        self.connection.close()
+
+# ==================== کش نتایج کوئری ====================
+class QueryCache:
+    # نتایج خواندن با نسخه جدول‌هایشان نگه داشته می‌شوند؛ نسخه‌ها را تریگرها در همان تراکنش نوشتن بالا می‌برند
+    TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)', re.IGNORECASE)
+    
+    def __init__(self, connection, max_entries=256, max_rows=100000):
+        self.connection = connection
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+        self.cached_rows = 0
+        self.tables = {}
+        self.table_versions = {}
+        self.watermark = None
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evictions': 0}
+    
+    def track_tables(self, cursor, tables):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                pending INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        if 'pending' not in [row[1] for row in cursor.execute("PRAGMA table_info(table_versions)").fetchall()]:
+            cursor.execute("ALTER TABLE table_versions ADD COLUMN pending INTEGER NOT NULL DEFAULT 0")
+        # پرچم تعویق فقط داخل تراکنش نویسنده روشن است و پیش از تعهد خاموش می‌شود
+        cursor.execute("CREATE TABLE IF NOT EXISTS version_batch (deferred INTEGER NOT NULL)")
+        cursor.execute("INSERT INTO version_batch (deferred) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM version_batch)")
+        
+        triggers = dict(cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'").fetchall())
+        for table in tables:
+            cursor.execute("INSERT OR IGNORE INTO table_versions (name) VALUES (?)", (table,))
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                name = f"tv_{table}_{event.lower()}"
+                # تریگرهای قدیمی‌تر برای هر سطر جدا نسخه را بالا می‌بردند
+                if name in triggers and 'version_batch' not in triggers[name]:
+                    cursor.execute(f"DROP TRIGGER {name}")
+                # بیرون از حالت تعویق هر سطر نسخه را بالا می‌برد؛ در حالت تعویق فقط اولین سطر هر جدول
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}
+                    WHEN NOT (SELECT deferred FROM version_batch)
+                      OR NOT (SELECT pending FROM table_versions WHERE name = '{table}')
+                    BEGIN
+                        UPDATE table_versions SET version = version + 1, pending = (SELECT deferred FROM version_batch)
+                        WHERE name = '{table}';
+                    END
+                ''')
+            self.tables[table.lower()] = table
+    
+    def defer_versions(self, cursor):
+        # تا settle_versions هر جدول در این تراکنش فقط یک بار نسخه می‌خورد
+        cursor.execute("UPDATE version_batch SET deferred = 1")
+    
+    def settle_versions(self, cursor):
+        # باید پیش از COMMIT و در همان تراکنش اجرا شود تا اتصال‌های دیگر حالت تعویق را نبینند
+        cursor.execute("UPDATE table_versions SET pending = 0 WHERE pending = 1")
+        cursor.execute("UPDATE version_batch SET deferred = 0")
+    
+    def suspend_versions(self, cursor):
+        # برای بارگذاری انبوه: تریگرها داخل تراکنش برداشته می‌شوند و resume_versions پیش از تعهد برشان می‌گرداند
+        for table in self.tables.values():
+            for event in ('insert', 'update', 'delete'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS tv_{table}_{event}")
+    
+    def resume_versions(self, cursor):
+        cursor.execute("UPDATE table_versions SET version = version + 1")
+        self.track_tables(cursor, tuple(self.tables.values()))
+    
+    def current_versions(self):
+        # data_version با تعهد هر اتصال دیگر (نخ نویسنده یا پردازه دیگر) و total_changes با نوشتن همین اتصال عوض می‌شود
+        # از کرسر ساده استفاده می‌شود تا این بررسی‌ها در پایش کوئری‌ها ثبت نشوند
+        cursor = sqlite3.Cursor(self.connection)
+        watermark = (cursor.execute("PRAGMA data_version").fetchone()[0], self.connection.total_changes)
+        if watermark != self.watermark:
+            self.table_versions = dict(cursor.execute("SELECT name, version FROM table_versions").fetchall())
+            self.watermark = watermark
+        return self.table_versions
+    
+    def table_version(self, table):
+        with self.lock:
+            return self.current_versions().get(table, 0)
+    
+    def tables_of(self, sql):
+        names = {name.lower() for name in self.TABLE_PATTERN.findall(sql)}
+        if not names or not names <= self.tables.keys():
+            return None
+        return tuple(sorted(self.tables[name] for name in names))
+    
+    def fetchall(self, sql, params=()):
+        tables = self.tables_of(sql)
+        if tables is None or self.connection.in_transaction:
+            # جدول بدون نسخه یا تراکنش باز (داده تعهدنشده) کش نمی‌شود
+            with self.lock:
+                self.stats['bypassed'] += 1
+            return self.connection.execute(sql, params).fetchall()
+        
+        key = (sql, tuple(params))
+        with self.lock:
+            versions = self.current_versions()
+            stamp = tuple(versions.get(table, 0) for table in tables)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return list(entry[1])
+        
+        # نسخه‌ها پیش از اجرای کوئری خوانده شده‌اند؛ نوشتن هم‌زمان فقط باعث خواندن دوباره بعدی می‌شود
+        rows = self.connection.execute(sql, params).fetchall()
+        with self.lock:
+            self.stats['misses'] += 1
+            self.store(key, stamp, rows)
+        return list(rows)
+    
+    def store(self, key, stamp, rows):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.cached_rows -= len(old[1])
+        if len(rows) > self.max_rows:
+            return
+        
+        self.entries[key] = (stamp, rows)
+        self.cached_rows += len(rows)
+        while len(self.entries) > self.max_entries or self.cached_rows > self.max_rows:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.cached_rows -= len(evicted)
+            self.stats['evictions'] += 1
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.cached_rows = 0
+    
+    def status(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), rows=self.cached_rows)
+
+# ==================== پایگاه داده ====================
+class AdvancedDatabaseSystem:
+    CACHED_TABLES = ('accounts', 'transactions', 'products', 'customers', 'invoices', 'invoice_items',
+                     'invoice_taxes', 'z_reports', 'journal_entries', 'journal_lines', 'closed_periods', 'balance_snapshots',
+                     'app_settings', 'tax_settings')
+    
+    def __init__(self, db_path='accounting_system.db'):
+        self.db_path = db_path
+        self.connection = None
+        self.writer = None
+        self.writer_lock = threading.Lock()
+        # با ACCOUNTING_SQL_DEBUG=1 کوئری‌های کند در خروجی هم چاپ می‌شوند
+        self.query_monitor = QueryMonitor(debug=bool(os.environ.get('ACCOUNTING_SQL_DEBUG')))
+        self.query_cache = None
+        self.init_database()
+    
+    def init_database(self):
+        try:
+            # دستورات ثابت مخزن‌ها و کش کوئری در کش دستورات آماده جا شوند
+            self.connection = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256,
+                                              factory=InstrumentedConnection)
+            self.connection.monitor = self.query_monitor
+            self.connection.execute("PRAGMA foreign_keys = ON")
+            # WAL تا خواندن‌ها روی اتصال اصلی نویسنده را متوقف نکنند
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.query_cache = QueryCache(self.connection)
+            self.create_tables()
+            self.insert_sample_data()
+            print("✅ پایگاه داده راه‌اندازی شد")
+        except Exception as e:
+            print(f"❌ خطا در راه‌اندازی دیتابیس: {e}")
+    
+    def create_tables(self):
+        cursor = self.connection.cursor()
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                code TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                balance REAL DEFAULT 0,
+                is_active BOOLEAN DEFAULT 1
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                transaction_number TEXT UNIQUE NOT NULL,
+                date TEXT NOT NULL,
+                type TEXT NOT NULL,
+                description TEXT,
+                amount REAL NOT NULL,
+                account_id INTEGER,
+                status TEXT DEFAULT 'completed',
+                created_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sku TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                category TEXT,
+                cost_price REAL,
+                selling_price REAL,
+                current_stock INTEGER DEFAULT 0,
+                min_stock INTEGER DEFAULT 0,
+                is_active BOOLEAN DEFAULT 1,
+                version INTEGER DEFAULT 0
+            )
+        ''')
+        self.ensure_column('products', 'version', 'INTEGER DEFAULT 0')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_code TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                type TEXT DEFAULT 'regular',
+                phone TEXT,
+                email TEXT,
+                credit_limit REAL DEFAULT 0,
+                current_balance REAL DEFAULT 0,
+                is_active BOOLEAN DEFAULT 1
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_number TEXT UNIQUE NOT NULL,
+                customer_id INTEGER,
+                invoice_date TEXT NOT NULL,
+                total_amount REAL NOT NULL,
+                tax_amount REAL DEFAULT 0,
+                discount_amount REAL DEFAULT 0,
+                final_amount REAL NOT NULL,
+                status TEXT DEFAULT 'draft',
+                payment_method TEXT,
+                created_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                terminal TEXT
+            )
+        ''')
+        self.ensure_column('invoices', 'terminal', 'TEXT')
+        # بستن روز هر صندوق و صندوقدار فقط فاکتورهای همان روز را از این شاخص می‌خواند
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_register_day ON invoices (terminal, created_by, invoice_date)")
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoice_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                unit_price REAL NOT NULL,
+                line_total REAL NOT NULL,
+                FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE,
+                FOREIGN KEY (product_id) REFERENCES products (id)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items (invoice_id)")
+        
+        # تفکیک مالیات هر فاکتور با نرخ زمان فروش
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS invoice_taxes (
+                invoice_id INTEGER NOT NULL,
+                tax_name TEXT NOT NULL,
+                tax_rate REAL NOT NULL,
+                amount REAL NOT NULL,
+                PRIMARY KEY (invoice_id, tax_name),
+                FOREIGN KEY (invoice_id) REFERENCES invoices (id) ON DELETE CASCADE
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS journal_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entry_number TEXT UNIQUE NOT NULL,
+                date TEXT NOT NULL,
+                description TEXT,
+                source_type TEXT,
+                source_ref TEXT,
+                created_by TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS journal_lines (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entry_id INTEGER NOT NULL,
+                account_id INTEGER NOT NULL,
+                customer_id INTEGER,
+                date TEXT,
+                debit REAL DEFAULT 0,
+                credit REAL DEFAULT 0,
+                FOREIGN KEY (entry_id) REFERENCES journal_entries (id) ON DELETE CASCADE,
+                FOREIGN KEY (account_id) REFERENCES accounts (id),
+                FOREIGN KEY (customer_id) REFERENCES customers (id)
+            )
+        ''')
+        self.ensure_column('journal_lines', 'customer_id', 'INTEGER')
+        self.ensure_column('journal_lines', 'date', 'TEXT')
+        cursor.execute('''
+            UPDATE journal_lines 
+            SET date = (SELECT date FROM journal_entries WHERE id = journal_lines.entry_id)
+            WHERE date IS NULL
+        ''')
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_lines_account_date ON journal_lines (account_id, date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_lines_customer_date ON journal_lines (customer_id, date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_lines_date ON journal_lines (date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_lines_entry ON journal_lines (entry_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_entries_date ON journal_entries (date)")
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS closed_periods (
+                period TEXT PRIMARY KEY,
+                period_end TEXT NOT NULL,
+                closed_by TEXT,
+                closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS balance_snapshots (
+                period TEXT NOT NULL,
+                period_end TEXT NOT NULL,
+                entity_type TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                balance REAL NOT NULL,
+                PRIMARY KEY (entity_type, entity_id, period_end)
+            )
+        ''')
+        
+        # گزارش Z: جمع‌بندی بسته‌شده هر روز، صندوق و صندوقدار؛ پس از ثبت تغییر نمی‌کند
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS z_reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_day TEXT NOT NULL,
+                terminal TEXT NOT NULL,
+                cashier TEXT NOT NULL,
+                invoice_count INTEGER NOT NULL,
+                gross_amount REAL NOT NULL,
+                discount_amount REAL NOT NULL,
+                tax_amount REAL NOT NULL,
+                net_amount REAL NOT NULL,
+                payment_methods TEXT NOT NULL,
+                taxes TEXT NOT NULL,
+                top_items TEXT NOT NULL,
+                first_invoice TEXT,
+                last_invoice TEXT,
+                closed_by TEXT,
+                closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (business_day, terminal, cashier)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS z_reports_no_update BEFORE UPDATE ON z_reports
+            BEGIN SELECT RAISE(ABORT, 'z_reports are immutable'); END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS z_reports_no_delete BEFORE DELETE ON z_reports
+            BEGIN SELECT RAISE(ABORT, 'z_reports are immutable'); END
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                token TEXT NOT NULL,
+                login_time REAL NOT NULL,
+                last_activity REAL NOT NULL,
+                ip_address TEXT
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                username TEXT,
+                action TEXT NOT NULL,
+                entity_type TEXT,
+                entity_id TEXT,
+                details TEXT,
+                ip_address TEXT
+            )
+        ''')
+        
+        # گزارش ممیزی فقط افزودنی است
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log
+            BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log
+            BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_user ON audit_log (username, timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON audit_log (entity_type, entity_id, timestamp)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log (timestamp)")
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tax_settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tax_name TEXT NOT NULL,
+                tax_rate REAL NOT NULL,
+                is_active BOOLEAN DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # جلسات و لاگ حسابرسی پرتغییرند و کش نمی‌شوند
+        self.query_cache.track_tables(cursor, self.CACHED_TABLES)
+        
+        self.connection.commit()
+    
+    def ensure_column(self, table, column, definition):
+        # افزودن ستون جدید به دیتابیس‌های قدیمی‌تر
+        cursor = self.connection.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
+    def start_writer(self, max_batch=64, max_latency_ms=5):
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = WriteQueue(self, max_batch, max_latency_ms)
+            return self.writer
+    
+    def submit_write(self, func, *args):
+        return self.start_writer().submit(func, *args)
+    
+    def write(self, func, *args, timeout=30):
+        # منتظر تعهد گروهی می‌ماند و خطای همین فرمان را دوباره پرتاب می‌کند
+        return self.submit_write(func, *args).result(timeout)
+    
+    def stop_writer(self):
+        # فرمان‌های در صف نوشته و اتصال نویسنده بسته می‌شود؛ نوشتن بعدی دوباره راهش می‌اندازد
+        with self.writer_lock:
+            if self.writer:
+                self.writer.close()
+                self.writer = None
+    
+    def close(self):
+        self.stop_writer()
+        self.connection.close()
+    
+    def cached_query(self, sql, params=()):
+        return self.query_cache.fetchall(sql, params)
+    
+    def get_setting(self, key, default=None):
+        rows = self.cached_query("SELECT value FROM app_settings WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+    
+    def set_setting(self, key, value, wait=True):
+        # از صف نوشتن؛ با wait=False نخ رابط منتظر تعهد نمی‌ماند
+        def write(cursor):
+            cursor.execute('''
+                INSERT INTO app_settings (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            ''', (key, str(value)))
+        
+        future = self.submit_write(write)
+        if wait:
+            future.result(30)
+    
+    def insert_sample_data(self):
+        cursor = self.connection.cursor()
+        
+        cursor.execute("SELECT COUNT(*) FROM accounts")
+        if cursor.fetchone()[0] == 0:
+            self.insert_accounts()
+            self.insert_products()
+            self.insert_customers()
+            self.insert_sample_transactions()
+            self.insert_tax_settings()
+    
+    def insert_accounts(self):
+        accounts = [
+            ('1-101', 'صندوق', 'asset', 50000000),
+            ('1-102', 'بانک ملی', 'asset', 250000000),
+            ('3-101', 'درآمد فروش', 'income', 0),
+            ('4-101', 'هزینه حقوق', 'expense', 0)
+        ]
+        
+        cursor = self.connection.cursor()
+        for code, name, type, balance in accounts:
+            cursor.execute(
+                "INSERT OR IGNORE INTO accounts (code, name, type, balance) VALUES (?, ?, ?, ?)",
+                (code, name, type, balance)
+            )
+        self.connection.commit()
+    
+    def insert_products(self):
+        products = [
+            ('LAP-001', 'لپ‌تاپ ایسوس ROG', 'الکترونیک', 28000000, 35000000, 15, 5),
+            ('MS-002', 'ماوس بی‌سیم لاجیتک', 'الکترونیک', 300000, 450000, 45, 20),
+            ('KB-003', 'کیبورد مکانیکی ریزر', 'الکترونیک', 900000, 1200000, 25, 10)
+        ]
+        
+        cursor = self.connection.cursor()
+        for sku, name, category, cost, price, stock, min_stock in products:
+            cursor.execute('''
+                INSERT OR IGNORE INTO products 
+                (sku, name, category, cost_price, selling_price, current_stock, min_stock)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (sku, name, category, cost, price, stock, min_stock))
+        self.connection.commit()
+    
+    def insert_customers(self):
+        customers = [
+            ('CUST-001', 'شرکت فناوری اطلاعات', 'vip', '021-12345678', 'info@techco.com', 500000000, 125000000),
+            ('CUST-002', 'آقای احمد محمدی', 'regular', '09123456789', 'ahmad@email.com', 10000000, 2500000)
+        ]
+        
+        cursor = self.connection.cursor()
+        for code, name, type, phone, email, credit_limit, balance in customers:
+            cursor.execute('''
+                INSERT OR IGNORE INTO customers 
+                (customer_code, name, type, phone, email, credit_limit, current_balance)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (code, name, type, phone, email, credit_limit, balance))
+        self.connection.commit()
+    
+    def insert_sample_transactions(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM transactions")
+        if cursor.fetchone()[0] == 0:
+            transactions = [
+                ('TRX-001', '2024-01-15', 'income', 'فروش لپ‌تاپ', 35000000, 1, 'admin'),
+                ('TRX-002', '2024-01-16', 'expense', 'خرید ماوس', 300000, 1, 'admin'),
+                ('TRX-003', '2024-01-17', 'income', 'فروش کیبورد', 1200000, 1, 'financial')
+            ]
+            
+            for trans_num, date, type, desc, amount, acc_id, created_by in transactions:
+                cursor.execute('''
+                    INSERT INTO transactions 
+                    (transaction_number, date, type, description, amount, account_id, created_by)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (trans_num, date, type, desc, amount, acc_id, created_by))
+            self.connection.commit()
+    
+    def insert_tax_settings(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM tax_settings")
+        if cursor.fetchone()[0] == 0:
+            taxes = [
+                ('مالیات بر ارزش افزوده', 9.0),
+                ('عوارض شهرداری', 1.0)
+            ]
+            
+            for tax_name, tax_rate in taxes:
+                cursor.execute('''
+                    INSERT INTO tax_settings (tax_name, tax_rate) VALUES (?, ?)
+                ''', (tax_name, tax_rate))
+            self.connection.commit()
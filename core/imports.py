@@ -0,0 +1,85 @@
+import csv
+
+
+# ==================== ورود داده از فایل ====================
+class ImportSystem:
+    PRODUCT_FIELDS = ('sku', 'name', 'category', 'cost_price', 'selling_price', 'current_stock', 'min_stock')
+    CUSTOMER_FIELDS = ('customer_code', 'name', 'type', 'phone', 'email', 'credit_limit')
+    
+    def __init__(self, database, stock_ledger=None, audit_log=None):
+        self.database = database
+        self.stock_ledger = stock_ledger
+        self.audit_log = audit_log
+    
+    def read_rows(self, path, fields, required):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            missing = [field for field in required if field not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"ستون‌های الزامی در فایل نیست: {', '.join(missing)}")
+            
+            rows = []
+            for line_number, row in enumerate(reader, 2):
+                if not all((row.get(field) or '').strip() for field in required):
+                    raise ValueError(f"سطر {line_number}: فیلدهای الزامی خالی است")
+                rows.append(tuple((row.get(field) or '').strip() or None for field in fields))
+            return rows
+    
+    def import_products(self, path, username=None):
+        # محصولات موجود بر اساس SKU بروزرسانی و بقیه اضافه می‌شوند
+        try:
+            rows = self.read_rows(path, self.PRODUCT_FIELDS, ('sku', 'name', 'selling_price'))
+            
+            # کل فایل یک فرمان صف نوشتن است؛ یا همه سطرها ثبت می‌شوند یا هیچ‌کدام
+            def write(cursor):
+                cursor.execute("SELECT COUNT(*) FROM products")
+                before = cursor.fetchone()[0]
+                cursor.executemany('''
+                    INSERT INTO products
+                    (sku, name, category, cost_price, selling_price, current_stock, min_stock)
+                    VALUES (?, ?, ?, COALESCE(?, 0), ?, COALESCE(?, 0), COALESCE(?, 0))
+                    ON CONFLICT(sku) DO UPDATE SET
+                        name = excluded.name,
+                        category = excluded.category,
+                        cost_price = excluded.cost_price,
+                        selling_price = excluded.selling_price,
+                        current_stock = excluded.current_stock,
+                        min_stock = excluded.min_stock,
+                        version = version + 1
+                ''', rows)
+                cursor.execute("SELECT COUNT(*) FROM products")
+                return cursor.fetchone()[0] - before
+            
+            created = self.database.write(write)
+            if self.stock_ledger:
+                self.stock_ledger.load_stock()
+            self.audit('product.import', username, {'file': path, 'rows': len(rows), 'created': created})
+            return True, f"{len(rows)} محصول پردازش شد ({created} جدید، {len(rows) - created} بروزرسانی)"
+        
+        except Exception as e:
+            return False, f"خطا در ورود محصولات: {str(e)}"
+    
+    def import_customers(self, path, username=None):
+        # مانده مشتری فقط از طریق دفتر کل تغییر می‌کند، پس مشتریان تکراری نادیده گرفته می‌شوند
+        try:
+            rows = self.read_rows(path, self.CUSTOMER_FIELDS, ('customer_code', 'name'))
+            
+            def write(cursor):
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO customers
+                    (customer_code, name, type, phone, email, credit_limit, current_balance)
+                    VALUES (?, ?, COALESCE(?, 'regular'), ?, ?, COALESCE(?, 0), 0)
+                ''', rows)
+                return cursor.rowcount
+            
+            created = self.database.write(write)
+            
+            self.audit('customer.import', username, {'file': path, 'rows': len(rows), 'created': created})
+            return True, f"{created} مشتری اضافه شد ({len(rows) - created} تکراری نادیده گرفته شد)"
+        
+        except Exception as e:
+            return False, f"خطا در ورود مشتریان: {str(e)}"
+    
+    def audit(self, action, username, details):
+        if self.audit_log:
+            self.audit_log.log(action, username, 'import', None, details)
@@ -0,0 +1,210 @@
+import threading
+import time
+
+from core.catalog import ProductCatalog
+from core.repositories import ProductRepository
+
+# ==================== دفتر موجودی و رزرو کالا ====================
+class StockLedgerSystem:
+    # رزروها فقط در حافظه همین پردازه‌اند و پایانه‌های پردازه‌های دیگر آن‌ها را نمی‌بینند؛
+    # تنها تضمین بین پردازه‌ها شرط version = ? AND current_stock >= ? در commit است
+    def __init__(self, database, reservation_ttl=900):
+        self.database = database
+        self.repository = ProductRepository(database)
+        self.reservation_ttl = reservation_ttl
+        self.lock = threading.RLock()
+        # فیلدهای محصولات فقط در کاتالوگ ستونی نگه داشته می‌شوند
+        self.catalog = ProductCatalog()
+        self.sku_index = {}
+        self.reservations = {}
+        self.reserved = {}
+        # رزروهای هر پایانه با هم منقضی می‌شوند؛ انقضا برای هر پایانه یک بار نگه داشته می‌شود
+        self.expiry = {}
+        # نسخه جدول محصولات در آخرین خواندن هر محصول
+        self.synced = {}
+        self.loaded_version = None
+        # هر hook با (ردیف‌های تغییرکرده کاتالوگ، آیا مجموعه ردیف‌های قابل نمایش عوض شد) صدا زده می‌شود؛
+        # ردیف‌های None یعنی بارگذاری کامل
+        self.change_hooks = []
+        self.load_stock()
+    
+    def load_stock(self):
+        version = self.database.query_cache.table_version('products')
+        rows = self.repository.active()
+        with self.lock:
+            self.catalog.reset(len(rows))
+            self.sku_index = {}
+            self.synced = {}
+            self.loaded_version = version
+            for row in rows:
+                self.store_product(row)
+        self.notify(None, True)
+    
+    def store_product(self, row):
+        self.sku_index[row.sku] = row.id
+        return self.catalog.store(row)
+    
+    def refresh_product(self, product_id, cursor=None):
+        # خواندن مجدد یک محصول پس از ویرایش یا تداخل نسخه
+        row = self.repository.get(product_id, cursor.connection if cursor else None)
+        with self.lock:
+            if row and row.is_active:
+                index, membership_changed = self.store_product(row)
+            else:
+                index, membership_changed = self.catalog.deactivate(product_id)
+                if index is not None:
+                    self.sku_index.pop(self.catalog.skus.values[self.catalog.sku_codes[index]], None)
+            product = self.get_product(product_id)
+        # خواندن داخل تراکنش نویسنده ممکن است برگردد؛ تغییرات آن پس از تعهد با confirm اعلام می‌شود
+        if cursor is None and index is not None:
+            self.notify([index], membership_changed)
+        return product
+    
+    def get_product(self, product_id):
+        with self.lock:
+            index = self.catalog.find(product_id)
+            return None if index is None else self.catalog.product(index)
+    
+    def resolve_skus(self, skus):
+        # یک دسته بارکد از حافظه؛ فقط موارد ناشناخته با یک کوئری از دیتابیس خوانده می‌شوند
+        with self.lock:
+            resolved = {sku: self.sku_index[sku] for sku in skus if sku in self.sku_index}
+        
+        missing = list({sku for sku in skus if sku not in resolved})
+        if missing:
+            rows = self.repository.get_many_by_sku(missing)
+            with self.lock:
+                for sku, row in rows.items():
+                    if row.is_active:
+                        self.store_product(row)
+                        resolved[sku] = row.id
+        return resolved
+    
+    def expire_reservations(self):
+        now = time.monotonic()
+        with self.lock:
+            owners = {owner for owner, expires_at in self.expiry.items() if expires_at <= now}
+            if not owners:
+                return 0
+            expired = [key for key in self.reservations if key[0] in owners]
+            for key in expired:
+                self.drop_reservation(key)
+            for owner in owners:
+                del self.expiry[owner]
+        return len(expired)
+    
+    def drop_reservation(self, key):
+        reservation = self.reservations.pop(key, None)
+        if reservation:
+            product_id = key[1]
+            self.reserved[product_id] = self.reserved.get(product_id, 0) - reservation['quantity']
+            if self.reserved[product_id] <= 0:
+                del self.reserved[product_id]
+    
+    def available(self, product_id):
+        with self.lock:
+            index = self.catalog.find(product_id)
+            if index is None:
+                return 0
+            return int(self.catalog.stock[index]) - self.reserved.get(product_id, 0)
+    
+    def sync_product(self, product_id):
+        # فروش پردازه‌های دیگر فقط در دیتابیس است؛ با تغییر نسخه جدول محصولات همین یک محصول دوباره خوانده می‌شود
+        version = self.database.query_cache.table_version('products')
+        with self.lock:
+            if self.synced.get(product_id, self.loaded_version) == version:
+                return
+        self.refresh_product(product_id)
+        with self.lock:
+            self.synced[product_id] = version
+    
+    def reserve(self, owner, product_id, quantity):
+        self.sync_product(product_id)
+        return self.hold(owner, product_id, quantity)
+    
+    def hold(self, owner, product_id, quantity):
+        with self.lock:
+            self.expire_reservations()
+            available = self.available(product_id)
+            if quantity > available:
+                return False, max(available, 0)
+            
+            key = (owner, product_id)
+            reservation = self.reservations.setdefault(key, {'quantity': 0})
+            reservation['quantity'] += quantity
+            self.reserved[product_id] = self.reserved.get(product_id, 0) + quantity
+            self.touch(owner)
+            return True, available - quantity
+    
+    def touch(self, owner):
+        # تمدید رزروهای یک سبد فعال
+        self.expiry[owner] = time.monotonic() + self.reservation_ttl
+    
+    def release(self, owner, product_id=None):
+        with self.lock:
+            if product_id is not None:
+                self.drop_reservation((owner, product_id))
+                return
+            keys = [key for key in self.reservations if key[0] == owner]
+            for key in keys:
+                self.drop_reservation(key)
+            self.expiry.pop(owner, None)
+    
+    def commit(self, owner, items, cursor, max_retries=3):
+        # کسر موجودی با بررسی خوش‌بینانه نسخه؛ تغییرات حافظه پس از commit دیتابیس اعمال می‌شوند
+        committed = []
+        with self.lock:
+            self.expire_reservations()
+            for item in items:
+                product_id = item['product_id']
+                quantity = item['quantity']
+                
+                held = self.reservations.get((owner, product_id), {'quantity': 0})['quantity']
+                if held < quantity:
+                    success, available = self.hold(owner, product_id, quantity - held)
+                    if not success:
+                        raise ValueError(f"موجودی {item['name']} کافی نیست. موجودی قابل فروش: {available}")
+                
+                for attempt in range(max_retries):
+                    product = self.get_product(product_id)
+                    if not product:
+                        raise ValueError(f"محصول {item['name']} یافت نشد")
+                    
+                    cursor.execute('''
+                        UPDATE products 
+                        SET current_stock = current_stock - ?, version = version + 1
+                        WHERE id = ? AND version = ? AND current_stock >= ?
+                    ''', (quantity, product_id, product['version'], quantity))
+                    
+                    if cursor.rowcount == 1:
+                        committed.append((product_id, quantity, product['version'] + 1))
+                        break
+                    
+                    # پایانه دیگری موجودی را تغییر داده است
+                    product = self.refresh_product(product_id, cursor)
+                    if not product or product['stock'] < quantity:
+                        raise ValueError(f"موجودی {item['name']} توسط پایانه دیگری فروخته شد")
+                else:
+                    raise ValueError(f"تداخل همزمانی در بروزرسانی موجودی {item['name']}")
+        return committed
+    
+    def confirm(self, owner, committed):
+        catalog = self.catalog
+        changed = []
+        membership_changed = False
+        with self.lock:
+            for product_id, quantity, version in committed:
+                index = catalog.find(product_id)
+                if index is None:
+                    continue
+                catalog.stock[index] -= quantity
+                catalog.versions[index] = version
+                if catalog.stock[index] <= 0:
+                    membership_changed = True
+                changed.append(index)
+            self.release(owner)
+        self.notify(changed, membership_changed)
+    
+    def notify(self, changed, membership_changed):
+        for hook in self.change_hooks:
+            hook(changed, membership_changed)
@@ -0,0 +1,410 @@
+import sqlite3
+import secrets
+import calendar
+import threading
+from datetime import datetime, date, timedelta
+
+# ==================== دفتر کل دوطرفه ====================
+class LedgerSystem:
+    CASH = '1-101'
+    BANK = '1-102'
+    RECEIVABLE = '1-103'
+    TAX_PAYABLE = '2-101'
+    CAPITAL = '5-101'
+    SALES_INCOME = '3-101'
+    GENERAL_EXPENSE = '4-102'
+    
+    # حساب‌هایی که ماهیت بدهکار دارند
+    DEBIT_NORMAL = ('asset', 'expense')
+    
+    def __init__(self, database):
+        self.database = database
+        self.account_ids = {}
+        self.account_types = {}
+        self.last_drift = []
+        self.posting_hooks = []
+        self.verifier_thread = None
+        self.verifier_stop = threading.Event()
+        self.ensure_accounts()
+        self.migrate_opening_balances()
+        self.migrate_customer_balances()
+    
+    def ensure_accounts(self):
+        chart = [
+            (self.CASH, 'صندوق', 'asset'),
+            (self.BANK, 'بانک ملی', 'asset'),
+            (self.RECEIVABLE, 'حساب‌های دریافتنی', 'asset'),
+            (self.TAX_PAYABLE, 'مالیات پرداختنی', 'liability'),
+            (self.SALES_INCOME, 'درآمد فروش', 'income'),
+            ('4-101', 'هزینه حقوق', 'expense'),
+            (self.GENERAL_EXPENSE, 'هزینه‌های عمومی', 'expense'),
+            (self.CAPITAL, 'سرمایه', 'equity')
+        ]
+        
+        self.database.write(lambda cursor: cursor.executemany(
+            "INSERT OR IGNORE INTO accounts (code, name, type, balance) VALUES (?, ?, ?, 0)", chart
+        ))
+        
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT id, code, type FROM accounts")
+        for account_id, code, type in cursor.fetchall():
+            self.account_ids[code] = account_id
+            self.account_types[account_id] = type
+    
+    def migrate_opening_balances(self):
+        # بررسی و انتقال در یک فرمان نویسنده تا دو پردازه هم‌زمان سند افتتاحیه را دو بار نزنند
+        try:
+            self.database.write(self.write_opening_balances)
+        except Exception as e:
+            print(f"❌ خطا در ایجاد سند افتتاحیه: {e}")
+    
+    def write_opening_balances(self, cursor):
+        # موجودی‌های قدیمی بدون سند به یک سند افتتاحیه تبدیل می‌شوند
+        cursor.execute("SELECT COUNT(*) FROM journal_lines")
+        if cursor.fetchone()[0] > 0:
+            return
+        
+        cursor.execute("SELECT code, type, balance FROM accounts WHERE balance != 0")
+        balances = cursor.fetchall()
+        if not balances:
+            return
+        
+        lines = []
+        for code, type, balance in balances:
+            if type in self.DEBIT_NORMAL:
+                lines.append((code, max(balance, 0), max(-balance, 0)))
+            else:
+                lines.append((code, max(-balance, 0), max(balance, 0)))
+        
+        difference = sum(debit - credit for _, debit, credit in lines)
+        if difference:
+            lines.append((self.CAPITAL, max(-difference, 0), max(difference, 0)))
+        
+        cursor.execute("UPDATE accounts SET balance = 0")
+        self.post_entry(cursor, datetime.now().strftime('%Y-%m-%d'), 'سند افتتاحیه',
+                        lines, source_type='opening', created_by='system')
+    
+    def migrate_customer_balances(self):
+        try:
+            self.database.write(self.write_customer_balances)
+        except Exception as e:
+            print(f"❌ خطا در انتقال مانده مشتریان: {e}")
+    
+    def write_customer_balances(self, cursor):
+        # مانده مشتریان به حساب‌های دریافتنی با تفکیک مشتری منتقل می‌شود
+        cursor.execute("SELECT COUNT(*) FROM journal_lines WHERE customer_id IS NOT NULL")
+        if cursor.fetchone()[0] > 0:
+            return
+        
+        cursor.execute("SELECT id, current_balance FROM customers WHERE current_balance != 0")
+        balances = cursor.fetchall()
+        if not balances:
+            return
+        
+        lines = [(self.RECEIVABLE, max(balance, 0), max(-balance, 0), customer_id)
+                 for customer_id, balance in balances]
+        total = sum(balance for _, balance in balances)
+        lines.append((self.CAPITAL, max(-total, 0), max(total, 0)))
+        
+        cursor.execute("UPDATE customers SET current_balance = 0")
+        self.post_entry(cursor, datetime.now().strftime('%Y-%m-%d'), 'سند افتتاحیه مشتریان',
+                        lines, source_type='opening', created_by='system')
+    
+    def account_id(self, code):
+        if code not in self.account_ids:
+            raise ValueError(f"حساب {code} یافت نشد")
+        return self.account_ids[code]
+    
+    def balance_delta(self, account_id, debit, credit):
+        if self.account_types.get(account_id) in self.DEBIT_NORMAL:
+            return debit - credit
+        return credit - debit
+    
+    def post_entry(self, cursor, date, description, lines, source_type=None, source_ref=None, created_by=None):
+        # ثبت سند و بروزرسانی مانده حساب‌ها در همان تراکنش فراخواننده (بدون commit)
+        # هر سطر: (کد حساب، بدهکار، بستانکار) یا (کد حساب، بدهکار، بستانکار، شناسه مشتری)
+        lines = [(line[0], round(line[1] or 0, 2), round(line[2] or 0, 2), line[3] if len(line) > 3 else None)
+                 for line in lines]
+        lines = [line for line in lines if line[1] or line[2]]
+        
+        total_debit = round(sum(line[1] for line in lines), 2)
+        total_credit = round(sum(line[2] for line in lines), 2)
+        if not lines or total_debit != total_credit:
+            raise ValueError(f"سند تراز نیست: بدهکار {total_debit:,} / بستانکار {total_credit:,}")
+        
+        entry_number = f"JE-{datetime.now().strftime('%Y%m%d%H%M%S')}-{secrets.token_hex(3)}"
+        cursor.execute('''
+            INSERT INTO journal_entries 
+            (entry_number, date, description, source_type, source_ref, created_by)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (entry_number, date, description, source_type, source_ref, created_by))
+        entry_id = cursor.lastrowid
+        
+        posted = []
+        for code, debit, credit, customer_id in lines:
+            account_id = self.account_id(code)
+            delta = self.balance_delta(account_id, debit, credit)
+            cursor.execute('''
+                INSERT INTO journal_lines (entry_id, account_id, customer_id, date, debit, credit)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (entry_id, account_id, customer_id, date, debit, credit))
+            cursor.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (delta, account_id))
+            
+            if customer_id is not None:
+                cursor.execute(
+                    "UPDATE customers SET current_balance = current_balance + ? WHERE id = ?",
+                    (debit - credit, customer_id)
+                )
+            posted.append((account_id, delta, customer_id, debit - credit))
+        
+        for hook in self.posting_hooks:
+            hook(cursor, date, posted)
+        
+        return entry_id
+    
+    def transaction_lines(self, type, amount):
+        if type == 'income':
+            return [(self.CASH, amount, 0), (self.SALES_INCOME, 0, amount)]
+        if type == 'expense':
+            return [(self.GENERAL_EXPENSE, amount, 0), (self.CASH, 0, amount)]
+        if type == 'transfer':
+            return [(self.BANK, amount, 0), (self.CASH, 0, amount)]
+        raise ValueError(f"نوع تراکنش نامعتبر است: {type}")
+    
+    def sale_lines(self, payment_method, net_sales, tax_amount, final_amount, customer_id=None):
+        if payment_method == 'نقدی':
+            debit_account = self.CASH
+        elif payment_method == 'اعتباری':
+            debit_account = self.RECEIVABLE
+        else:
+            debit_account = self.BANK
+        
+        return [
+            (debit_account, final_amount, 0, customer_id if debit_account == self.RECEIVABLE else None),
+            (self.SALES_INCOME, 0, net_sales),
+            (self.TAX_PAYABLE, 0, tax_amount)
+        ]
+    
+    def trial_balance(self):
+        accounts = self.database.cached_query(
+            "SELECT code, name, type, balance FROM accounts WHERE is_active = 1 ORDER BY code")
+        
+        rows = []
+        for code, name, type, balance in accounts:
+            if (type in self.DEBIT_NORMAL) == (balance >= 0):
+                debit, credit = abs(balance), 0
+            else:
+                debit, credit = 0, abs(balance)
+            rows.append({'code': code, 'name': name, 'type': type, 'debit': debit, 'credit': credit})
+        return rows
+    
+    def balance_sheet(self):
+        totals = {type: balance or 0 for type, balance in self.database.cached_query(
+            "SELECT type, SUM(balance) FROM accounts WHERE is_active = 1 GROUP BY type")}
+        
+        net_income = totals.get('income', 0) - totals.get('expense', 0)
+        return {
+            'assets': totals.get('asset', 0),
+            'liabilities': totals.get('liability', 0),
+            'equity': totals.get('equity', 0) + net_income,
+            'net_income': net_income
+        }
+    
+    def verify_balances(self, connection=None):
+        # محاسبه مجدد مانده‌ها از روی اسناد و گزارش اختلاف
+        connection = connection or self.database.connection
+        cursor = connection.cursor()
+        cursor.execute('''
+            SELECT a.code, a.name, a.type, a.balance,
+                   COALESCE(SUM(l.debit), 0), COALESCE(SUM(l.credit), 0)
+            FROM accounts a
+            LEFT JOIN journal_lines l ON l.account_id = a.id
+            GROUP BY a.id
+        ''')
+        
+        drift = []
+        for code, name, type, balance, debit, credit in cursor.fetchall():
+            expected = debit - credit if type in self.DEBIT_NORMAL else credit - debit
+            if abs(expected - balance) > 0.005:
+                drift.append({'code': code, 'name': name, 'balance': balance, 'expected': expected})
+        
+        cursor.execute('''
+            SELECT c.customer_code, c.name, c.current_balance, SUM(l.debit - l.credit)
+            FROM journal_lines l
+            JOIN customers c ON c.id = l.customer_id
+            GROUP BY l.customer_id
+        ''')
+        for code, name, balance, expected in cursor.fetchall():
+            if abs(expected - balance) > 0.005:
+                drift.append({'code': code, 'name': name, 'balance': balance, 'expected': expected})
+        
+        self.last_drift = drift
+        return drift
+    
+    def start_verifier(self, interval=300):
+        if self.verifier_thread and self.verifier_thread.is_alive():
+            return
+        
+        self.verifier_stop.clear()
+        self.verifier_thread = threading.Thread(target=self.run_verifier, args=(interval,), daemon=True)
+        self.verifier_thread.start()
+    
+    def stop_verifier(self):
+        self.verifier_stop.set()
+    
+    def run_verifier(self, interval):
+        # اتصال جداگانه تا خواندن‌ها با تراکنش‌های باز رابط کاربری تداخل نداشته باشند
+        connection = sqlite3.connect(self.database.db_path)
+        try:
+            while not self.verifier_stop.is_set():
+                try:
+                    for item in self.verify_balances(connection):
+                        print(f"⚠️ اختلاف مانده حساب {item['code']} ({item['name']}): "
+                              f"{item['balance']:,} به جای {item['expected']:,}")
+                except Exception as e:
+                    print(f"❌ خطا در بررسی مانده حساب‌ها: {e}")
+                self.verifier_stop.wait(interval)
+        finally:
+            connection.close()
+
+# ==================== بستن دوره و تصویر ماهانه مانده‌ها ====================
+class PeriodCloseSystem:
+    def __init__(self, database, ledger):
+        self.database = database
+        self.ledger = ledger
+        self.ledger.posting_hooks.append(self.adjust_snapshots)
+    
+    def period_end(self, period):
+        year, month = map(int, period.split('-'))
+        return f"{period}-{calendar.monthrange(year, month)[1]:02d}"
+    
+    def next_period(self, period):
+        year, month = map(int, period.split('-'))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return f"{year:04d}-{month:02d}"
+    
+    def last_closed_end(self, cursor=None):
+        cursor = cursor or self.database.connection.cursor()
+        cursor.execute("SELECT MAX(period_end) FROM closed_periods")
+        return cursor.fetchone()[0]
+    
+    def balance_as_of(self, entity_type, entity_id, as_of, cursor=None):
+        # نزدیک‌ترین تصویر ماهانه + سطرهای ثبت‌شده پس از آن
+        cursor = cursor or self.database.connection.cursor()
+        cursor.execute('''
+            SELECT period_end, balance FROM balance_snapshots 
+            WHERE entity_type = ? AND entity_id = ? AND period_end <= ?
+            ORDER BY period_end DESC LIMIT 1
+        ''', (entity_type, entity_id, as_of))
+        row = cursor.fetchone()
+        start, balance = row if row else ('', 0)
+        
+        column = 'account_id' if entity_type == 'account' else 'customer_id'
+        cursor.execute(f'''
+            SELECT COALESCE(SUM(debit), 0), COALESCE(SUM(credit), 0) FROM journal_lines 
+            WHERE {column} = ? AND date > ? AND date <= ?
+        ''', (entity_id, start, as_of))
+        debit, credit = cursor.fetchone()
+        
+        if entity_type == 'account':
+            return balance + self.ledger.balance_delta(entity_id, debit, credit)
+        return balance + debit - credit
+    
+    def account_balance_as_of(self, code, as_of):
+        return self.balance_as_of('account', self.ledger.account_id(code), as_of)
+    
+    def customer_balance_as_of(self, customer_id, as_of):
+        return self.balance_as_of('customer', customer_id, as_of)
+    
+    def trial_balance_as_of(self, as_of):
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT id, code, name, type FROM accounts WHERE is_active = 1 ORDER BY code")
+        
+        rows = []
+        for account_id, code, name, type in cursor.fetchall():
+            balance = self.balance_as_of('account', account_id, as_of, cursor)
+            rows.append({'code': code, 'name': name, 'type': type, 'balance': balance})
+        return rows
+    
+    def close_period(self, period, closed_by='system'):
+        try:
+            return self.database.write(self.write_period_close, period, closed_by)
+        except Exception as e:
+            return False, f"خطا در بستن دوره: {str(e)}"
+    
+    def write_period_close(self, cursor, period, closed_by):
+        # بررسی آخرین دوره بسته‌شده و ثبت تصویرها در یک تراکنش نویسنده
+        last_end = self.last_closed_end(cursor)
+        end = self.period_end(period)
+        
+        if last_end and end <= last_end:
+            return False, f"دوره {period} قبلاً بسته شده است"
+        
+        cursor.execute("SELECT id FROM accounts")
+        account_ids = [row[0] for row in cursor.fetchall()]
+        
+        # فقط مشتریانی که در این بازه گردش داشته‌اند تصویر جدید می‌گیرند
+        cursor.execute('''
+            SELECT DISTINCT customer_id FROM journal_lines 
+            WHERE customer_id IS NOT NULL AND date > ? AND date <= ?
+        ''', (last_end or '', end))
+        customer_ids = [row[0] for row in cursor.fetchall()]
+        
+        snapshots = [(period, end, 'account', account_id, self.balance_as_of('account', account_id, end, cursor))
+                     for account_id in account_ids]
+        snapshots += [(period, end, 'customer', customer_id, self.balance_as_of('customer', customer_id, end, cursor))
+                      for customer_id in customer_ids]
+        
+        cursor.executemany('''
+            INSERT OR REPLACE INTO balance_snapshots 
+            (period, period_end, entity_type, entity_id, balance)
+            VALUES (?, ?, ?, ?, ?)
+        ''', snapshots)
+        cursor.execute(
+            "INSERT INTO closed_periods (period, period_end, closed_by) VALUES (?, ?, ?)",
+            (period, end, closed_by)
+        )
+        return True, f"دوره {period} بسته شد"
+    
+    def close_due_periods(self, closed_by='system'):
+        # بستن همه ماه‌های کامل‌شده‌ای که هنوز تصویر ندارند
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT MAX(period) FROM closed_periods")
+        last_period = cursor.fetchone()[0]
+        
+        if last_period:
+            period = self.next_period(last_period)
+        else:
+            cursor.execute("SELECT MIN(date) FROM journal_lines")
+            first_date = cursor.fetchone()[0]
+            if not first_date:
+                return 0
+            period = first_date[:7]
+        
+        current_period = datetime.now().strftime('%Y-%m')
+        closed = 0
+        while period < current_period:
+            success, message = self.close_period(period, closed_by)
+            if not success:
+                print(f"❌ {message}")
+                break
+            closed += 1
+            period = self.next_period(period)
+        return closed
+    
+    def adjust_snapshots(self, cursor, date, posted):
+        # سند با تاریخ گذشته در دوره بسته‌شده: تصویرهای بعد از آن تاریخ اصلاح می‌شوند
+        last_end = self.last_closed_end(cursor)
+        if not last_end or date > last_end:
+            return
+        
+        for account_id, delta, customer_id, customer_delta in posted:
+            cursor.execute('''
+                UPDATE balance_snapshots SET balance = balance + ?
+                WHERE entity_type = 'account' AND entity_id = ? AND period_end >= ?
+            ''', (delta, account_id, date))
+            if customer_id is not None:
+                cursor.execute('''
+                    UPDATE balance_snapshots SET balance = balance + ?
+                    WHERE entity_type = 'customer' AND entity_id = ? AND period_end >= ?
+                ''', (customer_delta, customer_id, date))
@@ -0,0 +1,310 @@
+import queue
+import socket
+import secrets
+from datetime import datetime
+
+from core.security import PermissionMatcher
+from core.devices import PrinterSystem, CardReaderSystem, BarcodeReaderSystem
+from core.tax import TaxSystem
+from core.inventory import StockLedgerSystem
+from core.ledger import LedgerSystem
+
+# ==================== صف اسکن بارکد ====================
+class ScanQueue:
+    # اسکن‌ها از هر نخی وارد صف می‌شوند و نخ رابط کاربری آن‌ها را دسته‌ای برمی‌دارد
+    def __init__(self, max_size=10000):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.received = 0
+    
+    def submit(self, code, quantity=1):
+        # قالب «تعداد*بارکد» مثل 3*LAP-001 هم پذیرفته می‌شود
+        code = code.strip()
+        if '*' in code:
+            count, _, rest = code.partition('*')
+            if count.strip().isdigit() and rest.strip():
+                quantity, code = int(count), rest.strip()
+        if not code:
+            return False
+        
+        self.queue.put((code, quantity))
+        self.received += 1
+        return True
+    
+    def drain(self, max_items=500):
+        scans = []
+        try:
+            while len(scans) < max_items:
+                scans.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return scans
+    
+    def pending(self):
+        return self.queue.qsize()
+
+# ==================== سیستم POS واقعی ====================
+class CompletePOSSystem:
+    def __init__(self, database, current_user, stock_ledger=None, ledger=None, permissions=None, audit_log=None,
+                 receipt_journal=None):
+        self.database = database
+        self.audit_log = audit_log
+        self.current_user = current_user
+        self.permissions = permissions or PermissionMatcher(current_user.get('permissions', []))
+        self.stock_ledger = stock_ledger or StockLedgerSystem(database)
+        self.ledger = ledger or LedgerSystem(database)
+        self.terminal_id = f"{current_user['username']}-{secrets.token_hex(4)}"
+        # نام ثابت صندوق برای گزارش Z؛ terminal_id فقط رزروهای همین نشست است
+        self.terminal = database.get_setting('pos_terminal') or socket.gethostname()
+        self.current_cart = []
+        self.cart_index = {}
+        self.cart_total = 0
+        # هر hook با (رویداد، ردیف، قلم) صدا زده می‌شود: insert، update، remove یا reset
+        self.cart_hooks = []
+        self.tax_system = TaxSystem(database)
+        self.printer_system = PrinterSystem(receipt_journal)
+        self.card_reader = CardReaderSystem()
+        self.barcode_reader = BarcodeReaderSystem(database)
+    
+    def add_to_cart(self, product_id, quantity=1):
+        if not self.permissions.has_permission('pos.sell'):
+            return False, "شما دسترسی فروش ندارید"
+        
+        try:
+            # موجودی از دفتر حافظه خوانده می‌شود، نه از دیتابیس
+            product = self.stock_ledger.get_product(product_id)
+            
+            if not product:
+                return False, "محصول یافت نشد"
+            
+            success, available = self.stock_ledger.reserve(self.terminal_id, product_id, quantity)
+            
+            row = self.cart_index.get(product_id)
+            if row is not None:
+                if not success:
+                    return False, f"تعداد درخواستی بیشتر از موجودی است"
+                item = self.current_cart[row]
+                item['quantity'] += quantity
+                item['total'] = item['quantity'] * item['unit_price']
+                item['available_stock'] = product['stock']
+                self.update_totals(item['unit_price'] * quantity)
+                self.notify_cart('update', row, item)
+                return True, f"تعداد {product['name']} به {item['quantity']} افزایش یافت"
+            
+            if not success:
+                return False, f"موجودی کافی نیست. موجودی فعلی: {available}"
+            
+            cart_item = {
+                'product_id': product_id,
+                'sku': product['sku'],
+                'name': product['name'],
+                'unit_price': product['price'],
+                'quantity': quantity,
+                'total': product['price'] * quantity,
+                'available_stock': product['stock']
+            }
+            self.cart_index[product_id] = len(self.current_cart)
+            self.current_cart.append(cart_item)
+            self.update_totals(cart_item['total'])
+            self.notify_cart('insert', len(self.current_cart) - 1, cart_item)
+            return True, f"{product['name']} به سبد خرید اضافه شد"
+            
+        except Exception as e:
+            return False, f"خطا در اضافه کردن به سبد: {str(e)}"
+    
+    def add_scans(self, scans):
+        # تجمیع تعداد هر بارکد در دسته و یک بار افزودن به سبد برای هر محصول
+        quantities = {}
+        for code, quantity in scans:
+            quantities[code] = quantities.get(code, 0) + quantity
+        
+        resolved = self.stock_ledger.resolve_skus(list(quantities))
+        results = []
+        for code, quantity in quantities.items():
+            product_id = resolved.get(code)
+            if product_id is None:
+                results.append((code, quantity, False, f"محصول با بارکد {code} یافت نشد"))
+                continue
+            success, message = self.add_to_cart(product_id, quantity)
+            results.append((code, quantity, success, message))
+        return results
+    
+    def remove_from_cart(self, product_id):
+        row = self.cart_index.pop(product_id, None)
+        self.stock_ledger.release(self.terminal_id, product_id)
+        if row is not None:
+            removed = self.current_cart.pop(row)
+            self.audit('pos.void_item', 'product', product_id,
+                       {'quantity': removed['quantity'], 'total': removed['total']})
+            for item in self.current_cart[row:]:
+                self.cart_index[item['product_id']] -= 1
+            self.update_totals(-removed['total'])
+            self.notify_cart('remove', row, removed)
+        return True, "محصول از سبد حذف شد"
+    
+    def calculate_totals(self):
+        self.cart_total = sum(item['total'] for item in self.current_cart)
+        self.update_totals(0)
+    
+    def update_totals(self, delta):
+        # جمع سبد با تفاضل هر تغییر بروز می‌شود، نه با پیمایش دوباره همه اقلام
+        self.cart_total += delta
+        if not self.current_cart:
+            self.cart_total = 0
+        self.tax_amount = self.tax_system.calculate_total_tax(self.cart_total)
+        self.final_amount = self.cart_total + self.tax_amount
+    
+    def notify_cart(self, event, row, item=None):
+        for hook in self.cart_hooks:
+            hook(event, row, item)
+    
+    def clear_cart(self, void=True):
+        if void and self.current_cart:
+            self.audit('pos.void_cart', 'cart', self.terminal_id,
+                       {'items': len(self.current_cart), 'total': self.cart_total})
+        self.current_cart.clear()
+        self.cart_index.clear()
+        self.stock_ledger.release(self.terminal_id)
+        self.calculate_totals()
+        self.notify_cart('reset', None)
+        return True, "سبد خرید پاک شد"
+    
+    def process_payment(self, payment_method, discount=0):
+        if not self.permissions.has_permission('pos.sell'):
+            return False, "شما دسترسی فروش ندارید"
+        
+        if not self.current_cart:
+            return False, "سبد خرید خالی است"
+        
+        try:
+            # ارقام پیش از پاک شدن سبد گرفته می‌شوند
+            cart_total = self.cart_total
+            tax_amount = self.tax_amount
+            tax_breakdown = self.get_tax_breakdown(cart_total)
+            discount_amount = cart_total * (discount / 100)
+            final_after_discount = self.final_amount - discount_amount
+            
+            # همه نوشتن‌های فروش یک فرمان در صف نوشتن است و با تعهد گروهی ذخیره می‌شود
+            invoice_number, committed = self.database.write(self.write_sale, payment_method,
+                                                            discount_amount, final_after_discount)
+            self.stock_ledger.confirm(self.terminal_id, committed)
+            
+            # چاپ فاکتور
+            receipt_data = {
+                'invoice_number': invoice_number,
+                'items': self.current_cart,
+                'total_amount': cart_total,
+                'discount_amount': discount_amount,
+                'tax_amount': tax_amount,
+                'final_amount': final_after_discount,
+                'payment_method': payment_method
+            }
+            self.printer_system.print_receipt(receipt_data)
+            self.audit('pos.sale', 'invoice', invoice_number,
+                       {'final_amount': final_after_discount, 'payment_method': payment_method})
+            
+            self.clear_cart(void=False)
+            
+            return True, {
+                'invoice_number': invoice_number,
+                'total_amount': cart_total,
+                'tax_amount': tax_amount,
+                'discount_amount': discount_amount,
+                'final_amount': final_after_discount,
+                'tax_breakdown': tax_breakdown
+            }
+            
+        except Exception as e:
+            return False, f"خطا در پردازش پرداخت: {str(e)}"
+    
+    def next_invoice_number(self, cursor):
+        # شماره از خود دیتابیس و داخل تراکنش نویسنده؛ همه صندوق‌ها و نشست‌ها یک دنباله روزانه دارند
+        prefix = f"INV-{datetime.now().strftime('%Y%m%d')}-"
+        cursor.execute('''
+            SELECT COALESCE(MAX(CAST(substr(invoice_number, ?) AS INTEGER)), 999) + 1
+            FROM invoices WHERE invoice_number GLOB ?
+        ''', (len(prefix) + 1, prefix + '*'))
+        return f"{prefix}{cursor.fetchone()[0]}"
+    
+    def write_sale(self, cursor, payment_method, discount_amount, final_after_discount):
+        invoice_number = self.next_invoice_number(cursor)
+        cursor.execute('''
+            INSERT INTO invoices 
+            (invoice_number, customer_id, invoice_date, total_amount, tax_amount, 
+             discount_amount, final_amount, status, payment_method, created_by, terminal)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            invoice_number,
+            None,
+            datetime.now().strftime('%Y-%m-%d'),
+            self.cart_total,
+            self.tax_amount,
+            discount_amount,
+            final_after_discount,
+            'paid',
+            payment_method,
+            self.current_user['username'],
+            self.terminal
+        ))
+        
+        invoice_id = cursor.lastrowid
+        
+        cursor.executemany('''
+            INSERT INTO invoice_taxes (invoice_id, tax_name, tax_rate, amount)
+            VALUES (?, ?, ?, ?)
+        ''', [(invoice_id, tax_name, tax['rate'], tax['amount'])
+              for tax_name, tax in self.get_tax_breakdown(self.cart_total).items()])
+        
+        for item in self.current_cart:
+            cursor.execute('''
+                INSERT INTO invoice_items 
+                (invoice_id, product_id, quantity, unit_price, line_total)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (invoice_id, item['product_id'], item['quantity'], item['unit_price'], item['total']))
+        
+        committed = self.stock_ledger.commit(self.terminal_id, self.current_cart, cursor)
+        
+        # سند دوطرفه فروش: بدهکار صندوق/بانک، بستانکار درآمد و مالیات
+        lines = self.ledger.sale_lines(
+            payment_method,
+            self.cart_total - discount_amount,
+            self.tax_amount,
+            final_after_discount
+        )
+        self.ledger.post_entry(
+            cursor,
+            datetime.now().strftime('%Y-%m-%d'),
+            f'فروش فاکتور {invoice_number}',
+            lines,
+            source_type='invoice',
+            source_ref=invoice_number,
+            created_by=self.current_user['username']
+        )
+        
+        cursor.execute('''
+            INSERT INTO transactions 
+            (transaction_number, date, type, description, amount, account_id, created_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            f"TRX-{invoice_number}",
+            datetime.now().strftime('%Y-%m-%d'),
+            'income',
+            f'فروش فاکتور {invoice_number}',
+            final_after_discount,
+            self.ledger.account_id(lines[0][0]),
+            self.current_user['username']
+        ))
+        return invoice_number, committed
+    
+    def audit(self, action, entity_type, entity_id, details=None):
+        if self.audit_log:
+            self.audit_log.log(action, username=self.current_user['username'], entity_type=entity_type,
+                               entity_id=entity_id, details=details)
+    
+    def get_tax_breakdown(self, amount):
+        breakdown = {}
+        for tax_name, tax_rate in self.tax_system.tax_rates.items():
+            breakdown[tax_name] = {
+                'rate': tax_rate,
+                'amount': self.tax_system.calculate_tax(amount, tax_name)
+            }
+        return breakdown
@@ -0,0 +1,298 @@
+import os
+import mmap
+import zlib
+import struct
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from core.rendering import TextReceiptTemplate
+
+try:
+    import fcntl
+except ImportError:
+    # ویندوز
+    fcntl = None
+    import msvcrt
+
+
+# ==================== بایگانی رسیدها ====================
+class ReceiptJournal:
+    # رسیدها فقط افزوده می‌شوند: فایل‌های قطعه فشرده + نمایه شماره فاکتور ← (قطعه، آفست، طول)
+    # هر رسید جداگانه با یک دیکشنری از پیش آماده فشرده می‌شود تا چاپ مجدد یک seek و یک بازگشایی باشد
+    SEGMENT_MAGIC = b'RCJ1'
+    SEGMENT_HEADER = struct.Struct('<4sH')
+    RECORD_HEADER = struct.Struct('<HII')
+    # متن ثابت قالب رسید؛ در سر هر قطعه ذخیره می‌شود تا تغییر قالب قطعه‌های قدیمی را خراب نکند
+    ZDICT = (TextReceiptTemplate.HEADER + TextReceiptTemplate.FOOTER).encode('utf-8')
+    MAX_OPEN_MAPS = 8
+    
+    def __init__(self, directory, max_segment_bytes=32 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.lock = threading.Lock()
+        self.maps = OrderedDict()
+        self.dictionaries = {}
+        self.active = None
+        self.active_file = None
+        self.active_month = None
+        self.stats = {'appended': 0, 'duplicates': 0, 'reads': 0, 'rotations': 0, 'recovered': 0}
+        
+        os.makedirs(directory, exist_ok=True)
+        # چند صندوق یا خط فرمان ممکن است یک پوشه بایگانی را به اشتراک بگذارند؛ نوشتن با قفل فایل سیستم‌عامل
+        self.lock_file = open(os.path.join(directory, 'journal.lock'), 'a+b')
+        self.index = sqlite3.connect(os.path.join(directory, 'index.db'), check_same_thread=False)
+        self.index.execute("PRAGMA journal_mode = WAL")
+        self.index.execute('''
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                month TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self.index.execute('''
+            CREATE TABLE IF NOT EXISTS receipts (
+                invoice_number TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                raw_length INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self.index.execute("CREATE INDEX IF NOT EXISTS idx_receipts_segment ON receipts (segment, offset)")
+        self.index.commit()
+        self.acquire()
+        try:
+            if self.index.execute("SELECT COUNT(*) FROM segments").fetchone()[0] == 0:
+                self.rebuild_index()
+            self.open_active()
+        finally:
+            self.release()
+    
+    def acquire(self):
+        self.lock.acquire()
+        try:
+            if fcntl:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        except Exception:
+            self.lock.release()
+            raise
+    
+    def release(self):
+        try:
+            if fcntl:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.lock.release()
+    
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.rcj")
+    
+    # ==================== نوشتن ====================
+    def open_active(self):
+        # زیر قفل فایل: آخرین قطعه از نمایه مشترک؛ پردازه دیگر ممکن است قطعه را چرخانده یا به آن افزوده باشد
+        row = self.index.execute("SELECT id, month FROM segments ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None or not os.path.exists(self.segment_path(row[0])):
+            self.rotate()
+            return
+        if row[0] != self.active:
+            if self.active_file:
+                self.active_file.close()
+            self.active, self.active_month = row
+            self.active_file = open(self.segment_path(self.active), 'r+b')
+        if os.fstat(self.active_file.fileno()).st_size != self.indexed_end():
+            self.recover()
+        self.active_file.seek(0, os.SEEK_END)
+    
+    def indexed_end(self):
+        row = self.index.execute('''
+            SELECT offset + length FROM receipts WHERE segment = ? ORDER BY offset DESC LIMIT 1
+        ''', (self.active,)).fetchone()
+        if row:
+            return row[0]
+        return self.SEGMENT_HEADER.size + len(self.segment_dictionary(self.active))
+    
+    def segment_dictionary(self, segment):
+        if segment not in self.dictionaries:
+            with open(self.segment_path(segment), 'rb') as f:
+                magic, dict_length = self.SEGMENT_HEADER.unpack(f.read(self.SEGMENT_HEADER.size))
+                self.dictionaries[segment] = f.read(dict_length)
+        return self.dictionaries[segment]
+    
+    def rotate(self):
+        # قطعه جدید در آغاز هر ماه یا با رسیدن به سقف اندازه
+        if self.active_file:
+            self.active_file.close()
+        month = datetime.now().strftime('%Y-%m')
+        cursor = self.index.execute("INSERT INTO segments (month) VALUES (?)", (month,))
+        self.index.commit()
+        self.active, self.active_month = cursor.lastrowid, month
+        self.active_file = open(self.segment_path(self.active), 'w+b')
+        self.active_file.write(self.SEGMENT_HEADER.pack(self.SEGMENT_MAGIC, len(self.ZDICT)) + self.ZDICT)
+        self.active_file.flush()
+        self.dictionaries[self.active] = self.ZDICT
+        self.stats['rotations'] += 1
+    
+    def append(self, invoice_number, receipt_text):
+        raw = receipt_text.encode('utf-8')
+        number = invoice_number.encode('utf-8')
+        self.acquire()
+        try:
+            # اولین رسید هر فاکتور نگه داشته می‌شود؛ چاپ مجدد دوباره بایگانی نمی‌شود
+            if self.locate(invoice_number):
+                self.stats['duplicates'] += 1
+                return False
+            
+            self.open_active()
+            # قالب عوض شده باشد قطعه تازه با دیکشنری جدید؛ رکوردها همیشه با دیکشنری سر قطعه خودشان فشرده می‌شوند
+            if (self.active_month != datetime.now().strftime('%Y-%m') or
+                    self.active_file.tell() >= self.max_segment_bytes or
+                    self.segment_dictionary(self.active) != self.ZDICT):
+                self.rotate()
+            
+            compressor = zlib.compressobj(9, zdict=self.segment_dictionary(self.active))
+            payload = compressor.compress(raw) + compressor.flush()
+            record = self.RECORD_HEADER.pack(len(number), len(payload), zlib.crc32(payload)) + number + payload
+            
+            offset = self.active_file.tell()
+            self.active_file.write(record)
+            self.active_file.flush()
+            # نمایه پس از نوشتن رکورد؛ رکورد بی‌نمایه پس از قطع برق در recover بازیابی می‌شود
+            self.index.execute('''
+                INSERT INTO receipts (invoice_number, segment, offset, length, raw_length)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (invoice_number, self.active, offset, len(record), len(raw)))
+            self.index.commit()
+            self.stats['appended'] += 1
+            return True
+        finally:
+            self.release()
+    
+    # ==================== خواندن ====================
+    def locate(self, invoice_number):
+        return self.index.execute('''
+            SELECT segment, offset, length FROM receipts WHERE invoice_number = ?
+        ''', (invoice_number,)).fetchone()
+    
+    def segment_map(self, segment, end):
+        # نگاشت حافظه قطعه‌ها با سقف تعداد باز؛ قطعه فعال در صورت رشد دوباره نگاشت می‌شود
+        view = self.maps.get(segment)
+        if view is not None and len(view) < end:
+            view.close()
+            view = None
+        if view is None:
+            with open(self.segment_path(segment), 'rb') as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, dict_length = self.SEGMENT_HEADER.unpack_from(view, 0)
+            if magic != self.SEGMENT_MAGIC:
+                view.close()
+                raise ValueError(f"قطعه {segment} بایگانی رسید معتبر نیست")
+            self.dictionaries[segment] = view[self.SEGMENT_HEADER.size:self.SEGMENT_HEADER.size + dict_length]
+            self.maps[segment] = view
+            while len(self.maps) > self.MAX_OPEN_MAPS:
+                _, oldest = self.maps.popitem(last=False)
+                oldest.close()
+        self.maps.move_to_end(segment)
+        return view
+    
+    def read_record(self, view, offset, segment):
+        number_length, payload_length, checksum = self.RECORD_HEADER.unpack_from(view, offset)
+        start = offset + self.RECORD_HEADER.size
+        number = view[start:start + number_length].decode('utf-8')
+        payload = view[start + number_length:start + number_length + payload_length]
+        if len(payload) != payload_length or zlib.crc32(payload) != checksum:
+            raise ValueError(f"رکورد خراب در قطعه {segment} آفست {offset}")
+        decompressor = zlib.decompressobj(zdict=self.dictionaries[segment])
+        return number, decompressor.decompress(payload) + decompressor.flush()
+    
+    def get(self, invoice_number):
+        with self.lock:
+            location = self.locate(invoice_number)
+            if location is None:
+                return None
+            segment, offset, length = location
+            view = self.segment_map(segment, offset + length)
+            self.stats['reads'] += 1
+            return self.read_record(view, offset, segment)[1].decode('utf-8')
+    
+    def records(self, segment, start=None):
+        # پیمایش رکوردهای یک قطعه؛ با رسیدن به رکورد ناقص یا خراب متوقف می‌شود
+        path = self.segment_path(segment)
+        dict_length = len(self.segment_dictionary(segment))
+        if os.path.getsize(path) <= self.SEGMENT_HEADER.size + dict_length:
+            return
+        with open(path, 'rb') as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offset = start or self.SEGMENT_HEADER.size + dict_length
+            while offset + self.RECORD_HEADER.size <= len(view):
+                number_length, payload_length, _ = self.RECORD_HEADER.unpack_from(view, offset)
+                length = self.RECORD_HEADER.size + number_length + payload_length
+                try:
+                    number, raw = self.read_record(view, offset, segment)
+                except (ValueError, zlib.error, UnicodeDecodeError):
+                    return
+                yield number, offset, length, len(raw)
+                offset += length
+        finally:
+            view.close()
+    
+    # ==================== بازیابی ====================
+    def recover(self):
+        # رکوردهای نوشته‌شده ولی نمایه‌نشده قطعه فعال نمایه و دنباله ناقص بریده می‌شود
+        end = self.indexed_end()
+        for number, offset, length, raw_length in self.records(self.active, end):
+            self.index.execute('''
+                INSERT OR IGNORE INTO receipts (invoice_number, segment, offset, length, raw_length)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (number, self.active, offset, length, raw_length))
+            end = offset + length
+            self.stats['recovered'] += 1
+        self.index.commit()
+        self.active_file.truncate(end)
+    
+    def rebuild_index(self):
+        # ساخت دوباره نمایه از روی فایل‌های قطعه، مثلاً پس از گم شدن index.db
+        count = 0
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith('segment-') and name.endswith('.rcj')):
+                continue
+            segment = int(name[len('segment-'):-len('.rcj')])
+            month = datetime.fromtimestamp(os.path.getmtime(self.segment_path(segment))).strftime('%Y-%m')
+            self.index.execute("INSERT OR IGNORE INTO segments (id, month) VALUES (?, ?)", (segment, month))
+            rows = [(number, segment, offset, length, raw_length)
+                    for number, offset, length, raw_length in self.records(segment)]
+            self.index.executemany('''
+                INSERT OR IGNORE INTO receipts (invoice_number, segment, offset, length, raw_length)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            count += len(rows)
+        self.index.commit()
+        return count
+    
+    def status(self):
+        with self.lock:
+            receipts, stored, raw = self.index.execute('''
+                SELECT COUNT(*), COALESCE(SUM(length), 0), COALESCE(SUM(raw_length), 0) FROM receipts
+            ''').fetchone()
+            segments = self.index.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            return dict(self.stats, receipts=receipts, segments=segments, stored_bytes=stored, raw_bytes=raw,
+                        ratio=round(raw / stored, 2) if stored else 0)
+    
+    def close(self):
+        with self.lock:
+            for view in self.maps.values():
+                view.close()
+            self.maps.clear()
+            if self.active_file:
+                self.active_file.close()
+                self.active_file = None
+            self.index.close()
+            self.lock_file.close()
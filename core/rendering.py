@@ -0,0 +1,236 @@
+import os
+import html
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from core.repositories import InvoiceRepository, ProductRepository
+
+
+# ==================== قالب‌های فاکتور ====================
+class TextReceiptTemplate:
+    # قالب‌ها یک بار آماده می‌شوند و هر فاکتور با یک join از تکه‌ها ساخته می‌شود، نه با الحاق پیاپی رشته
+    extension = 'txt'
+    RULE = '=' * 40
+    LINE = '-' * 40
+    HEADER = '\n        '.join([
+        '', '🧾 فاکتور فروشگاه', RULE, 'شماره فاکتور: {invoice_number}', 'تاریخ: {date}', LINE, 'موارد خرید:', ''
+    ])
+    ITEM = '\n{name:20} {quantity} x {price:,} = {total:,}'
+    FOOTER = '\n        '.join([
+        '', LINE, 'جمع کل: {total_amount:,} تومان', 'تخفیف: {discount_amount:,} تومان',
+        'مالیات: {tax_amount:,} تومان', RULE, 'مبلغ قابل پرداخت: {final_amount:,} تومان',
+        'روش پرداخت: {payment_method}', RULE, 'با تشکر از خرید شما!', ''
+    ])
+    
+    def __init__(self):
+        self.header = self.HEADER.format
+        self.item = self.ITEM.format
+        self.footer = self.FOOTER.format
+    
+    def escape(self, value):
+        return value
+    
+    def fields(self, data):
+        return {
+            'invoice_number': self.escape(data['invoice_number']),
+            'date': data.get('date') or datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'total_amount': data['total_amount'],
+            'discount_amount': data['discount_amount'],
+            'tax_amount': data['tax_amount'],
+            'final_amount': data['final_amount'],
+            'payment_method': self.escape(data['payment_method'] or '-')
+        }
+    
+    def render(self, data):
+        fields = self.fields(data)
+        parts = [self.header(**fields)]
+        for item in data.get('items', []):
+            # اقلام سبد خرید unit_price و اقلام قدیمی price دارند
+            parts.append(self.item(name=self.escape(item['name']), quantity=item['quantity'],
+                                   price=item.get('unit_price', item.get('price')), total=item['total']))
+        parts.append(self.footer(**fields))
+        return ''.join(parts)
+    
+    def write(self, path, data):
+        content = self.render(data).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return len(content)
+
+
+class HtmlReceiptTemplate(TextReceiptTemplate):
+    extension = 'html'
+    HEADER = (
+        '<!DOCTYPE html><html dir="rtl" lang="fa"><head><meta charset="utf-8">'
+        '<title>{invoice_number}</title></head><body>'
+        '<h2>🧾 فاکتور فروشگاه</h2>'
+        '<p>شماره فاکتور: {invoice_number}<br>تاریخ: {date}</p>'
+        '<table border="1" cellspacing="0" cellpadding="4" width="100%">'
+        '<tr><th>کالا</th><th>تعداد</th><th>فی</th><th>جمع</th></tr>'
+    )
+    ITEM = '<tr><td>{name}</td><td>{quantity}</td><td>{price:,}</td><td>{total:,}</td></tr>'
+    FOOTER = (
+        '</table><p>جمع کل: {total_amount:,} تومان<br>تخفیف: {discount_amount:,} تومان<br>'
+        'مالیات: {tax_amount:,} تومان</p>'
+        '<p><b>مبلغ قابل پرداخت: {final_amount:,} تومان</b><br>روش پرداخت: {payment_method}</p>'
+        '<p>با تشکر از خرید شما!</p></body></html>'
+    )
+    
+    def escape(self, value):
+        return html.escape(str(value))
+
+
+class PdfReceiptTemplate(HtmlReceiptTemplate):
+    # همان قالب HTML با موتور متن Qt به PDF تبدیل می‌شود تا فارسی و راست‌به‌چپ درست چیده شود
+    extension = 'pdf'
+    
+    def __init__(self):
+        super().__init__()
+        try:
+            from PyQt5.QtGui import QGuiApplication, QTextDocument, QPdfWriter, QPageSize
+        except ImportError:
+            raise RuntimeError("برای خروجی PDF بسته PyQt5 لازم است")
+        # پردازه‌های کارگر نمایشگر ندارند
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        self.app = QGuiApplication.instance() or QGuiApplication(['invoice-renderer'])
+        self.document = QTextDocument()
+        self.pdf_writer = QPdfWriter
+        self.page_size = QPageSize(QPageSize.A5)
+    
+    def write(self, path, data):
+        writer = self.pdf_writer(path)
+        writer.setPageSize(self.page_size)
+        self.document.setHtml(self.render(data))
+        self.document.print_(writer)
+        del writer
+        return os.path.getsize(path)
+
+
+TEMPLATES = {
+    'text': TextReceiptTemplate,
+    'html': HtmlReceiptTemplate,
+    'pdf': PdfReceiptTemplate
+}
+
+# ==================== پردازه‌های کارگر ====================
+worker_template = None
+
+
+def init_worker(fmt):
+    # هر پردازه قالب را یک بار می‌سازد
+    global worker_template
+    worker_template = TEMPLATES[fmt]()
+
+
+def render_batch(output_dir, invoices):
+    written = 0
+    size = 0
+    folders = set()
+    for data in invoices:
+        folder = os.path.join(output_dir, data['date'][:10])
+        if folder not in folders:
+            os.makedirs(folder, exist_ok=True)
+            folders.add(folder)
+        name = data['invoice_number'].replace(os.sep, '_')
+        size += worker_template.write(os.path.join(folder, f"{name}.{worker_template.extension}"), data)
+        written += 1
+    return written, size
+
+
+# ==================== تولید دسته‌ای فاکتورها ====================
+class InvoiceRenderSystem:
+    # فاکتورها دسته‌دسته از دیتابیس خوانده و بین پردازه‌ها پخش می‌شوند؛ در هر لحظه فقط چند دسته در حافظه است
+    BATCH_SIZE = 200
+    
+    def __init__(self, database, journal=None):
+        self.database = database
+        self.journal = journal
+        self.invoices = InvoiceRepository(database)
+        self.products = ProductRepository(database)
+        self.product_names = {}
+    
+    def names_for(self, items):
+        missing = {item.product_id for item in items if item.product_id not in self.product_names}
+        if missing:
+            for product_id, product in self.products.get_many(missing).items():
+                self.product_names[product_id] = product.name
+        return self.product_names
+    
+    def receipt_data(self, invoice, items):
+        names = self.names_for(items)
+        return {
+            'invoice_number': invoice.invoice_number,
+            'date': invoice.invoice_date,
+            'items': [{
+                'name': names.get(item.product_id, str(item.product_id)),
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'total': item.line_total
+            } for item in items],
+            'total_amount': invoice.total_amount,
+            'discount_amount': invoice.discount_amount,
+            'tax_amount': invoice.tax_amount,
+            'final_amount': invoice.final_amount,
+            'payment_method': invoice.payment_method
+        }
+    
+    def batches(self, start, end, batch_size):
+        # صفحه‌بندی با آخرین شناسه؛ هر دسته یک کوئری فاکتور و یک کوئری اقلام
+        last_id = 0
+        while True:
+            invoices = self.invoices.for_range(start, end, last_id, batch_size)
+            if not invoices:
+                return
+            last_id = invoices[-1].id
+            items = self.invoices.items([invoice.id for invoice in invoices])
+            yield [self.receipt_data(invoice, items[invoice.id]) for invoice in invoices]
+    
+    def render(self, output_dir, start, end, fmt='text', workers=None, batch_size=None):
+        if fmt not in TEMPLATES:
+            return False, f"قالب خروجی نامعتبر است: {fmt}"
+        
+        workers = workers or os.cpu_count() or 1
+        batch_size = batch_size or self.BATCH_SIZE
+        stats = {'invoices': 0, 'bytes': 0, 'batches': 0, 'workers': workers}
+        started = time.perf_counter()
+        
+        def collect(done):
+            for future in done:
+                written, size = future.result()
+                stats['invoices'] += written
+                stats['bytes'] += size
+                stats['batches'] += 1
+        
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            # spawn چون پردازه اصلی نخ نویسنده و اتصال sqlite باز دارد
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                                     initargs=(fmt,)) as pool:
+                pending = set()
+                for batch in self.batches(start, end, batch_size):
+                    # حداکثر دو دسته در انتظار برای هر پردازه تا حافظه محدود بماند
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    pending.add(pool.submit(render_batch, output_dir, batch))
+                collect(wait(pending)[0])
+        except Exception as e:
+            return False, f"خطا در تولید فاکتورها: {str(e)}"
+        
+        stats['seconds'] = round(time.perf_counter() - started, 2)
+        return True, stats
+    
+    def reprint(self, invoice_number, printer_system):
+        # رسید اصلی از بایگانی؛ فاکتورهای پیش از بایگانی از روی دیتابیس دوباره ساخته می‌شوند
+        receipt_text = self.journal.get(invoice_number) if self.journal else None
+        if receipt_text is not None:
+            return printer_system.print_text(receipt_text)
+        
+        invoice = self.invoices.get_by_number(invoice_number)
+        if not invoice:
+            return False, "فاکتور یافت نشد"
+        items = self.invoices.items([invoice.id])[invoice.id]
+        return printer_system.print_receipt(self.receipt_data(invoice, items))
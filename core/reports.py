@@ -0,0 +1,171 @@
+from datetime import datetime
+
+
+# ==================== گزارشات ====================
+class ReportSystem:
+    # متن گزارش‌ها هم در رابط کاربری و هم در خط فرمان استفاده می‌شود
+    def __init__(self, database, ledger, period_close=None):
+        self.database = database
+        self.ledger = ledger
+        self.period_close = period_close
+    
+    def sales_report(self):
+        # آمار فروش
+        stats = self.database.cached_query('''
+            SELECT
+                COUNT(*) as total_invoices,
+                COALESCE(SUM(final_amount), 0) as total_sales,
+                COALESCE(AVG(final_amount), 0) as avg_sale,
+                COALESCE(MAX(final_amount), 0) as max_sale
+            FROM invoices
+            WHERE status = 'paid'
+        ''')[0]
+        
+        # محصولات پرفروش
+        top_products = self.database.cached_query('''
+            SELECT p.name, SUM(ii.quantity) as total_sold
+            FROM invoice_items ii
+            JOIN products p ON ii.product_id = p.id
+            GROUP BY p.name
+            ORDER BY total_sold DESC
+            LIMIT 5
+        ''')
+        
+        report = f"""
+        📊 گزارش جامع فروش
+        ─────────────────────────────
+        📈 آمار کلی:
+        • تعداد فاکتورها: {stats[0]:,}
+        • مجموع فروش: {stats[1]:,} تومان
+        • میانگین هر فاکتور: {stats[2]:,.0f} تومان
+        • بیشترین فروش: {stats[3]:,} تومان
+        
+        🏆 محصولات پرفروش:
+        """
+        
+        for i, (product, quantity) in enumerate(top_products, 1):
+            report += f"\n{i}. {product}: {quantity:,} عدد"
+        
+        return report
+    
+    def financial_report(self):
+        # تراکنش‌های مالی
+        transactions = self.database.cached_query('''
+            SELECT type, COUNT(*), SUM(amount)
+            FROM transactions
+            GROUP BY type
+        ''')
+        
+        # تراز آزمایشی از روی مانده‌های بروز حساب‌ها
+        trial_balance = self.ledger.trial_balance()
+        balance_sheet = self.ledger.balance_sheet()
+        
+        report = """
+        💹 گزارش وضعیت مالی
+        ─────────────────────────────
+        💰 تراکنش‌ها بر اساس نوع:
+        """
+        
+        for trans_type, count, amount in transactions:
+            report += f"\n• {trans_type}: {count:,} تراکنش - {amount:,} تومان"
+        
+        report += "\n\n⚖️ تراز آزمایشی:"
+        total_debit = 0
+        total_credit = 0
+        for row in trial_balance:
+            report += f"\n• {row['code']} {row['name']}: بدهکار {row['debit']:,} - بستانکار {row['credit']:,} تومان"
+            total_debit += row['debit']
+            total_credit += row['credit']
+        
+        report += f"\n\n💰 جمع بدهکار: {total_debit:,} تومان - جمع بستانکار: {total_credit:,} تومان"
+        
+        report += "\n\n🏦 ترازنامه:"
+        report += f"\n• دارایی‌ها: {balance_sheet['assets']:,} تومان"
+        report += f"\n• بدهی‌ها: {balance_sheet['liabilities']:,} تومان"
+        report += f"\n• حقوق صاحبان سهام: {balance_sheet['equity']:,} تومان"
+        report += f"\n• سود خالص دوره: {balance_sheet['net_income']:,} تومان"
+        
+        if self.ledger.last_drift:
+            report += "\n\n⚠️ اختلاف مانده حساب‌ها:"
+            for item in self.ledger.last_drift:
+                report += f"\n• {item['name']}: {item['balance']:,} به جای {item['expected']:,} تومان"
+        
+        return report
+    
+    def balance_as_of_report(self, as_of):
+        rows = self.period_close.trial_balance_as_of(as_of)
+        
+        report = f"""
+        📅 مانده حساب‌ها در تاریخ {as_of}
+        ─────────────────────────────
+        """
+        
+        for row in rows:
+            report += f"\n• {row['code']} {row['name']}: {row['balance']:,} تومان"
+        
+        return report
+    
+    def inventory_report(self):
+        # محصولات کم‌موجود
+        low_stock = self.database.cached_query('''
+            SELECT name, current_stock, min_stock
+            FROM products
+            WHERE current_stock <= min_stock AND is_active = 1
+        ''')
+        
+        # ارزش موجودی
+        total_value = self.database.cached_query('''
+            SELECT SUM(current_stock * cost_price)
+            FROM products
+        ''')[0][0] or 0
+        
+        report = f"""
+        📦 گزارش وضعیت انبار
+        ─────────────────────────────
+        💰 ارزش کل موجودی: {total_value:,} تومان
+        
+        ⚠️  محصولات نیازمند سفارش:
+        """
+        
+        if low_stock:
+            for name, current, minimum in low_stock:
+                report += f"\n• {name}: موجودی {current} (حداقل: {minimum})"
+        else:
+            report += "\n✅ همه محصولات موجودی کافی دارند"
+        
+        return report
+    
+    def day_summary(self, day=None):
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        rows = self.database.cached_query('''
+            SELECT payment_method, COUNT(*), SUM(total_amount), SUM(discount_amount),
+                   SUM(tax_amount), SUM(final_amount)
+            FROM invoices
+            WHERE status = 'paid' AND invoice_date >= ? AND invoice_date < date(?, '+1 day')
+            GROUP BY payment_method
+        ''', (day, day))
+        
+        return [{
+            'payment_method': payment_method,
+            'invoices': count,
+            'total_amount': total or 0,
+            'discount_amount': discount or 0,
+            'tax_amount': tax or 0,
+            'final_amount': final or 0
+        } for payment_method, count, total, discount, tax, final in rows]
+    
+    def day_summary_report(self, day=None):
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        rows = self.day_summary(day)
+        
+        report = f"""
+        🌙 گزارش پایان روز {day}
+        ─────────────────────────────
+        """
+        
+        for row in rows:
+            report += (f"\n• {row['payment_method']}: {row['invoices']:,} فاکتور - "
+                       f"{row['final_amount']:,} تومان (مالیات {row['tax_amount']:,})")
+        report += f"\n\n💰 جمع کل: {sum(row['final_amount'] for row in rows):,} تومان"
+        
+        return report
@@ -0,0 +1,230 @@
+from core.database import INSTRUMENTATION_CODES
+
+
+# ==================== ردیف‌های نوع‌دار ====================
+class Row:
+    # ردیف سبک با __slots__؛ ترتیب فیلدها همان ترتیب ستون‌های SELECT است
+    __slots__ = ()
+    
+    @classmethod
+    def from_row(cls, cursor, values):
+        row = cls.__new__(cls)
+        for name, value in zip(cls.__slots__, values):
+            setattr(row, name, value)
+        return row
+    
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class ProductRow(Row):
+    __slots__ = ('id', 'sku', 'name', 'category', 'cost_price', 'selling_price',
+                 'current_stock', 'min_stock', 'is_active', 'version')
+
+
+class CustomerRow(Row):
+    __slots__ = ('id', 'customer_code', 'name', 'type', 'phone', 'email',
+                 'credit_limit', 'current_balance', 'is_active')
+
+
+class InvoiceRow(Row):
+    __slots__ = ('id', 'invoice_number', 'customer_id', 'invoice_date', 'total_amount', 'tax_amount',
+                 'discount_amount', 'final_amount', 'status', 'payment_method', 'created_by', 'created_at',
+                 'terminal')
+
+
+class InvoiceItemRow(Row):
+    __slots__ = ('id', 'invoice_id', 'product_id', 'quantity', 'unit_price', 'line_total')
+
+
+class TransactionRow(Row):
+    __slots__ = ('id', 'transaction_number', 'date', 'type', 'description', 'amount',
+                 'account_id', 'status', 'created_by', 'created_at')
+
+
+class TaxRow(Row):
+    __slots__ = ('id', 'tax_name', 'tax_rate', 'is_active', 'created_at')
+
+# ==================== مخزن داده ====================
+class Repository:
+    # متن هر دستور یک بار ساخته می‌شود تا کش دستورات آماده sqlite همیشه برخورد کند
+    table = None
+    row_class = Row
+    # اندازه دسته‌های IN ثابت است تا تعداد متفاوت شناسه‌ها دستور جدیدی نسازد
+    BATCH_SIZES = (1, 8, 32, 128, 500)
+    
+    def __init__(self, database):
+        self.database = database
+        self.select_sql = f"SELECT {', '.join(self.row_class.__slots__)} FROM {self.table}"
+        self.statements = {}
+    
+    def statement(self, name, where=None, order=None):
+        sql = self.statements.get(name)
+        if sql is None:
+            sql = self.select_sql
+            if where:
+                sql += f" WHERE {where}"
+            if order:
+                sql += f" ORDER BY {order}"
+            self.statements[name] = sql
+        return sql
+    
+    def fetch(self, sql, params=(), connection=None):
+        cursor = (connection or self.database.connection).cursor()
+        cursor.row_factory = self.row_class.from_row
+        return cursor.execute(sql, params).fetchall()
+    
+    def fetch_one(self, sql, params=(), connection=None):
+        cursor = (connection or self.database.connection).cursor()
+        cursor.row_factory = self.row_class.from_row
+        return cursor.execute(sql, params).fetchone()
+    
+    def cached(self, sql, params=()):
+        # از کش نتایج کوئری؛ ردیف‌ها هر بار نو ساخته می‌شوند تا تغییر یکی در کش اثر نگذارد
+        from_row = self.row_class.from_row
+        return [from_row(None, values) for values in self.database.cached_query(sql, params)]
+    
+    def get(self, row_id, connection=None):
+        # connection برای خواندن داخل تراکنش نخ نویسنده
+        return self.fetch_one(self.statement('by_id', 'id = ?'), (row_id,), connection)
+    
+    def fetch_in(self, column, keys):
+        # دسته‌های IN با اندازه ثابت؛ دسته ناقص با تکرار آخرین کلید پر می‌شود
+        keys = list(dict.fromkeys(keys))
+        rows = []
+        for start in range(0, len(keys), self.BATCH_SIZES[-1]):
+            chunk = keys[start:start + self.BATCH_SIZES[-1]]
+            size = next(size for size in self.BATCH_SIZES if size >= len(chunk))
+            chunk += [chunk[-1]] * (size - len(chunk))
+            sql = self.statement(f'{column}_in_{size}', f"{column} IN ({','.join('?' * size)})", 'id')
+            rows.extend(self.fetch(sql, chunk))
+        return rows
+    
+    def get_many(self, keys, column='id'):
+        # نتیجه به صورت {کلید: ردیف}؛ کلیدهای ناموجود در خروجی نیستند
+        return {getattr(row, column): row for row in self.fetch_in(column, keys)}
+    
+    def all(self):
+        return self.cached(self.statement('all', order='id'))
+    
+    def count(self):
+        return self.database.cached_query(f"SELECT COUNT(*) FROM {self.table}")[0][0]
+    
+    def stream(self, sql, params=(), batch_size=500):
+        # ردیف‌ها دسته‌دسته با fetchmany و بدون کش؛ حافظه به اندازه یک دسته می‌ماند
+        cursor = self.database.connection.cursor()
+        cursor.row_factory = self.row_class.from_row
+        cursor.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    
+    def stream_all(self, batch_size=500):
+        return self.stream(self.statement('all', order='id'), batch_size=batch_size)
+
+
+class ProductRepository(Repository):
+    table = 'products'
+    row_class = ProductRow
+    
+    def get_by_sku(self, sku):
+        return self.fetch_one(self.statement('by_sku', 'sku = ?'), (sku,))
+    
+    def get_many_by_sku(self, skus):
+        return self.get_many(skus, 'sku')
+    
+    def active(self):
+        return self.fetch(self.statement('active', 'is_active = 1'))
+    
+    def in_stock(self):
+        return self.cached(self.statement('in_stock', 'current_stock > 0', 'id'))
+    
+    def random_in_stock(self):
+        return self.fetch_one(self.statement('random_in_stock', 'current_stock > 0', 'RANDOM() LIMIT 1'))
+
+
+class CustomerRepository(Repository):
+    table = 'customers'
+    row_class = CustomerRow
+    
+    def get_by_code(self, customer_code):
+        return self.fetch_one(self.statement('by_code', 'customer_code = ?'), (customer_code,))
+
+
+class InvoiceRepository(Repository):
+    table = 'invoices'
+    row_class = InvoiceRow
+    
+    def __init__(self, database):
+        super().__init__(database)
+        self.item_repository = InvoiceItemRepository(database)
+    
+    def get_by_number(self, invoice_number):
+        return self.fetch_one(self.statement('by_number', 'invoice_number = ?'), (invoice_number,))
+    
+    def for_day(self, day):
+        return self.fetch(self.statement(
+            'for_day', "invoice_date >= ? AND invoice_date < date(?, '+1 day')", 'id'), (day, day))
+    
+    def for_range(self, start, end, after_id=0, limit=500):
+        # صفحه‌بندی با آخرین شناسه دیده‌شده تا هر صفحه از همان جا ادامه دهد
+        return self.fetch(self.statement(
+            'for_range', "invoice_date >= ? AND invoice_date < date(?, '+1 day') AND id > ?", 'id LIMIT ?'),
+            (start, end, after_id, limit))
+    
+    def items(self, invoice_ids):
+        # اقلام چند فاکتور با یک کوئری دسته‌ای: {شناسه فاکتور: [اقلام]}
+        grouped = {invoice_id: [] for invoice_id in invoice_ids}
+        for row in self.item_repository.for_invoices(invoice_ids):
+            grouped.setdefault(row.invoice_id, []).append(row)
+        return grouped
+
+
+class InvoiceItemRepository(Repository):
+    table = 'invoice_items'
+    row_class = InvoiceItemRow
+    
+    def for_invoices(self, invoice_ids):
+        return self.fetch_in('invoice_id', invoice_ids)
+
+
+class TransactionRepository(Repository):
+    table = 'transactions'
+    row_class = TransactionRow
+    
+    def recent(self):
+        return self.cached(self.statement('recent', order='date DESC'))
+    
+    def stream_recent(self, batch_size=500):
+        return self.stream(self.statement('recent', order='date DESC'), batch_size=batch_size)
+
+
+class TaxRepository(Repository):
+    table = 'tax_settings'
+    row_class = TaxRow
+    
+    def active(self):
+        return self.cached(self.statement('active', 'is_active = 1', 'id'))
+    
+    def stream_active(self, batch_size=500):
+        return self.stream(self.statement('active', 'is_active = 1', 'id'), batch_size=batch_size)
+
+
+# کوئری‌ها در پایش به متد مخزن مشخص (مثل ProductRepository.get_by_sku) نسبت داده می‌شوند، نه به کمکی‌های پایه
+INSTRUMENTATION_CODES.update(
+    function.__code__ for function in vars(Repository).values()
+    if callable(function) and hasattr(function, '__code__')
+)
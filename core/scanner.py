@@ -0,0 +1,283 @@
+import os
+import sys
+import time
+import random
+import select
+import argparse
+import threading
+
+# ==================== لایه دستگاه بارکدخوان ====================
+STX = 0x02
+ETX = 0x03
+
+
+class FileStream:
+    # پورت سریال یونیکس، pty یا هر فایل دستگاهی که بایت به بایت خوانده می‌شود
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+    
+    def open(self):
+        self.fd = os.open(self.path, os.O_RDONLY | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            import termios
+            import tty
+            if os.isatty(self.fd):
+                tty.setraw(self.fd, termios.TCSANOW)
+        except ImportError:
+            pass
+    
+    def read(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return b''
+        data = os.read(self.fd, 4096)
+        if not data:
+            raise EOFError("دستگاه بسته شد")
+        return data
+    
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class SerialPortStream:
+    # پورت COM ویندوز یا سریال با pyserial (وابستگی اختیاری)
+    def __init__(self, port, baudrate=9600):
+        self.port = port
+        self.baudrate = baudrate
+        self.serial = None
+    
+    def open(self):
+        try:
+            import serial
+        except ImportError:
+            raise RuntimeError("برای اتصال به پورت سریال بسته pyserial لازم است")
+        self.serial = serial.Serial(self.port, self.baudrate, timeout=0)
+    
+    def read(self, timeout):
+        self.serial.timeout = timeout
+        return self.serial.read(max(1, self.serial.in_waiting))
+    
+    def close(self):
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+
+
+def open_stream(port, baudrate=9600):
+    if os.name == 'posix' and port.startswith('/'):
+        return FileStream(port)
+    return SerialPortStream(port, baudrate)
+
+
+class ScanFramer:
+    # قاب‌بندی با CR/LF یا STX...ETX؛ داده‌های ناقص و بیش از حد طولانی دور ریخته می‌شوند
+    def __init__(self, max_length=128):
+        self.max_length = max_length
+        self.buffer = bytearray()
+        self.in_stx = False
+        self.discarding = False
+        self.dropped = 0
+    
+    def feed(self, data):
+        codes = []
+        for byte in data:
+            if byte == STX:
+                self.buffer.clear()
+                self.in_stx = True
+                self.discarding = False
+            elif byte == ETX or (byte in (0x0d, 0x0a) and not self.in_stx):
+                if self.buffer and not self.discarding:
+                    codes.append(self.buffer.decode('utf-8', 'replace').strip())
+                self.buffer.clear()
+                self.in_stx = False
+                self.discarding = False
+            elif self.discarding:
+                continue
+            elif len(self.buffer) >= self.max_length:
+                # بقیه قاب تا پایان‌دهنده بعدی دور ریخته می‌شود
+                self.buffer.clear()
+                self.discarding = True
+                self.dropped += 1
+            else:
+                self.buffer.append(byte)
+        return [code for code in codes if code]
+
+
+class ScanDebouncer:
+    # خواندن دوباره یک بارکد در بازه کوتاه (لرزش دست یا بازتاب) یک اسکن حساب می‌شود
+    # بازه کوتاه‌تر از فاصله اسکن‌های پشت سر هم یک کالا است؛ صفر یعنی بدون حذف تکرار
+    def __init__(self, window=0.03):
+        self.window = window
+        self.last_code = None
+        self.last_time = 0
+        self.suppressed = 0
+    
+    def accept(self, code, now=None):
+        now = time.monotonic() if now is None else now
+        # فقط خواندن پذیرفته‌شده بازه را جلو می‌برد تا اسکن‌های مکرر یک کالا پشت سر هم حذف نشوند
+        if self.window and code == self.last_code and now - self.last_time < self.window:
+            self.suppressed += 1
+            return False
+        self.last_code = code
+        self.last_time = now
+        return True
+
+
+class BarcodeDeviceReader:
+    # خواندن در نخ پس‌زمینه با اتصال مجدد و تأخیر نمایی؛ هیچ ورودی/خروجی روی نخ رابط کاربری انجام نمی‌شود
+    def __init__(self, stream_factory, on_scan, debounce_window=0.03, backoff_initial=0.5, backoff_max=10.0,
+                 read_timeout=0.2, on_status=None):
+        self.stream_factory = stream_factory
+        self.on_scan = on_scan
+        # on_status(وصل است، پیام خطا) از نخ خواننده و فقط هنگام تغییر وضعیت اتصال صدا زده می‌شود
+        self.on_status = on_status
+        self.reported = None
+        self.framer = ScanFramer()
+        self.debouncer = ScanDebouncer(debounce_window)
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.read_timeout = read_timeout
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.connected = False
+        self.last_error = None
+        self.stats = {'scans': 0, 'reconnects': 0, 'errors': 0}
+    
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name='barcode-reader', daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout)
+    
+    def run(self):
+        backoff = self.backoff_initial
+        while not self.stop_event.is_set():
+            stream = self.stream_factory()
+            try:
+                stream.open()
+                self.connected = True
+                self.last_error = None
+                self.report(True, '')
+                backoff = self.backoff_initial
+                while not self.stop_event.is_set():
+                    data = stream.read(self.read_timeout)
+                    if data:
+                        self.handle_data(data)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.last_error = str(e)
+                self.report(False, self.last_error)
+            finally:
+                self.connected = False
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+            
+            if self.stop_event.is_set():
+                break
+            # تأخیر نمایی با کمی نویز تا چند پایانه هم‌زمان تلاش نکنند
+            self.stop_event.wait(backoff * random.uniform(0.8, 1.2))
+            backoff = min(backoff * 2, self.backoff_max)
+            self.stats['reconnects'] += 1
+    
+    def report(self, connected, error):
+        if self.on_status and connected != self.reported:
+            self.reported = connected
+            self.on_status(connected, error)
+    
+    def handle_data(self, data):
+        for code in self.framer.feed(data):
+            if self.debouncer.accept(code):
+                self.stats['scans'] += 1
+                self.on_scan(code)
+    
+    def status(self):
+        return dict(self.stats, connected=self.connected, last_error=self.last_error,
+                    duplicates=self.debouncer.suppressed, dropped_frames=self.framer.dropped)
+
+
+# ==================== شبیه‌ساز بارکدخوان ====================
+class PtyScannerSimulator:
+    # یک ترمینال مجازی می‌سازد و اسکن‌ها را با نرخ دلخواه یا زمان‌بندی فایل ردیابی در آن می‌نویسد
+    def __init__(self, framing='crlf'):
+        import pty
+        import tty
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.framing = framing
+    
+    def frame(self, code):
+        if self.framing == 'stx':
+            return bytes([STX]) + code.encode() + bytes([ETX])
+        return code.encode() + b'\r\n'
+    
+    def send(self, code):
+        os.write(self.master_fd, self.frame(code))
+    
+    def replay(self, trace, rate=None):
+        # trace: فهرست (زمان نسبی به ثانیه، بارکد)؛ با rate فاصله‌ها یکنواخت می‌شوند
+        started = time.monotonic()
+        for index, (offset, code) in enumerate(trace):
+            due = started + (index / rate if rate else offset)
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.send(code)
+        return len(trace)
+    
+    def close(self):
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+def load_trace(path):
+    # هر سطر: «زمان بارکد» یا فقط «بارکد»
+    trace = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) > 1:
+                trace.append((float(parts[0]), parts[1]))
+            else:
+                trace.append((0.0, parts[0]))
+    return trace
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='شبیه‌ساز بارکدخوان سریال روی pty')
+    parser.add_argument('trace', help='فایل ردیابی اسکن‌ها')
+    parser.add_argument('--rate', type=float, help='اسکن در ثانیه؛ بدون آن زمان‌بندی فایل استفاده می‌شود')
+    parser.add_argument('--framing', choices=['crlf', 'stx'], default='crlf')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--delay', type=float, default=3.0, help='مکث پیش از شروع برای اتصال برنامه')
+    args = parser.parse_args(argv)
+    
+    simulator = PtyScannerSimulator(args.framing)
+    trace = load_trace(args.trace)
+    print(f"📟 پورت شبیه‌ساز: {simulator.port}")
+    sys.stdout.flush()
+    time.sleep(args.delay)
+    
+    sent = 0
+    for _ in range(args.repeat):
+        sent += simulator.replay(trace, args.rate)
+    print(f"✅ {sent} اسکن ارسال شد")
+    simulator.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
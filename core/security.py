@@ -0,0 +1,445 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+import jwt
+
+# ==================== مدیریت نشست‌ها ====================
+class SessionStore:
+    def __init__(self, ttl=8 * 3600, idle_timeout=2 * 3600, max_sessions=1000, database=None):
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        # شناسه نشست‌ها به ترتیب زمان ورود، برای انقضای ttl مستقل از فعالیت
+        self.login_order = deque()
+        self.lock = threading.RLock()
+        self.database = database
+        self.persist_interval = 60
+        
+        if database:
+            self.load_sessions()
+    
+    def persist(self, sql, params):
+        # ذخیره نشست از صف نوشتن و بدون انتظار؛ نخ رابط منتظر تعهد نمی‌ماند
+        if self.database:
+            self.database.submit_write(lambda cursor: cursor.execute(sql, params))
+    
+    def load_sessions(self):
+        cursor = self.database.connection.cursor()
+        cursor.execute('''
+            SELECT session_id, username, token, login_time, last_activity, ip_address
+            FROM sessions ORDER BY last_activity
+        ''')
+        for session_id, username, token, login_time, last_activity, ip_address in cursor.fetchall():
+            self.sessions[session_id] = {
+                'username': username,
+                'token': token,
+                'login_time': login_time,
+                'last_activity': last_activity,
+                'persisted_activity': last_activity,
+                'ip_address': ip_address
+            }
+        self.login_order.extend(sorted((session['login_time'], session_id)
+                                       for session_id, session in self.sessions.items()))
+        self.purge_expired()
+    
+    def __len__(self):
+        return len(self.sessions)
+    
+    def is_expired(self, session, now):
+        return (now - session['login_time'] > self.ttl or
+                now - session['last_activity'] > self.idle_timeout)
+    
+    def create(self, username, token, ip_address="localhost"):
+        now = time.time()
+        session_id = secrets.token_urlsafe(32)
+        session = {
+            'username': username,
+            'token': token,
+            'login_time': now,
+            'last_activity': now,
+            'persisted_activity': now,
+            'ip_address': ip_address
+        }
+        
+        with self.lock:
+            self.purge_expired()
+            while len(self.sessions) >= self.max_sessions:
+                # حذف نشستی که مدت‌ها استفاده نشده (LRU)
+                evicted_id, _ = self.sessions.popitem(last=False)
+                self.delete_persisted(evicted_id)
+            self.sessions[session_id] = session
+            self.login_order.append((now, session_id))
+        
+        self.persist('''
+            INSERT OR REPLACE INTO sessions 
+            (session_id, username, token, login_time, last_activity, ip_address)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (session_id, username, token, now, now, ip_address))
+        
+        return session_id
+    
+    def get(self, session_id):
+        now = time.time()
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            
+            if self.is_expired(session, now):
+                self.remove(session_id)
+                return None
+            
+            session['last_activity'] = now
+            self.sessions.move_to_end(session_id)
+            
+            # ذخیره زمان فعالیت فقط هر چند دقیقه یکبار
+            if now - session['persisted_activity'] > self.persist_interval:
+                session['persisted_activity'] = now
+                self.persist("UPDATE sessions SET last_activity = ? WHERE session_id = ?", (now, session_id))
+            return session
+    
+    def remove(self, session_id):
+        with self.lock:
+            session = self.sessions.pop(session_id, None)
+            self.delete_persisted(session_id)
+            return session
+    
+    def delete_persisted(self, session_id):
+        self.persist("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    
+    def purge_expired(self):
+        # ترتیب دیکشنری بر اساس آخرین فعالیت است؛ نشست‌های بیکار در ابتدای آن قرار دارند
+        now = time.time()
+        removed = 0
+        with self.lock:
+            while self.sessions:
+                session_id, session = next(iter(self.sessions.items()))
+                if not self.is_expired(session, now):
+                    break
+                self.remove(session_id)
+                removed += 1
+            
+            # نشست‌های پرکار پس از ttl در ابتدای دیکشنری نیستند؛ از صف زمان ورود حذف می‌شوند
+            while self.login_order and now - self.login_order[0][0] > self.ttl:
+                _, session_id = self.login_order.popleft()
+                if session_id in self.sessions:
+                    self.remove(session_id)
+                    removed += 1
+        return removed
+
+
+class TokenCache:
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, token):
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return payload
+    
+    def put(self, token, payload):
+        with self.lock:
+            self.entries[token] = (payload, payload.get('exp', time.time()))
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def discard(self, token):
+        with self.lock:
+            self.entries.pop(token, None)
+
+# ==================== بررسی دسترسی‌ها ====================
+class PermissionMatcher:
+    WILDCARD = '*'
+    TERMINAL = ''
+    
+    def __init__(self, patterns):
+        # الگوها یکبار به درخت پیشوندی تبدیل و نتایج بررسی‌ها حافظه‌سازی می‌شوند
+        self.root = {}
+        self.cache = {}
+        for pattern in patterns:
+            self.add_pattern(pattern)
+    
+    def add_pattern(self, pattern):
+        parts = pattern.split('.')
+        # ستاره فقط در انتهای الگو معنا دارد؛ 'x.*.y' به جای همه‌چیز هیچ دسترسی‌ای نمی‌دهد
+        if self.WILDCARD in parts[:-1]:
+            return
+        node = self.root
+        for part in parts:
+            if part == self.WILDCARD:
+                node[self.WILDCARD] = True
+                return
+            node = node.setdefault(part, {})
+        node[self.TERMINAL] = True
+    
+    def match(self, permission):
+        # 'x.*' فقط زیرمجموعه‌های x را می‌دهد، نه خود x را
+        node = self.root
+        for part in permission.split('.'):
+            if node.get(self.WILDCARD):
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+        return bool(node.get(self.TERMINAL))
+    
+    def has_permission(self, permission):
+        result = self.cache.get(permission)
+        if result is None:
+            result = self.cache[permission] = self.match(permission)
+        return result
+
+# ==================== محدودسازی نرخ ورود ====================
+class TokenBucketLimiter:
+    def __init__(self, capacity=5, refill_rate=5 / 60, max_keys=10000):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+    
+    def allow(self, key):
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.capacity, now]
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+                bucket[1] = now
+                self.buckets.move_to_end(key)
+            
+            if bucket[0] < 1:
+                self.rejected += 1
+                return False
+            
+            bucket[0] -= 1
+            self.allowed += 1
+            return True
+    
+    def reset(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+    
+    def stats(self):
+        return {'tracked_keys': len(self.buckets), 'allowed': self.allowed, 'rejected': self.rejected}
+
+# ==================== سیستم امنیتی ====================
+class AdvancedSecuritySystem:
+    def __init__(self, database=None, audit_log=None):
+        self.database = database
+        self.audit_log = audit_log
+        self.users = {}
+        self.failed_attempts = {}
+        self.jwt_secret = self.load_jwt_secret()
+        self.sessions = SessionStore(database=database)
+        self.token_cache = TokenCache()
+        self.permission_matchers = {}
+        self.username_limiter = TokenBucketLimiter(capacity=5, refill_rate=5 / 60)
+        self.ip_limiter = TokenBucketLimiter(capacity=20, refill_rate=20 / 60)
+        self.login_stats = {
+            'successful_logins': 0,
+            'failed_passwords': 0,
+            'unknown_users': 0,
+            'locked_rejections': 0,
+            'lockouts': 0,
+            'rate_limited': 0
+        }
+        self.init_default_users()
+    
+    def load_jwt_secret(self):
+        # کلید ثابت در دیتابیس تا نشست‌های ذخیره‌شده پس از راه‌اندازی مجدد معتبر بمانند
+        if not self.database:
+            return secrets.token_urlsafe(32)
+        
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT value FROM app_settings WHERE key = 'jwt_secret'")
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        
+        # اگر پردازه دیگری هم‌زمان کلید ساخته باشد همان کلید خوانده می‌شود
+        self.database.write(lambda cursor: cursor.execute(
+            "INSERT OR IGNORE INTO app_settings (key, value) VALUES ('jwt_secret', ?)", (secrets.token_urlsafe(32),)
+        ))
+        cursor.execute("SELECT value FROM app_settings WHERE key = 'jwt_secret'")
+        return cursor.fetchone()[0]
+    
+    def init_default_users(self):
+        default_users = [
+            {
+                'username': 'admin', 'password': 'Admin123!', 'full_name': 'مدیر سیستم',
+                'email': 'admin@company.com', 'role': 'super_admin', 'department': 'مدیریت',
+                'permissions': ['*'], 'is_active': True
+            },
+            {
+                'username': 'financial', 'password': 'Fin123!', 'full_name': 'مدیر مالی', 
+                'email': 'financial@company.com', 'role': 'financial_manager', 'department': 'مالی',
+                'permissions': ['financial.*', 'reports.*', 'dashboard.*'], 'is_active': True
+            }
+        ]
+        
+        for user_data in default_users:
+            self.register_user(user_data)
+    
+    def hash_password(self, password):
+        salt = secrets.token_hex(16)
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex() + ':' + salt
+    
+    def verify_password(self, password, hashed_password):
+        try:
+            password_hash, salt = hashed_password.split(':')
+            return password_hash == hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000).hex()
+        except:
+            return False
+    
+    def register_user(self, user_data):
+        username = user_data['username']
+        self.users[username] = {
+            'username': username,
+            'password': self.hash_password(user_data['password']),
+            'full_name': user_data['full_name'],
+            'email': user_data['email'],
+            'role': user_data['role'],
+            'department': user_data['department'],
+            'permissions': user_data.get('permissions', []),
+            'is_active': user_data.get('is_active', True),
+            'created_at': datetime.now(),
+            'last_login': None,
+            'failed_attempts': 0
+        }
+    
+    def login(self, username, password, ip_address="localhost"):
+        # همه بررسی‌های ارزان پیش از محاسبه PBKDF2 انجام می‌شوند
+        if not self.ip_limiter.allow(ip_address) or not self.username_limiter.allow(username):
+            self.login_stats['rate_limited'] += 1
+            self.audit('login.rate_limited', username, ip_address)
+            return False, "تعداد تلاش‌های ورود بیش از حد مجاز است. لطفاً کمی بعد دوباره تلاش کنید"
+        
+        user = self.users.get(username)
+        if user is None:
+            self.login_stats['unknown_users'] += 1
+            self.audit('login.unknown_user', username, ip_address)
+            return False, "کاربر یافت نشد"
+        
+        if not user['is_active']:
+            self.login_stats['locked_rejections'] += 1
+            return False, "حساب کاربری غیرفعال است"
+        
+        if user['failed_attempts'] >= 5:
+            user['is_active'] = False
+            self.login_stats['lockouts'] += 1
+            return False, "حساب کاربری به دلیل ورودهای ناموفق متوالی مسدود شد"
+        
+        if not self.verify_password(password, user['password']):
+            user['failed_attempts'] += 1
+            self.login_stats['failed_passwords'] += 1
+            self.audit('login.failed', username, ip_address)
+            if user['failed_attempts'] >= 5:
+                user['is_active'] = False
+                self.login_stats['lockouts'] += 1
+                self.audit('login.lockout', username, ip_address)
+                return False, "حساب کاربری به دلیل ورودهای ناموفق متوالی مسدود شد"
+            return False, f"رمز عبور اشتباه است. {5 - user['failed_attempts']} تلاش باقی مانده"
+        
+        # ورود موفق
+        user['last_login'] = datetime.now()
+        user['failed_attempts'] = 0
+        self.username_limiter.reset(username)
+        self.login_stats['successful_logins'] += 1
+        self.audit('login.success', username, ip_address)
+        
+        token_payload = {
+            'username': username,
+            'role': user['role'],
+            'permissions': user['permissions'],
+            'exp': datetime.utcnow() + timedelta(hours=8)
+        }
+        
+        token = jwt.encode(token_payload, self.jwt_secret, algorithm='HS256')
+        
+        session_id = self.sessions.create(username, token, ip_address)
+        
+        return True, {
+            'session_id': session_id,
+            'token': token,
+            'user': {
+                'username': user['username'],
+                'full_name': user['full_name'],
+                'role': user['role'],
+                'permissions': user['permissions'],
+                'department': user['department']
+            }
+        }
+    
+    def audit(self, action, username, ip_address=None):
+        if self.audit_log:
+            self.audit_log.log(action, username=username, entity_type='user', entity_id=username,
+                               ip_address=ip_address)
+    
+    def get_security_stats(self):
+        return {
+            'login': dict(self.login_stats),
+            'locked_accounts': sum(1 for user in self.users.values() if not user['is_active']),
+            'active_sessions': len(self.sessions),
+            'username_limiter': self.username_limiter.stats(),
+            'ip_limiter': self.ip_limiter.stats()
+        }
+    
+    def get_permission_matcher(self, user):
+        # یک matcher برای هر نقش، در اولین ورود ساخته می‌شود
+        key = (user['role'], tuple(user['permissions']))
+        matcher = self.permission_matchers.get(key)
+        if matcher is None:
+            matcher = self.permission_matchers[key] = PermissionMatcher(user['permissions'])
+        return matcher
+    
+    def logout(self, session_id):
+        session = self.sessions.remove(session_id)
+        if session:
+            self.token_cache.discard(session['token'])
+            self.audit('logout', session['username'], session['ip_address'])
+        return session is not None
+    
+    def verify_token(self, token):
+        payload = self.token_cache.get(token)
+        if payload is not None:
+            return payload
+        
+        try:
+            payload = jwt.decode(token, self.jwt_secret, algorithms=['HS256'])
+        except jwt.InvalidTokenError:
+            return None
+        
+        self.token_cache.put(token, payload)
+        return payload
+    
+    def get_session_user(self, session_id):
+        # بررسی نشست و توکن برای هر درخواست؛ در حالت عادی فقط دو جستجوی دیکشنری
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        
+        payload = self.verify_token(session['token'])
+        if payload is None:
+            self.logout(session_id)
+        return payload
@@ -0,0 +1,31 @@
+from core.repositories import TaxRepository
+
+
+# ==================== سیستم مالیاتی ====================
+class TaxSystem:
+    def __init__(self, database):
+        self.database = database
+        self.repository = TaxRepository(database)
+        self.tax_rates = {}
+        self.load_tax_rates()
+    
+    def load_tax_rates(self):
+        for tax in self.repository.active():
+            self.tax_rates[tax.tax_name] = tax.tax_rate
+    
+    def calculate_tax(self, amount, tax_name="مالیات بر ارزش افزوده"):
+        if tax_name in self.tax_rates:
+            return amount * (self.tax_rates[tax_name] / 100)
+        return 0
+    
+    def calculate_total_tax(self, amount):
+        total_tax = 0
+        for tax_name, tax_rate in self.tax_rates.items():
+            total_tax += self.calculate_tax(amount, tax_name)
+        return total_tax
+    
+    def update_tax_rate(self, tax_name, new_rate):
+        self.database.write(lambda cursor: cursor.execute('''
+            UPDATE tax_settings SET tax_rate = ? WHERE tax_name = ?
+        ''', (new_rate, tax_name)))
+        self.load_tax_rates()
@@ -0,0 +1,436 @@
+import sys
+import time
+import random
+import argparse
+import itertools
+import contextlib
+from datetime import date, timedelta
+
+from core import AdvancedDatabaseSystem, LedgerSystem, PeriodCloseSystem
+
+# ==================== داده‌های پایه ====================
+CATEGORIES = {
+    'الکترونیک': (500000, 60000000),
+    'پوشاک': (150000, 5000000),
+    'خوراکی': (10000, 800000),
+    'اداری': (5000, 2000000),
+    'لوازم خانگی': (300000, 40000000),
+    'آرایشی': (50000, 3000000)
+}
+
+PRODUCT_NOUNS = {
+    'الکترونیک': ['لپ‌تاپ', 'ماوس', 'کیبورد', 'هدفون', 'مانیتور', 'گوشی', 'تبلت', 'فلش', 'شارژر'],
+    'پوشاک': ['پیراهن', 'شلوار', 'کاپشن', 'کفش', 'کلاه', 'جوراب', 'مانتو'],
+    'خوراکی': ['برنج', 'روغن', 'چای', 'قند', 'ماکارونی', 'رب', 'پنیر', 'شیر', 'بیسکویت'],
+    'اداری': ['خودکار', 'دفتر', 'کاغذ A4', 'منگنه', 'پوشه', 'ماژیک'],
+    'لوازم خانگی': ['یخچال', 'اتو', 'جاروبرقی', 'سماور', 'مایکروویو', 'پنکه'],
+    'آرایشی': ['شامپو', 'کرم', 'صابون', 'عطر', 'خمیردندان']
+}
+
+BRANDS = ['پارس', 'ایران', 'سامسونگ', 'ال‌جی', 'شیائومی', 'بوش', 'گلرنگ', 'کاله', 'ایزی‌لایف', 'لاجیتک']
+
+FIRST_NAMES = ['علی', 'محمد', 'زهرا', 'فاطمه', 'حسین', 'مریم', 'رضا', 'سارا', 'امیر', 'نرگس', 'مهدی', 'لیلا']
+LAST_NAMES = ['محمدی', 'حسینی', 'احمدی', 'رضایی', 'کریمی', 'موسوی', 'جعفری', 'صادقی', 'رحیمی', 'نوری']
+COMPANY_PREFIXES = ['شرکت', 'فروشگاه', 'گروه', 'بازرگانی']
+
+PAYMENT_METHODS = ['نقدی', 'کارت بانکی', 'آنلاین', 'اعتباری']
+PAYMENT_WEIGHTS = [40, 45, 10, 5]
+
+CASHIERS = ['admin', 'financial', 'cashier1', 'cashier2', 'cashier3']
+
+TRANSACTION_DESCRIPTIONS = {
+    'income': ['فروش نقدی', 'دریافت از مشتری', 'درآمد خدمات'],
+    'expense': ['خرید کالا', 'اجاره', 'قبض برق', 'حمل و نقل', 'تعمیرات'],
+    'transfer': ['واریز به بانک', 'انتقال وجه صندوق']
+}
+
+TAX_SETTINGS = [
+    ('مالیات بر ارزش افزوده', 9.0, 1),
+    ('عوارض شهرداری', 1.0, 1),
+    ('عوارض آلایندگی', 0.5, 0),
+    ('مالیات بر ارزش افزوده (قدیم)', 8.0, 0)
+]
+
+
+# ==================== تولیدکننده داده ====================
+class SyntheticDataGenerator:
+    TABLES = ('tax_settings', 'products', 'customers', 'invoices', 'transactions')
+
+    def __init__(self, database, seed=42, years=3, batch_size=50000, zipf_exponent=1.1):
+        self.database = database
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.years = years
+        self.batch_size = batch_size
+        self.zipf_exponent = zipf_exponent
+        self.ledger = LedgerSystem(database)
+        self.end_date = date.today() - timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=365 * years)
+        self.counts = {}
+
+    def plan(self, rows):
+        # تقسیم ردیف‌های تجاری؛ سطرهای سند حسابداری از فاکتورها و تراکنش‌ها مشتق می‌شوند
+        plan = {
+            'products': max(rows // 200, 20),
+            'customers': max(rows // 50, 10),
+            'transactions': max(rows // 10, 10)
+        }
+        # هر فاکتور به طور میانگین با اقلامش حدود 3.2 ردیف است
+        plan['invoices'] = max(int((rows - sum(plan.values())) / 3.2), 10)
+        return plan
+
+    @contextlib.contextmanager
+    def bulk_mode(self):
+        connection = self.database.connection
+        connection.commit()
+        # خروج از WAL فقط بدون اتصال باز دیگر ممکن است
+        self.database.stop_writer()
+        connection.execute("PRAGMA foreign_keys = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("PRAGMA journal_mode = MEMORY")
+        connection.execute("PRAGMA cache_size = -200000")
+        cursor = connection.cursor()
+        # کل بارگذاری یک تراکنش است؛ تریگرهای نسخه کش در آن نیستند و نسخه‌ها یک بار در پایان بالا می‌روند
+        cursor.execute("BEGIN")
+        self.database.query_cache.suspend_versions(cursor)
+        try:
+            yield
+            self.database.query_cache.resume_versions(cursor)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = FULL")
+            connection.execute("PRAGMA foreign_keys = ON")
+
+    def insert_batches(self, sql, rows):
+        cursor = self.database.connection.cursor()
+        total = 0
+        iterator = iter(rows)
+        while True:
+            batch = list(itertools.islice(iterator, self.batch_size))
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+            total += len(batch)
+        return total
+
+    def next_id(self, table):
+        cursor = self.database.connection.cursor()
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+        return cursor.fetchone()[0]
+
+    def zipf_cum_weights(self, count):
+        return list(itertools.accumulate(1.0 / (rank ** self.zipf_exponent) for rank in range(1, count + 1)))
+
+    def seasonal_days(self):
+        # وزن هر روز: فصل، روز هفته و رشد تدریجی کسب‌وکار
+        month_factor = {1: 1.3, 2: 1.2, 3: 1.5, 4: 1.1, 5: 1.0, 6: 0.9,
+                        7: 0.85, 8: 0.9, 9: 1.05, 10: 1.0, 11: 1.15, 12: 1.4}
+        weekday_factor = {0: 1.0, 1: 1.0, 2: 1.0, 3: 1.15, 4: 1.35, 5: 1.2, 6: 0.9}
+        total_days = (self.end_date - self.start_date).days + 1
+
+        days = []
+        weights = []
+        for offset in range(total_days):
+            day = self.start_date + timedelta(days=offset)
+            growth = 1 + 0.5 * offset / total_days
+            days.append(day.strftime('%Y-%m-%d'))
+            weights.append(month_factor[day.month] * weekday_factor[day.weekday()] * growth)
+        return days, list(itertools.accumulate(weights))
+
+    def generate(self, rows, tables=TABLES):
+        unknown = set(tables) - set(self.TABLES)
+        if unknown:
+            raise ValueError(f"جدول نامعتبر: {', '.join(sorted(unknown))}")
+
+        plan = self.plan(rows)
+        started = time.perf_counter()
+        with self.bulk_mode():
+            for table in self.TABLES:
+                if table not in tables:
+                    continue
+                table_started = time.perf_counter()
+                count = getattr(self, f"generate_{table}")(plan.get(table, 0))
+                self.counts[table] = count
+                print(f"✅ {table}: {count:,} ردیف در {time.perf_counter() - table_started:.1f} ثانیه")
+
+            if 'invoices' in tables or 'transactions' in tables:
+                self.rebuild_balances()
+
+        if 'invoices' in tables or 'transactions' in tables:
+            self.rebuild_snapshots()
+
+        print(f"⏱️ مجموع: {time.perf_counter() - started:.1f} ثانیه")
+        return self.counts
+
+    def generate_tax_settings(self, count=0):
+        # مالیات‌های پیش‌فرض برنامه از قبل وجود دارند؛ نام تکراری مالیات فاکتورها را دوبرابر می‌کرد
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT tax_name FROM tax_settings")
+        existing = {row[0] for row in cursor.fetchall()}
+        return self.insert_batches(
+            "INSERT INTO tax_settings (tax_name, tax_rate, is_active) VALUES (?, ?, ?)",
+            [tax for tax in TAX_SETTINGS if tax[0] not in existing]
+        )
+
+    def generate_products(self, count):
+        rng = self.rng
+        categories = list(CATEGORIES)
+
+        def rows():
+            for i in range(count):
+                category = rng.choice(categories)
+                low, high = CATEGORIES[category]
+                # توزیع لگاریتمی قیمت: کالاهای ارزان بیشترند
+                cost = round(low * (high / low) ** rng.random(), -3)
+                price = round(cost * rng.uniform(1.15, 1.6), -3)
+                name = f"{rng.choice(PRODUCT_NOUNS[category])} {rng.choice(BRANDS)} مدل {i}"
+                yield (f"G{self.seed}-{i:08d}", name, category, cost, price,
+                       rng.randint(20, 5000), rng.randint(5, 50))
+
+        return self.insert_batches('''
+            INSERT INTO products
+            (sku, name, category, cost_price, selling_price, current_stock, min_stock)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows())
+
+    def generate_customers(self, count):
+        rng = self.rng
+
+        def rows():
+            for i in range(count):
+                type = rng.choices(['regular', 'vip', 'gold'], weights=[85, 10, 5])[0]
+                if rng.random() < 0.2:
+                    name = f"{rng.choice(COMPANY_PREFIXES)} {rng.choice(LAST_NAMES)} {i}"
+                else:
+                    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+                credit_limit = {'regular': 10000000, 'vip': 500000000, 'gold': 100000000}[type]
+                yield (f"GC{self.seed}-{i:08d}", name, type, f"09{rng.randint(100000000, 999999999)}",
+                       f"customer{self.seed}_{i}@example.com", credit_limit)
+
+        return self.insert_batches('''
+            INSERT INTO customers (customer_code, name, type, phone, email, credit_limit)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows())
+
+    def load_products(self):
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT id, selling_price FROM products WHERE is_active = 1")
+        products = cursor.fetchall()
+        if not products:
+            raise ValueError("برای تولید فاکتور ابتدا باید محصول وجود داشته باشد")
+        # ترتیب تصادفی تا محبوبیت به شناسه محصول وابسته نباشد
+        self.rng.shuffle(products)
+        return products
+
+    def load_customer_ids(self):
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT id FROM customers WHERE is_active = 1")
+        customer_ids = [row[0] for row in cursor.fetchall()]
+        self.rng.shuffle(customer_ids)
+        return customer_ids
+
+    def active_taxes(self):
+        cursor = self.database.connection.cursor()
+        cursor.execute("SELECT tax_name, tax_rate FROM tax_settings WHERE is_active = 1 ORDER BY id")
+        # مثل TaxSystem هر نام یک نرخ دارد
+        return list(dict(cursor.fetchall()).items())
+
+    def generate_invoices(self, count):
+        rng = self.rng
+        products = self.load_products()
+        product_weights = self.zipf_cum_weights(len(products))
+        customer_ids = self.load_customer_ids()
+        customer_weights = self.zipf_cum_weights(len(customer_ids)) if customer_ids else None
+        active_taxes = self.active_taxes()
+        days, day_weights = self.seasonal_days()
+        dates = sorted(rng.choices(days, cum_weights=day_weights, k=count))
+
+        invoice_id = self.next_id('invoices')
+        entry_id = self.next_id('journal_entries')
+        invoices = []
+        items = []
+        taxes = []
+        entries = []
+        lines = []
+        inserted = 0
+
+        for i, invoice_date in enumerate(dates):
+            customer_id = None
+            if customer_ids and rng.random() < 0.3:
+                customer_id = rng.choices(customer_ids, cum_weights=customer_weights)[0]
+
+            total = 0
+            item_count = min(1 + int(rng.expovariate(0.6)), 12)
+            for product_id, price in rng.choices(products, cum_weights=product_weights, k=item_count):
+                quantity = 1 if rng.random() < 0.8 else rng.randint(2, 5)
+                total += price * quantity
+                items.append((invoice_id, product_id, quantity, price, price * quantity))
+
+            discount = round(total * rng.choice([0.05, 0.1]), 0) if rng.random() < 0.1 else 0
+            # مثل فروشگاه، هر مالیات جدا محاسبه و تفکیکش کنار فاکتور ثبت می‌شود
+            tax = 0
+            for tax_name, rate in active_taxes:
+                amount = round((total - discount) * rate / 100, 0)
+                taxes.append((invoice_id, tax_name, rate, amount))
+                tax += amount
+            final = total - discount + tax
+            payment_method = rng.choices(PAYMENT_METHODS, weights=PAYMENT_WEIGHTS)[0]
+            if payment_method == 'اعتباری' and customer_id is None:
+                payment_method = 'نقدی'
+
+            invoice_number = f"GINV{self.seed}-{i:09d}"
+            cashier = rng.choice(CASHIERS)
+            invoices.append((invoice_id, invoice_number, customer_id, invoice_date, total, tax,
+                             discount, final, 'paid', payment_method, cashier))
+
+            entries.append((entry_id, f"GJE{self.seed}-I{i:09d}", invoice_date, f'فروش فاکتور {invoice_number}',
+                            'invoice', invoice_number, cashier))
+            for line in self.ledger.sale_lines(payment_method, total - discount, tax, final, customer_id):
+                code, debit, credit = line[:3]
+                if debit or credit:
+                    lines.append((entry_id, self.ledger.account_id(code), line[3] if len(line) > 3 else None,
+                                  invoice_date, debit, credit))
+
+            invoice_id += 1
+            entry_id += 1
+            if len(items) >= self.batch_size:
+                inserted += self.flush_invoices(invoices, items, taxes, entries, lines)
+
+        inserted += self.flush_invoices(invoices, items, taxes, entries, lines)
+        return inserted
+
+    def flush_invoices(self, invoices, items, taxes, entries, lines):
+        cursor = self.database.connection.cursor()
+        cursor.executemany('''
+            INSERT INTO invoices
+            (id, invoice_number, customer_id, invoice_date, total_amount, tax_amount,
+             discount_amount, final_amount, status, payment_method, created_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', invoices)
+        cursor.executemany('''
+            INSERT INTO invoice_items (invoice_id, product_id, quantity, unit_price, line_total)
+            VALUES (?, ?, ?, ?, ?)
+        ''', items)
+        cursor.executemany('''
+            INSERT INTO invoice_taxes (invoice_id, tax_name, tax_rate, amount)
+            VALUES (?, ?, ?, ?)
+        ''', taxes)
+        self.flush_journal(entries, lines)
+
+        count = len(invoices)
+        invoices.clear()
+        items.clear()
+        taxes.clear()
+        return count
+
+    def flush_journal(self, entries, lines):
+        cursor = self.database.connection.cursor()
+        cursor.executemany('''
+            INSERT INTO journal_entries
+            (id, entry_number, date, description, source_type, source_ref, created_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', entries)
+        cursor.executemany('''
+            INSERT INTO journal_lines (entry_id, account_id, customer_id, date, debit, credit)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', lines)
+        entries.clear()
+        lines.clear()
+
+    def generate_transactions(self, count):
+        rng = self.rng
+        days, day_weights = self.seasonal_days()
+        dates = sorted(rng.choices(days, cum_weights=day_weights, k=count))
+        entry_id = self.next_id('journal_entries')
+        transactions = []
+        entries = []
+        lines = []
+        inserted = 0
+
+        for i, transaction_date in enumerate(dates):
+            type = rng.choices(['income', 'expense', 'transfer'], weights=[45, 45, 10])[0]
+            amount = round(rng.lognormvariate(14, 1.2), -3) or 1000
+            description = rng.choice(TRANSACTION_DESCRIPTIONS[type])
+            transaction_number = f"GTRX{self.seed}-{i:09d}"
+            cashier = rng.choice(CASHIERS)
+
+            transaction_lines = self.ledger.transaction_lines(type, amount)
+            transactions.append((transaction_number, transaction_date, type, description, amount,
+                                 self.ledger.account_id(transaction_lines[0][0]), cashier))
+            entries.append((entry_id, f"GJE{self.seed}-T{i:09d}", transaction_date, description,
+                            'transaction', transaction_number, cashier))
+            for code, debit, credit in transaction_lines:
+                lines.append((entry_id, self.ledger.account_id(code), None, transaction_date, debit, credit))
+            entry_id += 1
+
+            if len(transactions) >= self.batch_size:
+                inserted += self.flush_transactions(transactions, entries, lines)
+
+        inserted += self.flush_transactions(transactions, entries, lines)
+        return inserted
+
+    def flush_transactions(self, transactions, entries, lines):
+        cursor = self.database.connection.cursor()
+        cursor.executemany('''
+            INSERT INTO transactions
+            (transaction_number, date, type, description, amount, account_id, created_by)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', transactions)
+        self.flush_journal(entries, lines)
+
+        count = len(transactions)
+        transactions.clear()
+        return count
+
+    def rebuild_balances(self):
+        # مانده‌ها یکجا از روی اسناد محاسبه می‌شوند، نه سطر به سطر
+        cursor = self.database.connection.cursor()
+        cursor.execute('''
+            UPDATE accounts SET balance = COALESCE((
+                SELECT CASE WHEN accounts.type IN ('asset', 'expense')
+                            THEN SUM(debit - credit) ELSE SUM(credit - debit) END
+                FROM journal_lines WHERE account_id = accounts.id
+            ), 0)
+        ''')
+        cursor.execute('''
+            UPDATE customers SET current_balance = COALESCE((
+                SELECT SUM(debit - credit) FROM journal_lines WHERE customer_id = customers.id
+            ), 0)
+        ''')
+
+    def rebuild_snapshots(self):
+        # اسناد با تاریخ گذشته درج شده‌اند؛ تصویرهای ماهانه از نو ساخته می‌شوند
+        cursor = self.database.connection.cursor()
+        cursor.execute("DELETE FROM balance_snapshots")
+        cursor.execute("DELETE FROM closed_periods")
+        self.database.connection.commit()
+        closed = PeriodCloseSystem(self.database, self.ledger).close_due_periods()
+        print(f"✅ {closed} دوره ماهانه بسته شد")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='تولید داده آزمایشی بزرگ و تکرارپذیر برای سیستم حسابداری')
+    parser.add_argument('--db', default='accounting_system.db', help='مسیر دیتابیس مقصد')
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='تعداد ردیف‌های تجاری (محصول، مشتری، فاکتور، اقلام و تراکنش)')
+    parser.add_argument('--seed', type=int, default=42, help='بذر تولید اعداد تصادفی')
+    parser.add_argument('--years', type=int, default=3, help='بازه زمانی داده‌ها به سال')
+    parser.add_argument('--tables', default=','.join(SyntheticDataGenerator.TABLES),
+                        help='جدول‌های مورد نظر با کاما جدا شده')
+    parser.add_argument('--batch-size', type=int, default=50000, help='اندازه هر دسته درج')
+    args = parser.parse_args(argv)
+
+    tables = [table.strip() for table in args.tables.split(',') if table.strip()]
+    database = AdvancedDatabaseSystem(args.db)
+    generator = SyntheticDataGenerator(database, seed=args.seed, years=args.years, batch_size=args.batch_size)
+    generator.generate(args.rows, tables)
+    database.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+import pytest
+
+from core.database import AdvancedDatabaseSystem
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = AdvancedDatabaseSystem(str(tmp_path / 'test.db'))
+    yield database
+    database.close()
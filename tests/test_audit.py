@@ -0,0 +1,40 @@
+import pytest
+
+from core.audit import AuditLogSystem
+
+
+@pytest.mark.parametrize('durability', AuditLogSystem.DURABILITY_MODES)
+def test_audit_events_are_written_in_every_mode(database, durability):
+    audit_log = AuditLogSystem(database, durability=durability, flush_interval=0.01)
+    for i in range(3):
+        audit_log.log('test.event', 'alice', 'invoice', i, {'n': i})
+    audit_log.close()
+
+    rows = audit_log.query(username='alice', action='test.event')
+    assert len(rows) == 3
+    assert audit_log.written == 3
+
+
+def test_full_buffer_drops_instead_of_blocking(database):
+    audit_log = AuditLogSystem(database, max_buffer=1, flush_interval=0.01)
+    # نخ نویسنده را متوقف می‌کنیم تا بافر خالی نشود
+    audit_log.stop_event.set()
+    audit_log.writer_thread.join(5)
+    audit_log.log('test.event', 'alice')
+    audit_log.log('test.event', 'alice')
+    assert audit_log.dropped == 1
+    audit_log.flush()
+    assert audit_log.written == 1
+
+
+def test_audit_log_is_append_only(database):
+    audit_log = AuditLogSystem(database, durability='sync')
+    audit_log.log('test.event', 'alice')
+    with pytest.raises(Exception, match='append-only'):
+        database.write(lambda cursor: cursor.execute("DELETE FROM audit_log"))
+    audit_log.close()
+
+
+def test_invalid_durability_is_rejected(database):
+    with pytest.raises(ValueError):
+        AuditLogSystem(database, durability='never')
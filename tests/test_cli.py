@@ -0,0 +1,35 @@
+import sqlite3
+
+import pytest
+
+from core.cli import main, build_parser
+
+
+def run(tmp_path, *argv, password='Admin123!'):
+    return main(['--db', str(tmp_path / 'cli.db'), '--password', password, *argv])
+
+
+def test_report_prints_and_succeeds(tmp_path, capsys):
+    assert run(tmp_path, 'report', 'inventory') == 0
+    assert capsys.readouterr().out.strip()
+
+
+def test_wrong_password_and_missing_permission_exit_codes(tmp_path, capsys):
+    assert run(tmp_path, 'report', 'sales', password='wrong') == 2
+    assert main(['--db', str(tmp_path / 'cli.db'), '--username', 'financial', '--password', 'Fin123!',
+                 'import', 'products', 'missing.csv']) == 3
+    assert 'inventory.edit' in capsys.readouterr().err
+
+
+def test_end_of_day_runs_and_is_audited(tmp_path, capsys):
+    assert run(tmp_path, 'end-of-day', '--date', '2024-01-15') == 0
+    assert 'دوره‌های بسته‌شده' in capsys.readouterr().out
+
+    connection = sqlite3.connect(tmp_path / 'cli.db')
+    assert connection.execute("SELECT COUNT(*) FROM audit_log WHERE action = 'eod.run'").fetchone()[0] == 1
+    connection.close()
+
+
+def test_invalid_date_is_rejected():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(['report', 'day', '--date', '2024-13-01'])
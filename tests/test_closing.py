@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from core.closing import ZReportSystem
+from core.pos import CompletePOSSystem
+
+
+def sell(pos, product_id, quantity, payment_method):
+    assert pos.add_to_cart(product_id, quantity)[0]
+    success, invoice = pos.process_payment(payment_method)
+    assert success, invoice
+    return invoice
+
+
+def test_z_report_totals_payment_methods_and_items(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pos = CompletePOSSystem(database, {'username': 'cashier', 'permissions': ['pos.sell']})
+    catalog = pos.stock_ledger.catalog
+    first, second = (int(catalog.ids[index]) for index in catalog.visible_rows()[:2])
+    invoices = [sell(pos, first, 2, 'نقدی'), sell(pos, second, 1, 'کارت بانکی'), sell(pos, first, 1, 'نقدی')]
+
+    z_reports = ZReportSystem(database)
+    day = datetime.now().strftime('%Y-%m-%d')
+    success, report = z_reports.close_register(day, pos.terminal, 'cashier')
+    assert success, report
+
+    assert report['invoice_count'] == 3
+    assert report['first_invoice'] == invoices[0]['invoice_number']
+    assert report['last_invoice'] == invoices[-1]['invoice_number']
+    assert report['net_amount'] == pytest.approx(sum(invoice['final_amount'] for invoice in invoices))
+    assert {method: payment['count'] for method, payment in report['payment_methods'].items()} == {
+        'نقدی': 2, 'کارت بانکی': 1}
+    assert sum(report['taxes'].values()) == pytest.approx(report['tax_amount'])
+    top = report['top_items'][0]
+    assert (top['sku'], top['quantity']) == (pos.stock_ledger.get_product(first)['sku'], 3)
+
+
+def test_z_report_is_written_once_and_immutable(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pos = CompletePOSSystem(database, {'username': 'cashier', 'permissions': ['pos.sell']})
+    sell(pos, int(pos.stock_ledger.catalog.ids[pos.stock_ledger.catalog.visible_rows()[0]]), 1, 'آنلاین')
+
+    z_reports = ZReportSystem(database)
+    day = datetime.now().strftime('%Y-%m-%d')
+    success, report = z_reports.close_register(day, pos.terminal, 'cashier')
+    assert success, report
+    assert not z_reports.close_register(day, pos.terminal, 'cashier')[0]
+    with pytest.raises(Exception, match='immutable'):
+        database.write(lambda cursor: cursor.execute("UPDATE z_reports SET net_amount = 0"))
+    assert z_reports.get(report['id'])['net_amount'] == report['net_amount']
+
+
+def test_z_report_for_register_without_sales(database):
+    assert not ZReportSystem(database).close_register('2000-01-01', 'nowhere', 'nobody')[0]
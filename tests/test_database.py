@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+import pytest
+
+
+def insert_product(cursor, sku):
+    cursor.execute("INSERT INTO products (sku, name, selling_price) VALUES (?, ?, 1)", (sku, sku))
+    return cursor.lastrowid
+
+
+def fail_after_insert(cursor, sku):
+    insert_product(cursor, sku)
+    raise ValueError(sku)
+
+
+def hold_writer(database):
+    # فرمان اول نخ نویسنده را نگه می‌دارد تا فرمان‌های بعدی در یک دسته جمع شوند
+    started, release = threading.Event(), threading.Event()
+    future = database.submit_write(lambda cursor: started.set() or release.wait(5))
+    assert started.wait(5)
+    return future, release
+
+
+def product_count(database, prefix):
+    return database.connection.execute("SELECT COUNT(*) FROM products WHERE sku LIKE ?",
+                                       (prefix + '%',)).fetchone()[0]
+
+
+def test_write_queue_commits_queued_commands_in_one_batch(database):
+    blocker, release = hold_writer(database)
+    futures = [database.submit_write(insert_product, f'GC-{i}') for i in range(10)]
+    release.set()
+    blocker.result(5)
+
+    assert len({future.result(5) for future in futures}) == 10
+    assert database.writer.stats['commits'] == 2
+    assert database.writer.stats['largest_batch'] == 10
+    assert product_count(database, 'GC-') == 10
+
+
+def test_write_queue_delivers_each_error_to_its_own_future(database):
+    blocker, release = hold_writer(database)
+    ok_before = database.submit_write(insert_product, 'ERR-1')
+    failing = database.submit_write(fail_after_insert, 'ERR-2')
+    ok_after = database.submit_write(insert_product, 'ERR-3')
+    release.set()
+    blocker.result(5)
+
+    assert ok_before.result(5) and ok_after.result(5)
+    with pytest.raises(ValueError, match='ERR-2'):
+        failing.result(5)
+    # سطر فرمان خطادار با savepoint خودش برگشت خورده و بقیه دسته تعهد شده است
+    assert database.writer.stats['commits'] == 2
+    assert product_count(database, 'ERR-') == 2
+
+
+def test_write_queue_rejects_submit_from_writer_thread(database):
+    with pytest.raises(RuntimeError):
+        database.write(lambda cursor: database.write(insert_product, 'NESTED'))
+
+
+def test_query_cache_hits_until_writer_commits(database):
+    sql = "SELECT COUNT(*) FROM products"
+    before = database.cached_query(sql)[0][0]
+    assert database.cached_query(sql)[0][0] == before
+    assert database.query_cache.stats['hits'] == 1
+
+    database.write(insert_product, 'QC-1')
+    assert database.cached_query(sql)[0][0] == before + 1
+
+
+def test_query_cache_bumps_once_per_writer_batch(database):
+    version = database.query_cache.table_version('products')
+    database.write(lambda cursor: [insert_product(cursor, f'QB-{i}') for i in range(50)])
+    assert database.query_cache.table_version('products') == version + 1
+    assert database.connection.execute("SELECT deferred FROM version_batch").fetchone()[0] == 0
+
+
+def test_query_cache_sees_writes_from_other_connections(database):
+    sql = "SELECT name FROM customers ORDER BY id"
+    before = database.cached_query(sql)
+
+    other = sqlite3.connect(database.db_path)
+    other.execute("INSERT INTO customers (customer_code, name) VALUES ('EXT-1', 'بیرونی')")
+    other.commit()
+    other.close()
+
+    assert database.cached_query(sql) == before + [('بیرونی',)]
+
+
+def test_query_cache_bypasses_untracked_tables(database):
+    database.cached_query("SELECT COUNT(*) FROM sessions")
+    database.cached_query("SELECT COUNT(*) FROM sessions")
+    assert database.query_cache.stats['bypassed'] == 2
+    assert database.query_cache.stats['hits'] == 0
+
+
+def test_slow_queries_are_logged_without_printing(database, capsys):
+    monitor = database.query_monitor
+    monitor.slow_threshold_ms = 0
+    database.connection.cursor().execute("SELECT COUNT(*) FROM products").fetchall()
+    assert monitor.slow_log[-1]['statement'] == "SELECT COUNT(*) FROM products"
+    assert monitor.slow_log[-1]['plan']
+    assert '🐢' not in capsys.readouterr().out
+
+    monitor.debug = True
+    database.connection.cursor().execute("SELECT COUNT(*) FROM customers").fetchall()
+    assert '🐢' in capsys.readouterr().out
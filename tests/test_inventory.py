@@ -0,0 +1,34 @@
+from core.inventory import StockLedgerSystem
+
+
+def test_catalog_is_the_only_product_store(database):
+    stock_ledger = StockLedgerSystem(database)
+    catalog = stock_ledger.catalog
+    count = database.connection.execute("SELECT COUNT(*) FROM products WHERE is_active = 1").fetchone()[0]
+    assert catalog.size == count
+    assert not hasattr(stock_ledger, 'products')
+
+    index = catalog.visible_rows()[0]
+    product = stock_ledger.get_product(int(catalog.ids[index]))
+    assert product['stock'] == catalog.stock[index]
+    assert stock_ledger.sku_index[product['sku']] == product['id']
+
+
+def test_refresh_updates_catalog_and_notifies_rows(database):
+    stock_ledger = StockLedgerSystem(database)
+    catalog = stock_ledger.catalog
+    calls = []
+    stock_ledger.change_hooks.append(lambda changed, membership_changed: calls.append((changed, membership_changed)))
+    index = catalog.visible_rows()[0]
+    product_id = int(catalog.ids[index])
+
+    database.write(lambda cursor: cursor.execute(
+        "UPDATE products SET selling_price = 42, version = version + 1 WHERE id = ?", (product_id,)))
+    assert stock_ledger.refresh_product(product_id)['price'] == 42
+    assert calls[-1] == ([index], False)
+
+    database.write(lambda cursor: cursor.execute("UPDATE products SET is_active = 0 WHERE id = ?", (product_id,)))
+    assert stock_ledger.refresh_product(product_id) is None
+    assert calls[-1] == ([index], True)
+    assert index not in catalog.visible_rows()
+    assert stock_ledger.available(product_id) == 0
@@ -0,0 +1,45 @@
+from core.ledger import LedgerSystem, PeriodCloseSystem
+
+
+def post(database, ledger, date, amount):
+    lines = [(ledger.CASH, amount, 0), (ledger.SALES_INCOME, 0, amount)]
+    database.write(lambda cursor: ledger.post_entry(cursor, date, 'فروش آزمایشی', lines, source_type='test'))
+
+
+def snapshot(database, ledger, code, period_end):
+    return database.connection.execute('''
+        SELECT balance FROM balance_snapshots WHERE entity_type = 'account' AND entity_id = ? AND period_end = ?
+    ''', (ledger.account_id(code), period_end)).fetchone()[0]
+
+
+def test_opening_migration_runs_once(database):
+    LedgerSystem(database)
+    entries = database.connection.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0]
+    ledger = LedgerSystem(database)
+    assert database.connection.execute("SELECT COUNT(*) FROM journal_entries").fetchone()[0] == entries
+    assert ledger.verify_balances() == []
+
+
+def test_close_period_snapshots_and_rejects_reclose(database):
+    ledger = LedgerSystem(database)
+    periods = PeriodCloseSystem(database, ledger)
+    post(database, ledger, '2024-01-15', 1000)
+
+    assert periods.close_period('2024-01')[0]
+    assert not periods.close_period('2024-01')[0]
+    assert snapshot(database, ledger, ledger.CASH, '2024-01-31') == 1000
+    assert periods.account_balance_as_of(ledger.CASH, '2024-01-31') == 1000
+
+
+def test_back_dated_entry_adjusts_closed_snapshots(database):
+    ledger = LedgerSystem(database)
+    periods = PeriodCloseSystem(database, ledger)
+    post(database, ledger, '2024-01-15', 1000)
+    post(database, ledger, '2024-02-10', 200)
+    assert periods.close_period('2024-01')[0] and periods.close_period('2024-02')[0]
+
+    post(database, ledger, '2024-01-20', 500)
+    assert snapshot(database, ledger, ledger.CASH, '2024-01-31') == 1500
+    assert snapshot(database, ledger, ledger.CASH, '2024-02-29') == 1700
+    assert periods.account_balance_as_of(ledger.CASH, '2024-02-15') == 1700
+    assert ledger.verify_balances() == []
@@ -0,0 +1,53 @@
+from core.ledger import LedgerSystem
+from core.pos import CompletePOSSystem
+
+
+def product_in_stock(stock_ledger, quantity):
+    catalog = stock_ledger.catalog
+    index = next(index for index in catalog.visible_rows() if catalog.stock[index] >= quantity)
+    return int(catalog.ids[index]), int(catalog.stock[index])
+
+
+def test_payment_keeps_ledger_balanced(database, tmp_path, monkeypatch):
+    # چاپگر شبیه‌سازی‌شده receipt.txt را در پوشه جاری می‌نویسد
+    monkeypatch.chdir(tmp_path)
+    ledger = LedgerSystem(database)
+    pos = CompletePOSSystem(database, {'username': 'cashier', 'permissions': ['pos.sell']}, ledger=ledger)
+    product_id, stock = product_in_stock(pos.stock_ledger, 2)
+
+    assert pos.add_to_cart(product_id, 2)[0]
+    success, invoice = pos.process_payment('نقدی')
+
+    assert success, invoice
+    assert invoice['total_amount'] > 0 and invoice['tax_amount'] > 0
+    assert invoice['final_amount'] == invoice['total_amount'] + invoice['tax_amount']
+    assert sum(tax['amount'] for tax in invoice['tax_breakdown'].values()) == invoice['tax_amount']
+    assert ledger.verify_balances() == []
+    assert pos.stock_ledger.get_product(product_id)['stock'] == stock - 2
+    taxes = database.connection.execute('''
+        SELECT COUNT(*) FROM invoice_taxes t JOIN invoices i ON i.id = t.invoice_id WHERE i.invoice_number = ?
+    ''', (invoice['invoice_number'],)).fetchone()[0]
+    assert taxes == len(pos.tax_system.tax_rates)
+
+
+def test_payment_without_permission_is_rejected(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pos = CompletePOSSystem(database, {'username': 'viewer', 'permissions': ['reports.*']})
+    assert pos.add_to_cart(product_in_stock(pos.stock_ledger, 1)[0])[0] is False
+    assert pos.process_payment('نقدی')[0] is False
+
+
+def test_two_terminals_get_distinct_invoice_numbers(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    user = {'username': 'cashier', 'permissions': ['pos.sell']}
+    first, second = CompletePOSSystem(database, user), CompletePOSSystem(database, user)
+    product_id, _ = product_in_stock(first.stock_ledger, 3)
+
+    numbers = []
+    for pos in (first, second, first):
+        assert pos.add_to_cart(product_id)[0]
+        success, invoice = pos.process_payment('نقدی')
+        assert success, invoice
+        numbers.append(invoice['invoice_number'])
+    assert len(set(numbers)) == 3
+    assert [int(number.rsplit('-', 1)[1]) for number in numbers] == [1000, 1001, 1002]
@@ -0,0 +1,83 @@
+import os
+
+from core.receipts import ReceiptJournal
+
+
+def receipt(number):
+    return f"فاکتور {number}\nجمع کل: {len(number) * 1000:,} تومان\n"
+
+
+def test_journal_append_get_and_duplicate(tmp_path):
+    journal = ReceiptJournal(str(tmp_path))
+    assert journal.append('INV-1', receipt('INV-1'))
+    assert not journal.append('INV-1', 'چاپ مجدد')
+    assert journal.get('INV-1') == receipt('INV-1')
+    assert journal.get('INV-404') is None
+    assert journal.status()['duplicates'] == 1
+    journal.close()
+
+
+def test_journal_rotates_and_reads_old_segments(tmp_path):
+    journal = ReceiptJournal(str(tmp_path), max_segment_bytes=1024)
+    numbers = [f'INV-{i}' for i in range(60)]
+    for number in numbers:
+        journal.append(number, receipt(number) * 5)
+
+    assert journal.status()['segments'] > 1
+    assert all(journal.get(number) == receipt(number) * 5 for number in numbers)
+    journal.close()
+
+    reopened = ReceiptJournal(str(tmp_path), max_segment_bytes=1024)
+    assert reopened.get(numbers[0]) == receipt(numbers[0]) * 5
+    reopened.close()
+
+
+def test_journal_recovers_unindexed_record_and_truncates_torn_tail(tmp_path):
+    journal = ReceiptJournal(str(tmp_path))
+    journal.append('INV-1', receipt('INV-1'))
+    journal.append('INV-2', receipt('INV-2'))
+    path = journal.segment_path(journal.active)
+    end = os.path.getsize(path)
+    # قطع برق: رکورد دوم نوشته شده ولی نمایه نشده و نیمه رکورد سوم روی دیسک مانده است
+    journal.index.execute("DELETE FROM receipts WHERE invoice_number = 'INV-2'")
+    journal.index.commit()
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(ReceiptJournal.RECORD_HEADER.pack(5, 500, 0) + b'INV-3')
+
+    recovered = ReceiptJournal(str(tmp_path))
+    assert recovered.stats['recovered'] == 1
+    assert recovered.get('INV-2') == receipt('INV-2')
+    assert os.path.getsize(path) == end
+    assert recovered.append('INV-3', receipt('INV-3'))
+    assert recovered.get('INV-3') == receipt('INV-3')
+    recovered.close()
+
+
+def test_journal_rebuilds_lost_index(tmp_path):
+    journal = ReceiptJournal(str(tmp_path))
+    journal.append('INV-1', receipt('INV-1'))
+    journal.close()
+    for name in os.listdir(tmp_path):
+        if name.startswith('index.db'):
+            os.remove(tmp_path / name)
+
+    rebuilt = ReceiptJournal(str(tmp_path))
+    assert rebuilt.get('INV-1') == receipt('INV-1')
+    rebuilt.close()
+
+
+def test_journal_template_change_starts_new_segment(tmp_path):
+    journal = ReceiptJournal(str(tmp_path))
+    journal.append('INV-1', receipt('INV-1'))
+    # پردازه‌ای با قالب تازه‌تر همان پوشه را ادامه می‌دهد
+    journal.ZDICT = 'قالب تازه فاکتور\nجمع کل:'.encode('utf-8')
+    journal.append('INV-2', receipt('INV-2'))
+    assert journal.status()['segments'] == 2
+    journal.close()
+
+    reopened = ReceiptJournal(str(tmp_path))
+    assert reopened.stats['recovered'] == 0
+    reopened.append('INV-3', receipt('INV-3'))
+    assert [reopened.get(f'INV-{i}') for i in (1, 2, 3)] == [receipt(f'INV-{i}') for i in (1, 2, 3)]
+    reopened.close()
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+
+from core.pos import CompletePOSSystem
+from core.rendering import TextReceiptTemplate, HtmlReceiptTemplate, InvoiceRenderSystem
+
+
+RECEIPT = {
+    'invoice_number': 'INV-1',
+    'date': '2024-01-15 10:00',
+    'items': [{'name': '<کالا>', 'quantity': 2, 'unit_price': 1000, 'total': 2000}],
+    'total_amount': 2000,
+    'discount_amount': 0,
+    'tax_amount': 180,
+    'final_amount': 2180,
+    'payment_method': 'نقدی'
+}
+
+
+def test_text_template_renders_items_and_totals():
+    text = TextReceiptTemplate().render(RECEIPT)
+    assert 'شماره فاکتور: INV-1' in text
+    assert '2 x 1,000 = 2,000' in text
+    assert 'مبلغ قابل پرداخت: 2,180 تومان' in text
+
+
+def test_html_template_escapes_fields():
+    page = HtmlReceiptTemplate().render(dict(RECEIPT, payment_method=None))
+    assert '&lt;کالا&gt;' in page and '<کالا>' not in page
+    assert 'روش پرداخت: -' in page
+
+
+def test_render_writes_one_file_per_invoice(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pos = CompletePOSSystem(database, {'username': 'cashier', 'permissions': ['pos.sell']})
+    catalog = pos.stock_ledger.catalog
+    numbers = []
+    for index in catalog.visible_rows()[:3]:
+        pos.add_to_cart(int(catalog.ids[index]))
+        success, sale = pos.process_payment('نقدی')
+        assert success, sale
+        numbers.append(sale['invoice_number'])
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    out = tmp_path / 'out'
+    success, stats = InvoiceRenderSystem(database).render(str(out), today, today, 'html', workers=1, batch_size=2)
+    assert success, stats
+    assert (stats['invoices'], stats['batches']) == (3, 2)
+    assert sorted(os.listdir(out / today)) == sorted(f"{number}.html" for number in numbers)
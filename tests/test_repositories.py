@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from core.pos import CompletePOSSystem
+from core.repositories import ProductRepository, InvoiceRepository
+
+
+def test_get_many_pads_batches_to_fixed_sizes(database):
+    products = ProductRepository(database)
+    ids = [row.id for row in products.all()]
+    found = products.get_many(ids[:3] + [10 ** 9])
+    assert sorted(found) == sorted(ids[:3])
+    # سه شناسه و یک شناسه ناموجود در دسته 8 تایی؛ فقط یک متن دستور ساخته شده است
+    assert list(products.statements) == ['all', 'id_in_8']
+
+
+def test_get_by_sku_and_many_by_sku(database):
+    products = ProductRepository(database)
+    product = products.all()[0]
+    assert products.get_by_sku(product.sku) == product
+    assert products.get_many_by_sku([product.sku, 'NO-SUCH-SKU']) == {product.sku: product}
+    assert products.get(product.id).as_dict()['sku'] == product.sku
+
+
+def test_cached_rows_are_fresh_objects(database):
+    products = ProductRepository(database)
+    first = products.all()[0]
+    first.name = 'تغییر محلی'
+    assert products.all()[0].name != 'تغییر محلی'
+
+
+def test_stream_all_yields_every_row_in_batches(database):
+    products = ProductRepository(database)
+    batches = list(products.stream_all(batch_size=2))
+    assert all(len(batch) <= 2 for batch in batches)
+    assert [row.id for batch in batches for row in batch] == [row.id for row in products.all()]
+    assert sum(len(batch) for batch in batches) == products.count()
+
+
+def test_invoices_for_day_and_items_grouped_by_invoice(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pos = CompletePOSSystem(database, {'username': 'cashier', 'permissions': ['pos.sell']})
+    catalog = pos.stock_ledger.catalog
+    first, second = (int(catalog.ids[index]) for index in catalog.visible_rows()[:2])
+    pos.add_to_cart(first)
+    pos.add_to_cart(second, 2)
+    success, sale = pos.process_payment('نقدی')
+    assert success, sale
+
+    invoices = InvoiceRepository(database)
+    invoice = invoices.get_by_number(sale['invoice_number'])
+    assert invoice in invoices.for_day(datetime.now().strftime('%Y-%m-%d'))
+    items = invoices.items([invoice.id, 10 ** 9])
+    assert items[10 ** 9] == []
+    assert {(item.product_id, item.quantity) for item in items[invoice.id]} == {(first, 1), (second, 2)}
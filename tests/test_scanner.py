@@ -0,0 +1,69 @@
+import queue
+
+from core.devices import BarcodeReaderSystem
+from core.scanner import ScanFramer, ScanDebouncer, PtyScannerSimulator, STX, ETX
+
+
+def test_framer_splits_crlf_and_stx_frames():
+    framer = ScanFramer()
+    assert framer.feed(b'A-1\r\nA-2') == ['A-1']
+    assert framer.feed(b'\r\n' + bytes([STX]) + b'B-1' + bytes([ETX])) == ['A-2', 'B-1']
+
+
+def test_framer_drops_overlong_frame_until_terminator():
+    framer = ScanFramer(max_length=4)
+    assert framer.feed(b'TOOLONG\r\nOK\r\n') == ['OK']
+    assert framer.dropped == 1
+
+
+def test_framer_stx_resets_partial_frame():
+    framer = ScanFramer()
+    assert framer.feed(b'noise' + bytes([STX]) + b'C-1' + bytes([ETX])) == ['C-1']
+
+
+def test_debouncer_suppresses_bounce_within_window():
+    debouncer = ScanDebouncer(window=0.03)
+    assert [debouncer.accept('X', now) for now in (0.0, 0.01, 0.02)] == [True, False, False]
+    assert debouncer.suppressed == 2
+
+
+def test_debouncer_keeps_same_code_burst_at_20_per_second():
+    debouncer = ScanDebouncer()
+    assert [debouncer.accept('SKU-1', i * 0.05) for i in range(6)] == [True] * 6
+
+
+def test_debouncer_suppressed_reads_do_not_extend_window():
+    debouncer = ScanDebouncer(window=0.03)
+    assert [debouncer.accept('X', now) for now in (0.0, 0.02, 0.04)] == [True, False, True]
+
+
+def test_debouncer_disabled_with_zero_window():
+    debouncer = ScanDebouncer(window=0)
+    assert all(debouncer.accept('X', 0.0) for _ in range(3))
+
+
+def test_connect_reports_bad_port_from_reader_thread(database, tmp_path):
+    statuses = queue.Queue()
+    reader = BarcodeReaderSystem(database)
+    success, _ = reader.connect(str(tmp_path / 'no-such-port'), on_scan=print,
+                                on_status=lambda connected, error: statuses.put((connected, error)))
+    # connect فقط نخ را راه می‌اندازد؛ خطا از نخ خواننده می‌رسد
+    assert success
+    connected, error = statuses.get(timeout=5)
+    assert not connected and 'no-such-port' in error
+    reader.disconnect()
+
+
+def test_connect_reports_success_and_delivers_scans(database):
+    simulator = PtyScannerSimulator()
+    statuses, scans = queue.Queue(), queue.Queue()
+    reader = BarcodeReaderSystem(database)
+    reader.connect(simulator.port, on_scan=scans.put,
+                   on_status=lambda connected, error: statuses.put((connected, error)))
+    try:
+        assert statuses.get(timeout=5) == (True, '')
+        simulator.send('SKU-1')
+        assert scans.get(timeout=5) == 'SKU-1'
+    finally:
+        reader.disconnect()
+        simulator.close()
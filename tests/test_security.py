@@ -0,0 +1,119 @@
+import time
+
+from core.security import PermissionMatcher, TokenBucketLimiter, SessionStore, AdvancedSecuritySystem
+
+
+def test_permission_matcher_exact_and_wildcards():
+    matcher = PermissionMatcher(['pos.sell', 'reports.*'])
+    assert matcher.has_permission('pos.sell')
+    assert not matcher.has_permission('pos')
+    assert not matcher.has_permission('pos.sell.refund')
+    assert matcher.has_permission('reports.sales.view')
+    assert not matcher.has_permission('inventory.view')
+
+
+def test_permission_matcher_wildcard_grants_children_only():
+    matcher = PermissionMatcher(['financial.*'])
+    assert matcher.has_permission('financial.transactions.create')
+    assert not matcher.has_permission('financial')
+
+
+def test_permission_matcher_star_grants_everything():
+    assert PermissionMatcher(['*']).has_permission('security.view')
+
+
+def test_permission_matcher_ignores_inner_wildcards():
+    matcher = PermissionMatcher(['*.view'])
+    assert not matcher.has_permission('reports.view')
+    assert not matcher.has_permission('pos.sell')
+
+
+def test_token_bucket_rejects_after_capacity_per_key():
+    limiter = TokenBucketLimiter(capacity=3, refill_rate=0)
+    assert [limiter.allow('alice') for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow('bob')
+    assert limiter.stats() == {'tracked_keys': 2, 'allowed': 4, 'rejected': 1}
+
+
+def test_token_bucket_refills_over_time():
+    limiter = TokenBucketLimiter(capacity=1, refill_rate=1000)
+    assert limiter.allow('alice')
+    time.sleep(0.01)
+    assert limiter.allow('alice')
+
+
+def test_token_bucket_reset_and_key_limit():
+    limiter = TokenBucketLimiter(capacity=1, refill_rate=0, max_keys=2)
+    assert limiter.allow('alice') and not limiter.allow('alice')
+    limiter.reset('alice')
+    assert limiter.allow('alice')
+
+    limiter.allow('bob')
+    limiter.allow('carol')
+    assert limiter.stats()['tracked_keys'] == 2
+    # قدیمی‌ترین کلید کنار گذاشته شده و دوباره با ظرفیت کامل شروع می‌کند
+    assert limiter.allow('alice')
+
+
+def test_sessions_persist_through_writer_and_reload(database):
+    store = SessionStore(database=database)
+    session_id = store.create('alice', 'token-1')
+    removed_id = store.create('bob', 'token-2')
+    store.remove(removed_id)
+    # صف نوشتن به ترتیب اجرا می‌شود؛ یک فرمان خالی یعنی ذخیره‌های قبلی تعهد شده‌اند
+    database.write(lambda cursor: None)
+
+    reloaded = SessionStore(database=database)
+    assert reloaded.get(session_id)['username'] == 'alice'
+    assert reloaded.get(removed_id) is None
+
+
+def test_session_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    first = store.create('a', 't1')
+    second = store.create('b', 't2')
+    store.get(first)
+    store.create('c', 't3')
+    assert store.get(second) is None
+    assert store.get(first) is not None
+
+
+def test_session_store_expires_idle_sessions():
+    store = SessionStore(idle_timeout=0)
+    session_id = store.create('a', 't1')
+    time.sleep(0.01)
+    assert store.get(session_id) is None
+    assert len(store) == 0
+
+
+def test_session_store_expires_active_sessions_after_ttl():
+    store = SessionStore(ttl=0.1)
+    stale = store.create('a', 't1')
+    time.sleep(0.06)
+    fresh = store.create('b', 't2')
+    # نشست قدیمی تازه استفاده شده و به انتهای ترتیب فعالیت رفته است
+    assert store.get(stale) is not None
+    time.sleep(0.06)
+    assert store.purge_expired() == 1
+    assert stale not in store.sessions and fresh in store.sessions
+
+
+def test_session_user_uses_token_cache_and_logout_invalidates(database):
+    security = AdvancedSecuritySystem(database)
+    success, result = security.login('admin', 'Admin123!')
+    assert success
+
+    payload = security.get_session_user(result['session_id'])
+    assert payload['username'] == 'admin'
+    assert security.get_session_user(result['session_id']) is payload
+
+    security.logout(result['session_id'])
+    assert security.get_session_user(result['session_id']) is None
+    assert security.token_cache.get(result['token']) is None
+
+
+def test_session_with_invalid_token_is_logged_out(database):
+    security = AdvancedSecuritySystem(database)
+    session_id = security.sessions.create('admin', 'not-a-token')
+    assert security.get_session_user(session_id) is None
+    assert security.sessions.get(session_id) is None